@@ -0,0 +1,101 @@
+import logging
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from elixir import sources
+
+
+class ArticleMetaHandler(BaseHTTPRequestHandler):
+    """
+    Answer the /api/v1/article requests of the ArticleMeta API from the
+    LocalStore of the server, with the JSON of the document or, with
+    format=xmlrsps, its XML.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        pid = query.get('code', [None])[0]
+
+        if url.path.rstrip('/') != '/api/v1/article' or not pid:
+            self.send_error(404)
+            return
+
+        try:
+            if query.get('format', [None])[0] == 'xmlrsps':
+                body, content_type = self.server.store.xml(pid), 'application/xml'
+            else:
+                body, content_type = self.server.store.json(pid), 'application/json'
+        except LookupError:
+            self.send_error(404)
+            return
+
+        body = body.encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', '%s; charset=utf-8' % content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug('ArticleMeta stand-in: ' + format, *args)
+
+
+def serve(store_path, host='127.0.0.1', port=0):
+    """
+    This method start a local ArticleMeta stand-in in a background thread and
+    retrieve the server, its url is given by server_url. Stop it with
+    server.shutdown().
+
+    Keyword arguments:
+    store_path -- LocalStore with the documents, see corpus.generate.
+    host -- address to listen.
+    port -- port to listen, 0 picks a free port.
+    """
+
+    server = ThreadingHTTPServer((host, port), ArticleMetaHandler)
+    server.daemon_threads = True
+    server.store = sources.LocalStore(store_path)
+
+    thread = threading.Thread(target=server.serve_forever, name='articlemeta-stand-in')
+    thread.daemon = True
+    thread.start()
+
+    logging.info('ArticleMeta stand-in listening at (%s)', server_url(server))
+
+    return server
+
+
+def server_url(server):
+
+    host, port = server.server_address[:2]
+
+    return 'http://%s:%d' % (host, port)
+
+
+def argp():
+    parser = argparse.ArgumentParser(
+        description="Serve a LocalStore as a local ArticleMeta API")
+
+    parser.add_argument('store', help='SQLite file with the documents metadata')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7000)
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    server = ThreadingHTTPServer((args.host, args.port), ArticleMetaHandler)
+    server.store = sources.LocalStore(args.store)
+
+    logging.info('ArticleMeta stand-in listening at (%s)', server_url(server))
+
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+
+    argp()
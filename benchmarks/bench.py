@@ -0,0 +1,387 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import tempfile
+import subprocess
+
+from elixir import feedstock
+from elixir import sources
+from elixir import index
+from elixir import elixir
+from elixir import manifest
+from elixir import writers
+from elixir import utils
+
+from benchmarks import corpus
+from benchmarks import articlemeta
+
+VERSIONS = ('sps', 'legacy')
+
+
+def statistics(samples):
+    """
+    This method retrieve the summary of a list of durations in seconds.
+    """
+
+    samples = sorted(samples)
+
+    if not samples:
+        return {'count': 0}
+
+    def percentile(value):
+        return samples[min(len(samples) - 1, int(round(value * (len(samples) - 1))))]
+
+    return {
+        'count': len(samples),
+        'total': sum(samples),
+        'mean': sum(samples) / len(samples),
+        'min': samples[0],
+        'median': percentile(0.5),
+        'p95': percentile(0.95),
+        'max': samples[-1]
+    }
+
+
+class Timer(object):
+
+    def __init__(self):
+        self.stages = {}
+
+    def __call__(self, stage, function, *args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        self.stages.setdefault(stage, []).append(time.perf_counter() - start)
+
+        return result
+
+
+def pack_by_stage(pid, source_dir, deposit_dir, timer, package_format=writers.DEFAULT_FORMAT,
+                  compression=None):
+    """
+    This method pack a document evaluating each stage of
+    Article.wrap_document on its own, so its duration is recorded. The
+    memoized values are then used by wrap_document, which is recorded as the
+    package stage.
+    """
+
+    xml = timer('fetch_xml', feedstock.loadXML, pid)
+    raw_data = timer('fetch_json', feedstock.load_rawdata, pid)
+
+    article = timer(
+        'article',
+        feedstock.Article,
+        pid, xml, raw_data, source_dir, deposit_dir,
+        source_index=index.SourceIndex(source_dir)
+    )
+
+    timer('scan', lambda: (article.list_source_images, article.list_pdfs, article.list_documents))
+    timer('parse', lambda: article._documents_assets)
+    timer('images', lambda: article.images_status)
+
+    if article.content_version == 'legacy':
+        timer('legacy_xml', lambda: article.xml_sps_with_legacy_data)
+
+    timer(
+        'package', article.wrap_document,
+        package_format=package_format, compression=compression
+    )
+
+
+def pack_end_to_end(pid, source_dir, deposit_dir, package_format=writers.DEFAULT_FORMAT,
+                    compression=None):
+
+    start = time.perf_counter()
+
+    article = feedstock.Article(
+        pid,
+        feedstock.loadXML(pid),
+        feedstock.load_rawdata(pid),
+        source_dir,
+        deposit_dir,
+        source_index=index.SourceIndex(source_dir)
+    )
+    article.wrap_document(package_format=package_format, compression=compression)
+
+    return time.perf_counter() - start
+
+
+def package_bytes(deposit_dir):
+    """
+    This method retrieve the size of the packages written to a directory, of
+    any format, without their manifests.
+    """
+
+    size = 0
+
+    for dirpath, dirnames, filenames in os.walk(deposit_dir):
+        size += sum([
+            os.path.getsize(os.path.join(dirpath, x))
+            for x in filenames if not x.endswith(manifest.MANIFEST_SUFFIX)
+        ])
+
+    return size
+
+
+def prepare_corpus(corpus_dir, settings):
+    """
+    This method retrieve the PIDs of the corpus at corpus_dir, building it
+    when missing or built with other settings.
+    """
+
+    settings_path = os.path.join(corpus_dir, 'settings.json')
+
+    if os.path.exists(settings_path):
+        with open(settings_path, 'r') as f:
+            current = json.load(f) == settings.as_dict()
+
+        if current:
+            logging.info('Using the corpus at (%s)', corpus_dir)
+            with open(os.path.join(corpus_dir, 'pids.txt'), 'r') as f:
+                return f.read().split()
+
+        shutil.rmtree(corpus_dir)
+
+    return corpus.generate(corpus_dir, settings)
+
+
+def bench_version(corpus_dir, settings, repeat=3, transport='store',
+                  package_format=writers.DEFAULT_FORMAT, compression=None):
+    """
+    This method benchmark the packaging of a synthetic corpus and retrieve
+    the statistics of the end to end wall and CPU durations, of each stage
+    durations and the size of the packages.
+
+    Keyword arguments:
+    corpus_dir -- directory of the corpus, built when missing.
+    settings -- corpus.Settings of the corpus.
+    repeat -- number of times each document is packed.
+    transport -- store to read the metadata from the LocalStore of the corpus,
+    http to read it from a local ArticleMeta stand-in.
+    package_format -- format of the packages, see writers.FORMATS.
+    compression -- utils.CompressionPolicy of the zip members, None for the
+    default policy.
+    """
+
+    pids = prepare_corpus(corpus_dir, settings)
+    source_dir = os.path.join(corpus_dir, 'source')
+    store_path = os.path.join(corpus_dir, 'articlemeta.db')
+    deposit_dir = tempfile.mkdtemp()
+    server = None
+
+    if transport == 'http':
+        server = articlemeta.serve(store_path)
+        sources.configure(sources.ArticleMetaSource(articlemeta.server_url(server)))
+    else:
+        sources.configure(sources.LocalStore(store_path))
+
+    timer = Timer()
+    end_to_end = []
+    cpu = []
+
+    try:
+        for _ in range(repeat):
+            for pid in pids:
+                start = time.process_time()
+                end_to_end.append(
+                    pack_end_to_end(pid, source_dir, deposit_dir, package_format, compression)
+                )
+                cpu.append(time.process_time() - start)
+                pack_by_stage(pid, source_dir, deposit_dir, timer, package_format, compression)
+
+        package_size = package_bytes(deposit_dir)
+    finally:
+        sources.configure()
+        shutil.rmtree(deposit_dir)
+        if server:
+            server.shutdown()
+
+    return {
+        'documents': len(pids),
+        'package_bytes': package_size,
+        'end_to_end': statistics(end_to_end),
+        'cpu': statistics(cpu),
+        'stages': {k: statistics(v) for k, v in timer.stages.items()}
+    }
+
+
+def git_revision():
+
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(work_dir, settings, versions=VERSIONS, repeat=3, transport='store',
+        formats=(writers.DEFAULT_FORMAT,), compressions=(None,)):
+    """
+    This method benchmark each content version in each package format with
+    each compression policy and retrieve the results as a dict ready to be
+    saved as JSON. The results of the zip format are given by version, the
+    others by version:format. The results of a compression policy other than
+    the default are given by version[:format]:policy, see
+    utils.CompressionPolicy.parse for the policies.
+    """
+
+    results = {}
+
+    for version in versions:
+        settings.version = version
+
+        for package_format in formats:
+            for policy in compressions:
+                logging.info(
+                    'Benchmarking the %s version as %s with the %s compression',
+                    version, package_format, policy or 'default'
+                )
+
+                key = version
+
+                if package_format != writers.DEFAULT_FORMAT:
+                    key = '%s:%s' % (key, package_format)
+
+                if policy:
+                    key = '%s:%s' % (key, policy)
+
+                results[key] = bench_version(
+                    os.path.join(work_dir, version), settings, repeat, transport,
+                    package_format,
+                    utils.CompressionPolicy.parse(policy) if policy else None
+                )
+
+    corpus_settings = settings.as_dict()
+    del corpus_settings['version']
+
+    return {
+        'revision': git_revision(),
+        'elixir_version': elixir.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.time(),
+        'repeat': repeat,
+        'transport': transport,
+        'formats': list(formats),
+        'compressions': [x or 'default' for x in compressions],
+        'corpus': corpus_settings,
+        'results': results
+    }
+
+
+def compare(baseline, current):
+    """
+    This method retrieve the lines comparing the median durations of two
+    benchmark results, a ratio above 1 is a slowdown.
+    """
+
+    lines = []
+
+    for version, result in sorted(current['results'].items()):
+        previous = baseline.get('results', {}).get(version)
+
+        if not previous:
+            continue
+
+        metrics = [('end_to_end', result['end_to_end'], previous['end_to_end'])]
+
+        if 'cpu' in result and 'cpu' in previous:
+            metrics.append(('cpu', result['cpu'], previous['cpu']))
+
+        metrics += [
+            (stage, stats, previous['stages'].get(stage))
+            for stage, stats in sorted(result['stages'].items())
+        ]
+
+        for name, stats, old in metrics:
+            if not old or not old.get('median'):
+                continue
+
+            lines.append('%-16s %-12s %10.6fs %10.6fs %6.2fx' % (
+                version, name, old['median'], stats['median'], stats['median'] / old['median']
+            ))
+
+    return lines
+
+
+def argp():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the packaging of a synthetic corpus")
+
+    defaults = corpus.Settings()
+
+    parser.add_argument('--work_dir', default=None, help='Directory to keep the corpus between runs, if None a temporary directory is used')
+    parser.add_argument('--versions', default=','.join(VERSIONS), help='Content versions to benchmark, comma separated')
+    parser.add_argument('--formats', default=writers.DEFAULT_FORMAT, help='Package formats to benchmark, comma separated, one of %s' % ', '.join(sorted(writers.FORMATS)))
+    parser.add_argument('--compression', default='', help='Compression policies of the zip members to benchmark, separated by ;, ex: "xml,htm=deflate:6,*=stored;*=deflate:9", see elixir --compression. The default policy is used when not given')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of times each document is packed')
+    parser.add_argument('--transport', default='store', choices=['store', 'http'], help='Read the metadata from a LocalStore or from a local ArticleMeta stand-in')
+    parser.add_argument('--output', '-o', default=None, help='File to save the JSON results, if None they are printed')
+    parser.add_argument('--compare', default=None, help='JSON results of a previous run to compare with')
+    parser.add_argument('--journals', type=int, default=defaults.journals)
+    parser.add_argument('--issues', type=int, default=defaults.issues, help='Issues per journal')
+    parser.add_argument('--articles', type=int, default=defaults.articles, help='Articles per issue')
+    parser.add_argument('--html_size', type=int, default=defaults.html_size, help='Average size in KB of the document body')
+    parser.add_argument('--images', type=int, default=defaults.images, help='Images per document')
+    parser.add_argument('--image_size', type=int, default=defaults.image_size, help='Size in KB of each image')
+    parser.add_argument('--pdf_size', type=int, default=defaults.pdf_size, help='Size in KB of each pdf')
+    parser.add_argument('--languages', type=int, default=defaults.languages, help='Languages per document')
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    settings = corpus.Settings(
+        journals=args.journals,
+        issues=args.issues,
+        articles=args.articles,
+        html_size=args.html_size,
+        images=args.images,
+        image_size=args.image_size,
+        pdf_size=args.pdf_size,
+        languages=args.languages,
+        seed=args.seed
+    )
+
+    work_dir = args.work_dir or tempfile.mkdtemp()
+
+    try:
+        results = run(
+            work_dir,
+            settings,
+            versions=[x for x in args.versions.split(',') if x],
+            repeat=args.repeat,
+            transport=args.transport,
+            formats=[x for x in args.formats.split(',') if x],
+            compressions=[x.strip() for x in args.compression.split(';') if x.strip()] or [None]
+        )
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+
+        for line in compare(baseline, results):
+            sys.stderr.write(line + '\n')
+
+
+if __name__ == "__main__":
+
+    argp()
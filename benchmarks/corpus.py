@@ -0,0 +1,295 @@
+import os
+import copy
+import json
+import random
+import logging
+import argparse
+
+from elixir import sources
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'tests', 'fixtures')
+
+LANGUAGES = ('pt', 'en', 'es')
+
+PARAGRAPH = (
+    u'Os resultados indicam associa\xe7\xe3o entre a qualidade da dieta e os '
+    u'fatores sociodemogr\xe1ficos avaliados na popula\xe7\xe3o estudada. '
+)
+
+
+class Settings(object):
+    """
+    Shape of a synthetic corpus.
+
+    Keyword arguments:
+    version -- content version of the documents, sps or legacy.
+    journals -- number of journals.
+    issues -- number of issues per journal.
+    articles -- number of articles per issue.
+    html_size -- size in KB of the body of each document.
+    images -- number of images referenced by each document.
+    image_size -- size in KB of each image.
+    pdf_size -- size in KB of each pdf.
+    languages -- number of languages of each document, one html and one pdf per language.
+    seed -- seed of the random content, the same settings always build the same corpus.
+    """
+
+    def __init__(self, version='sps', journals=2, issues=2, articles=10,
+                 html_size=40, images=6, image_size=120, pdf_size=600,
+                 languages=2, seed=0):
+        self.version = version
+        self.journals = journals
+        self.issues = issues
+        self.articles = articles
+        self.html_size = html_size
+        self.images = images
+        self.image_size = image_size
+        self.pdf_size = pdf_size
+        self.languages = languages
+        self.seed = seed
+
+    def as_dict(self):
+
+        return dict(self.__dict__)
+
+
+def load_template():
+    """
+    This method retrieve the ArticleMeta XML and JSON of the test fixtures,
+    used as template for the synthetic documents.
+    """
+
+    with open(os.path.join(FIXTURES_DIR, 'document.xml'), 'r', encoding='utf-8') as fp:
+        xml = fp.read().strip()
+
+    with open(os.path.join(FIXTURES_DIR, 'document.json'), 'r', encoding='utf-8') as fp:
+        data = json.load(fp)
+
+    return xml, data
+
+
+def journal_issn(journal):
+
+    return '%04d-%04d' % (9000 + journal, 1000 + journal)
+
+
+def document_pid(journal, year, issue, order):
+
+    return 'S%s%04d%04d%05d' % (journal_issn(journal), year, issue, order)
+
+
+def document_json(template, pid, acronym, volume, issue, year, file_name):
+    """
+    This method retrieve the ArticleMeta JSON of a synthetic document, built
+    from the template with the given identification.
+    """
+
+    data = copy.deepcopy(template)
+    issn = pid[1:10]
+
+    data['code'] = pid
+    data['code_title'] = [issn]
+    data['code_issue'] = pid[:18]
+    data['title']['v68'] = [{'_': acronym}]
+    data['title']['v400'] = [{'_': issn}]
+    data['title']['v935'] = [{'_': issn}]
+    data['article']['v880'] = [{'_': pid}]
+    data['article']['v35'] = [{'_': issn}]
+    data['article']['v31'] = [{'_': str(volume)}]
+    data['article']['v32'] = [{'_': str(issue)}]
+    data['article']['v65'] = [{'_': '%04d0000' % year}]
+    data['article']['v702'] = [{'_': '%s/v%sn%s/%s' % (acronym, volume, issue, file_name)}]
+
+    return data
+
+
+def paragraphs(size):
+
+    count = max(1, size * 1024 // len(PARAGRAPH))
+
+    return [PARAGRAPH] * count
+
+
+def sps_document(file_code, images, size, language):
+
+    graphics = ''.join([
+        '<fig id="f%d"><graphic xlink:href="%s"/></fig>' % (number, image)
+        for number, image in enumerate(images, 1)
+    ])
+
+    body = ''.join(['<p>%s</p>' % x for x in paragraphs(size)])
+
+    return (
+        u'<?xml version="1.0" encoding="utf-8"?>\n'
+        u'<article xmlns:xlink="http://www.w3.org/1999/xlink" article-type="research-article" xml:lang="%s">'
+        u'<front><article-meta><article-id pub-id-type="publisher-id">%s</article-id></article-meta></front>'
+        u'<body><sec>%s%s</sec></body></article>\n'
+    ) % (language, file_code, body, graphics)
+
+
+def legacy_document(file_code, images, size, img_path):
+
+    figures = '\n'.join([
+        '<p align="center"><img src="%s/%s"></p>' % (img_path, image)
+        for image in images
+    ])
+
+    body = '\n'.join([
+        '<p><font face="Verdana" size="2">%s</font></p>' % x.replace(u'\xe7\xe3', '&ccedil;&atilde;')
+        for x in paragraphs(size)
+    ])
+
+    return (
+        u'<html>\n<head>\n<title>%s</title>\n</head>\n<body bgcolor="#ffffff">\n%s\n%s\n</body>\n</html>\n'
+    ) % (file_code, body, figures)
+
+
+def write_random(path, size, generator, header=b''):
+
+    with open(path, 'wb') as f:
+        f.write(header + generator.randbytes(max(0, size * 1024 - len(header))))
+
+
+def generate(corpus_dir, settings=None):
+    """
+    This method build a synthetic legacy site under corpus_dir and retrieve
+    the list of PIDs of its documents. It writes:
+
+    source/ -- the source directory, with the img, pdf, html and xml
+    directories of each issue.
+    articlemeta.ndjson -- ArticleMeta dump of the documents, see
+    sources.LocalStore.import_dump.
+    articlemeta.db -- the dump imported in a LocalStore.
+    pids.txt -- the PIDs of the documents, one per line.
+    settings.json -- the settings used to build the corpus.
+
+    Keyword arguments:
+    corpus_dir -- directory to receive the corpus.
+    settings -- Settings of the corpus.
+    """
+
+    settings = settings or Settings()
+    generator = random.Random(settings.seed)
+    xml_template, json_template = load_template()
+    source_dir = os.path.join(corpus_dir, 'source')
+    languages = LANGUAGES[:max(1, settings.languages)]
+    pids = []
+
+    os.makedirs(corpus_dir, exist_ok=True)
+
+    with open(os.path.join(corpus_dir, 'articlemeta.ndjson'), 'w', encoding='utf-8') as dump:
+        for journal in range(1, settings.journals + 1):
+            acronym = 'j%02d' % journal
+
+            for issue in range(1, settings.issues + 1):
+                volume = 10 + issue // 4
+                number = issue
+                year = 2000 + issue // 4
+                label = 'v%sn%s' % (volume, number)
+
+                issue_dirs = {}
+                for kind in ['img', 'pdf', 'html', 'xml']:
+                    issue_dirs[kind] = os.path.join(source_dir, kind, acronym, label)
+                    os.makedirs(issue_dirs[kind], exist_ok=True)
+
+                for order in range(1, settings.articles + 1):
+                    pid = document_pid(journal, year, number, order)
+                    file_code = 'a%03d' % order
+                    images = [
+                        '%s-gf%02d.jpg' % (file_code, x)
+                        for x in range(1, settings.images + 1)
+                    ]
+
+                    for image in images:
+                        write_random(
+                            os.path.join(issue_dirs['img'], image),
+                            settings.image_size,
+                            generator
+                        )
+
+                    for language in languages:
+                        pdf_name = '%s.pdf' % file_code
+
+                        if language != languages[0]:
+                            pdf_name = '%s_%s' % (language, pdf_name)
+
+                        write_random(
+                            os.path.join(issue_dirs['pdf'], pdf_name),
+                            settings.pdf_size,
+                            generator,
+                            header=b'%PDF-1.4\n'
+                        )
+
+                    html_size = max(1, int(settings.html_size * generator.uniform(0.5, 1.5)))
+
+                    if settings.version == 'sps':
+                        file_name = '%s.xml' % file_code
+                        with open(os.path.join(issue_dirs['xml'], file_name), 'w', encoding='utf-8') as f:
+                            f.write(sps_document(file_code, images, html_size, languages[0]))
+                    else:
+                        file_name = '%s.htm' % file_code
+                        img_path = '/img/revistas/%s/%s' % (acronym, label)
+                        for language in languages:
+                            front = os.path.join(issue_dirs['html'], '%s_%s.htm' % (language, file_code))
+                            back = os.path.join(issue_dirs['html'], '%s_b%s.htm' % (language, file_code))
+                            with open(front, 'w', encoding='iso-8859-1') as f:
+                                f.write(legacy_document(file_code, [], 1, img_path))
+                            with open(back, 'w', encoding='iso-8859-1') as f:
+                                f.write(legacy_document(file_code, images, html_size, img_path))
+
+                    data = document_json(
+                        json_template, pid, acronym, volume, number, year, file_name
+                    )
+                    data['xml'] = xml_template
+                    dump.write(json.dumps(data) + '\n')
+
+                    pids.append(pid)
+
+    with open(os.path.join(corpus_dir, 'pids.txt'), 'w') as f:
+        f.write('\n'.join(pids) + '\n')
+
+    with open(os.path.join(corpus_dir, 'settings.json'), 'w') as f:
+        json.dump(settings.as_dict(), f, indent=2, sort_keys=True)
+
+    store_path = os.path.join(corpus_dir, 'articlemeta.db')
+
+    if os.path.exists(store_path):
+        os.remove(store_path)
+
+    sources.LocalStore(store_path).import_dump(os.path.join(corpus_dir, 'articlemeta.ndjson'))
+
+    logging.info('Synthetic corpus with %d documents writen at (%s)', len(pids), corpus_dir)
+
+    return pids
+
+
+def argp():
+    parser = argparse.ArgumentParser(
+        description="Build a synthetic legacy site to benchmark the packaging")
+
+    defaults = Settings()
+
+    parser.add_argument('corpus_dir', help='Directory to receive the corpus')
+    parser.add_argument('--version', default=defaults.version, choices=['sps', 'legacy'])
+    parser.add_argument('--journals', type=int, default=defaults.journals)
+    parser.add_argument('--issues', type=int, default=defaults.issues, help='Issues per journal')
+    parser.add_argument('--articles', type=int, default=defaults.articles, help='Articles per issue')
+    parser.add_argument('--html_size', type=int, default=defaults.html_size, help='Average size in KB of the document body')
+    parser.add_argument('--images', type=int, default=defaults.images, help='Images per document')
+    parser.add_argument('--image_size', type=int, default=defaults.image_size, help='Size in KB of each image')
+    parser.add_argument('--pdf_size', type=int, default=defaults.pdf_size, help='Size in KB of each pdf')
+    parser.add_argument('--languages', type=int, default=defaults.languages, help='Languages per document')
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    settings = Settings(**{k: v for k, v in vars(args).items() if k != 'corpus_dir'})
+
+    generate(args.corpus_dir, settings)
+
+
+if __name__ == "__main__":
+
+    argp()
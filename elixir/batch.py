@@ -0,0 +1,454 @@
+import sys
+import time
+import logging
+import functools
+import multiprocessing
+from collections import namedtuple
+
+from elixir import budget
+from elixir import feedstock
+from elixir import fetcher
+from elixir import index
+from elixir import references
+from elixir import timing
+from elixir import metrics
+from elixir import logs
+from elixir import writers
+
+SUCCESS = 'success'
+FAILURE = 'failure'
+SKIPPED = 'skipped'
+
+DEFAULT_CHUNKSIZE = 16
+DEFAULT_WINDOW = 1000
+
+Result = namedtuple(
+    'Result', ['pid', 'status', 'error', 'elapsed', 'timings'], defaults=(None,)
+)
+
+
+def read_pids(source):
+    """
+    This method retrieve the PIDs listed in a file, one PID per line. Blank
+    lines and lines starting with # are ignored.
+
+    Keyword arguments:
+    source -- path to a file with PIDs, '-' to read from the standard input or
+    an already opened file like object.
+    """
+
+    if source == '-':
+        fp = sys.stdin
+    elif isinstance(source, str):
+        fp = open(source, 'r')
+    else:
+        fp = source
+
+    try:
+        for line in fp:
+            pid = line.strip()
+
+            if not pid or pid.startswith('#'):
+                continue
+
+            yield pid
+    finally:
+        if fp is not source and fp is not sys.stdin:
+            fp.close()
+
+
+def pack(pid, source_dir='.', deposit_dir=None, xml=None, raw_data=None,
+         compression=None, incremental=False, package_format=writers.DEFAULT_FORMAT):
+    """
+    This method pack a single document and retrieve a Result. Any exception
+    raised while packing is recorded in the Result instead of being raised, so
+    one broken document does not abort a batch.
+
+    Keyword arguments:
+    pid -- document ID, must be the PID number.
+    source_dir -- source directory where the pdf, images and html's could be fetched.
+    deposit_dir -- directory to receive the packages.
+    xml -- XML already retrieved from ArticleMeta, fetched when None.
+    raw_data -- xylose Article already retrieved from ArticleMeta, fetched when None.
+    compression -- utils.CompressionPolicy of the package members.
+    incremental -- when True, documents whose package is up to date with its
+    manifest are skipped.
+    package_format -- format of the package, see writers.FORMATS.
+
+    When the reference index is enabled, the source files referenced by the
+    document are recorded in it, see references.configure. When the timing is
+    enabled, the stages of the packing are timed, see timing.document, and
+    the timing is kept in the Result. A summary of the document is logged,
+    see logs.log_document.
+    """
+
+    start = time.time()
+    timings = None
+    article = None
+
+    try:
+        with timing.document(pid) as timings:
+            status, article = _pack(
+                pid, source_dir, deposit_dir, xml, raw_data, compression, incremental,
+                package_format
+            )
+    except Exception as e:
+        result = Result(
+            pid, FAILURE, '%s: %s' % (e.__class__.__name__, e), time.time() - start,
+            timings.as_dict() if timings else None
+        )
+        logs.log_document(result)
+        return result
+
+    result = Result(
+        pid, status, None, time.time() - start, timings.as_dict() if timings else None
+    )
+    logs.log_document(result, article)
+
+    return result
+
+
+def _pack(pid, source_dir, deposit_dir, xml, raw_data, compression, incremental,
+          package_format):
+
+    if not feedstock.is_valid_pid(pid):
+        raise ValueError(u'Invalid PID: %s' % pid)
+
+    if xml is None:
+        xml = feedstock.loadXML(pid)
+
+    if raw_data is None:
+        raw_data = feedstock.load_rawdata(pid)
+
+    article = feedstock.Article(pid, xml, raw_data, source_dir, deposit_dir)
+
+    if incremental and article.is_up_to_date(package_format=package_format):
+        status = SKIPPED
+    else:
+        article.wrap_document(compression=compression, package_format=package_format)
+        status = SUCCESS
+
+    reference_index = references.get_references()
+
+    if reference_index is not None:
+        reference_index.update(pid, article.referenced_sources)
+
+    return (status, article)
+
+
+def pack_fetched(fetched, source_dir='.', deposit_dir=None, **options):
+    """
+    This method pack a document from a fetcher.Fetched tuple and retrieve a
+    Result. A failed fetch is reported as a failed Result. The options are
+    given to pack.
+    """
+
+    if fetched.error:
+        return Result(fetched.pid, FAILURE, fetched.error, 0.0)
+
+    return pack(
+        fetched.pid,
+        source_dir,
+        deposit_dir,
+        xml=fetched.xml,
+        raw_data=fetched.raw_data,
+        **options
+    )
+
+
+def issue_key(fetched):
+    """
+    This method retrieve the (journal_acronym, issue_label) of a
+    fetcher.Fetched tuple, or None when the metadata is not available.
+    """
+
+    if fetched.error:
+        return None
+
+    try:
+        return (
+            fetched.raw_data.journal_acronym,
+            feedstock.issue_label(fetched.raw_data)
+        )
+    except Exception as e:
+        logging.warning('Unable to resolve the issue of (%s): %s', fetched.pid, e)
+        return None
+
+
+def group_by_issue(items, window=DEFAULT_WINDOW):
+    """
+    This method retrieve a generator of lists of fetcher.Fetched tuples of
+    the same issue. The items are read window at a time, so only the
+    documents of the same issue close to each other in the input are
+    grouped, which is the case of PID lists sorted by issue. Documents with
+    unknown issue are retrieved alone.
+
+    Keyword arguments:
+    items -- iterable of fetcher.Fetched tuples.
+    window -- number of items grouped at a time.
+    """
+
+    groups = {}
+    size = 0
+
+    for item in items:
+        key = issue_key(item)
+
+        if key is None:
+            yield [item]
+            continue
+
+        groups.setdefault(key, []).append(item)
+        size += 1
+
+        if size >= window:
+            for group in groups.values():
+                yield group
+            groups = {}
+            size = 0
+
+    for group in groups.values():
+        yield group
+
+
+def pack_group(group, source_dir='.', deposit_dir=None, **options):
+    """
+    This method pack a list of fetcher.Fetched tuples of the same issue and
+    retrieve the list of Results. The issue directories are scanned once for
+    the whole group and dropped from the source index afterwards. The options
+    are given to pack.
+    """
+
+    results = [
+        pack_fetched(x, source_dir, deposit_dir, **options) for x in group
+    ]
+
+    key = issue_key(group[0])
+
+    if key is not None:
+        index.get_index(source_dir).forget(*key)
+
+    return results
+
+
+class Summary(object):
+    """
+    Aggregates the Results of a batch run. Only the failures are kept in
+    memory, the successes are just counted. When a report file like object is
+    given, one tab separated line (pid, status, error) is written per Result.
+    """
+
+    def __init__(self, report=None):
+        self.report = report
+        self.succeeded = 0
+        self.skipped = 0
+        self.failures = []
+        self.elapsed = 0.0
+        self._start = time.time()
+
+    @property
+    def failed(self):
+        return len(self.failures)
+
+    @property
+    def total(self):
+        return self.succeeded + self.skipped + self.failed
+
+    def add(self, result):
+
+        self.elapsed += result.elapsed
+
+        if result.status == SUCCESS:
+            self.succeeded += 1
+        elif result.status == SKIPPED:
+            self.skipped += 1
+        else:
+            self.failures.append((result.pid, result.error))
+
+        if self.report:
+            self.report.write(
+                '%s\t%s\t%s\n' % (result.pid, result.status, result.error or '')
+            )
+
+        return result
+
+    def as_dict(self):
+
+        return {
+            'total': self.total,
+            'succeeded': self.succeeded,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'wall_time': time.time() - self._start,
+            'packing_time': self.elapsed
+        }
+
+    def log(self):
+
+        data = self.as_dict()
+
+        logging.info(
+            'Batch finished: %d documents, %d succeeded, %d skipped, %d failed in %.2fs',
+            data['total'],
+            data['succeeded'],
+            data['skipped'],
+            data['failed'],
+            data['wall_time']
+        )
+
+        for pid, error in self.failures:
+            logging.warning('Failed (%s): %s', pid, error)
+
+
+def _tracked(items, collector):
+    """
+    This method retrieve the given items, accounting them in the metrics
+    collector as they are dispatched.
+    """
+
+    for item in items:
+        documents = item if isinstance(item, list) else [item]
+
+        for document in documents:
+            if isinstance(document, fetcher.Fetched) and document.elapsed is not None:
+                collector.observe_fetch(document.elapsed)
+
+        collector.submitted(len(documents))
+
+        yield item
+
+
+def _admitted(items, admission, estimator):
+    """
+    This method retrieve the given fetcher.Fetched tuples, or groups of them,
+    as their estimated footprint fits in the memory budget. The documents of
+    a group are packed one after another, so the group reserves the largest
+    footprint of its documents under the PID of the first one.
+    """
+
+    for item in items:
+        documents = item if isinstance(item, list) else [item]
+
+        admission.acquire(
+            documents[0].pid,
+            max([estimator.footprint(x) for x in documents])
+        )
+
+        yield item
+
+
+def run(pids, source_dir='.', deposit_dir=None, report=None, workers=1,
+        chunksize=DEFAULT_CHUNKSIZE, concurrency=None, compression=None,
+        by_issue=False, window=DEFAULT_WINDOW, incremental=False,
+        memory_budget=None, package_format=writers.DEFAULT_FORMAT, job_queue=None):
+    """
+    This method pack all the given PIDs and retrieve a Summary of the run.
+    With a single worker the documents are packed one after another in the
+    current process, otherwise they are dispatched in chunks to a pool of
+    worker processes and the Results are aggregated as they come back.
+
+    Keyword arguments:
+    pids -- iterable of PIDs.
+    source_dir -- source directory where the pdf, images and html's could be fetched.
+    deposit_dir -- directory to receive the packages.
+    report -- file like object to record the status of each PID.
+    workers -- number of worker processes, default is 1.
+    chunksize -- number of PIDs sent to a worker at a time.
+    concurrency -- when given, the metadata is fetched ahead by the fetcher
+    module keeping this number of documents in flight.
+    compression -- utils.CompressionPolicy of the package members.
+    by_issue -- when True, the metadata is fetched first and the documents of
+    the same issue are packed together by the same worker, see group_by_issue.
+    window -- number of documents grouped by issue at a time.
+    incremental -- when True, documents with an up to date package are skipped.
+    memory_budget -- when given, the budget in bytes of the estimated memory of
+    the documents being packed at a time, see budget.MemoryBudget. The
+    metadata is then fetched ahead to estimate the footprint of each document
+    and the documents are dispatched one at a time.
+    package_format -- format of the packages, see writers.FORMATS.
+    job_queue -- when given, the jobqueue.JobQueue the PIDs were claimed from,
+    the Result of each PID is recorded in it as it comes back.
+
+    When the metrics are enabled, the Results are accounted in them, see
+    metrics.configure.
+    """
+
+    summary = Summary(report)
+    collector = metrics.get_metrics()
+    options = {
+        'compression': compression,
+        'incremental': incremental,
+        'package_format': package_format
+    }
+
+    admission = None
+
+    if memory_budget:
+        admission = budget.MemoryBudget(memory_budget)
+        concurrency = concurrency or fetcher.DEFAULT_CONCURRENCY
+
+    def collect(results):
+        for result in (results if by_issue else [results]):
+            summary.add(result)
+
+            if admission is not None:
+                admission.release(result.pid)
+
+            if job_queue is not None:
+                job_queue.complete(result)
+
+            if collector is not None:
+                collector.observe(result)
+
+    if by_issue:
+        items = group_by_issue(
+            fetcher.prefetch(pids, concurrency or fetcher.DEFAULT_CONCURRENCY),
+            window
+        )
+        task = functools.partial(
+            pack_group,
+            source_dir=source_dir,
+            deposit_dir=deposit_dir,
+            **options
+        )
+        chunksize = 1
+    elif concurrency:
+        items = fetcher.prefetch(pids, concurrency)
+        task = functools.partial(
+            pack_fetched,
+            source_dir=source_dir,
+            deposit_dir=deposit_dir,
+            **options
+        )
+    else:
+        items = pids
+        task = functools.partial(
+            pack,
+            source_dir=source_dir,
+            deposit_dir=deposit_dir,
+            **options
+        )
+
+    if admission is not None:
+        logging.info('Packing with a memory budget of %d MB', admission.limit // budget.MB)
+        items = _admitted(items, admission, budget.Estimator(source_dir))
+        chunksize = 1
+
+    if collector is not None:
+        items = _tracked(items, collector)
+
+    if workers > 1:
+        logging.info('Packing with %d workers', workers)
+        with multiprocessing.Pool(processes=workers) as pool:
+            for results in pool.imap_unordered(task, items, chunksize):
+                collect(results)
+    else:
+        for item in items:
+            collect(task(item))
+
+    summary.log()
+
+    if admission is not None and admission.oversized:
+        logging.info('%d documents above the memory budget packed alone', admission.oversized)
+
+    return summary
@@ -0,0 +1,167 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+from elixir import feedstock
+from elixir import index
+from elixir import readahead
+
+MB = 1024 * 1024
+
+BASE_FOOTPRINT = 16 * MB
+
+DOCUMENT_FACTOR = 10
+
+DEFAULT_ISSUES = 64
+
+
+class Estimator(object):
+    """
+    Estimate the memory used to pack a document from the size of its source
+    files, before packing it. The html's and xml's of the document are read,
+    decoded and parsed in memory, so they count DOCUMENT_FACTOR times their
+    size. The images and pdfs are copied to the package in chunks and only
+    account for the BASE_FOOTPRINT of a document and the files read ahead,
+    see readahead.buffered.
+
+    The source directories of the last issues seen are kept in an index of
+    its own, the older ones are forgotten.
+
+    Keyword arguments:
+    source_dir -- source directory where the pdf, images and html's could be fetched.
+    issues -- number of issues kept in the index.
+    """
+
+    KINDS = ('html', 'xml')
+
+    def __init__(self, source_dir='.', issues=DEFAULT_ISSUES):
+        self.source_index = index.SourceIndex(source_dir)
+        self.issues = issues
+        self._seen = OrderedDict()
+
+    def _issue(self, key):
+
+        self._seen[key] = True
+        self._seen.move_to_end(key)
+
+        while len(self._seen) > self.issues:
+            old, _ = self._seen.popitem(last=False)
+            self.source_index.forget(*old)
+
+    def documents_size(self, journal_acronym, issue_label, file_code):
+        """
+        This method retrieve the size in bytes of the html's and xml's of a
+        document found in the source directory.
+        """
+
+        self._issue((journal_acronym, issue_label))
+
+        size = 0
+        file_code = file_code.lower()
+
+        for kind in self.KINDS:
+            if not os.path.isdir(self.source_index.path(kind, journal_acronym, issue_label)):
+                continue
+
+            entries = self.source_index.entries(kind, journal_acronym, issue_label)
+            size += sum([x.size for x in entries if file_code in x.name])
+
+        return size
+
+    def footprint(self, fetched):
+        """
+        This method retrieve the estimated memory, in bytes, to pack a document
+        from a fetcher.Fetched tuple. Documents without metadata take just the
+        base footprint.
+        """
+
+        base = BASE_FOOTPRINT + readahead.buffered()
+
+        if fetched.error:
+            return base
+
+        try:
+            size = self.documents_size(
+                fetched.raw_data.journal_acronym,
+                feedstock.issue_label(fetched.raw_data),
+                fetched.raw_data.file_code
+            )
+        except Exception as e:
+            logging.debug('Unable to estimate the footprint of (%s): %s', fetched.pid, e)
+            return base
+
+        return base + DOCUMENT_FACTOR * size
+
+
+class MemoryBudget(object):
+    """
+    Global memory budget of the documents being packed at the same time.
+    Work is admitted while the estimated footprints reserved fit in the
+    limit. A work larger than the limit is admitted only when nothing else is
+    reserved, and nothing else is admitted until it is released, so it is
+    packed alone.
+
+    Keyword arguments:
+    limit -- budget in bytes.
+    """
+
+    def __init__(self, limit):
+
+        if limit <= 0:
+            raise ValueError('Memory budget must be positive, given: %s' % limit)
+
+        self.limit = limit
+        self.reserved = 0
+        self.oversized = 0
+        self._reservations = {}
+        self._condition = threading.Condition()
+
+    def _fits(self, size):
+
+        if size > self.limit:
+            return self.reserved == 0
+
+        return self.reserved + size <= self.limit
+
+    def acquire(self, key, size):
+        """
+        This method block until the footprint fits in the budget and reserve
+        it under the given key.
+
+        Keyword arguments:
+        key -- key to release the reservation, usually the PID.
+        size -- estimated footprint in bytes.
+        """
+
+        with self._condition:
+            if size > self.limit:
+                self.oversized += 1
+                logging.info(
+                    'Document (%s) above the memory budget (%d MB), packing it alone',
+                    key, size // MB
+                )
+
+            self._condition.wait_for(lambda: self._fits(size))
+
+            self.reserved += size
+            self._reservations.setdefault(key, []).append(size)
+
+    def release(self, key):
+        """
+        This method release a reservation made by acquire, unknown keys are
+        ignored.
+        """
+
+        with self._condition:
+            sizes = self._reservations.get(key)
+
+            if not sizes:
+                return
+
+            self.reserved -= sizes.pop()
+
+            if not sizes:
+                del self._reservations[key]
+
+            self._condition.notify_all()
@@ -0,0 +1,232 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import tempfile
+from collections import namedtuple
+
+_settings = {}
+_cache = None
+
+LOW_WATERMARK = 0.9
+
+RESCAN_INTERVAL = 60
+
+
+class Entry(namedtuple('Entry', ['key', 'body', 'etag', 'last_modified', 'stored_at'])):
+
+    def validators(self):
+        """
+        This method retrieve the HTTP headers used to revalidate the entry.
+        """
+
+        headers = {}
+
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        return headers
+
+
+class ResponseCache(object):
+    """
+    Persistent cache of ArticleMeta responses. Each entry is stored gzip
+    compressed in its own file under the cache directory. Entries younger than
+    ttl seconds are fresh, the older ones must be revalidated using their
+    ETag/Last-Modified values. When max_size bytes is exceeded, the least
+    recently used entries are evicted down to low_watermark * max_size, so
+    the directory is walked once per eviction and not on every entry stored.
+
+    The size of the entries is tracked by each process and recomputed from
+    the directory every RESCAN_INTERVAL seconds, to account for the entries
+    stored by the other processes sharing the directory.
+
+    Keyword arguments:
+    directory -- directory to store the entries.
+    ttl -- seconds an entry is fresh, None for entries that never expire.
+    max_size -- maximum size in bytes of the stored entries, None for no limit.
+    low_watermark -- fraction of max_size kept after an eviction.
+    """
+
+    def __init__(self, directory, ttl=None, max_size=None, low_watermark=LOW_WATERMARK):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self.low_watermark = low_watermark
+        self._size = None
+        self._scanned = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+        return os.path.join(self.directory, digest[:2], '%s.json.gz' % digest)
+
+    def _entries(self):
+        for dirpath, dirnames, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith('.json.gz'):
+                    yield os.path.join(dirpath, filename)
+
+    def _stats(self):
+        """
+        This method retrieve the (mtime, size, path) of the stored entries.
+        Entries removed meanwhile by another process sharing the directory are
+        skipped.
+        """
+
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+
+            yield (stat.st_mtime, stat.st_size, path)
+
+    def get(self, key):
+        """
+        This method retrieve the Entry stored for the given key, or None.
+        """
+
+        path = self._path(key)
+
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            logging.debug('Cache miss (%s)', key)
+            return None
+        except (OSError, ValueError, EOFError):
+            logging.warning('Corrupted cache entry (%s), discarding it', key)
+            self.delete(key)
+            return None
+
+        return Entry(**data)
+
+    def is_fresh(self, entry):
+
+        if self.ttl is None:
+            return True
+
+        return time.time() - entry.stored_at < self.ttl
+
+    def set(self, key, body, etag=None, last_modified=None, stored_at=None):
+
+        path = self._path(key)
+        entry = Entry(key, body, etag, last_modified, stored_at or time.time())
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        try:
+            previous = os.path.getsize(path)
+        except OSError:
+            previous = 0
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw:
+                with gzip.open(raw, 'wt', encoding='utf-8') as f:
+                    json.dump(entry._asdict(), f)
+            length = os.path.getsize(tmp)
+            os.replace(tmp, path)
+        except:
+            os.remove(tmp)
+            raise
+
+        if self._size is not None:
+            self._size += length - previous
+
+        self._evict()
+
+        return entry
+
+    def touch(self, key):
+        """
+        This method mark the entry for the given key as fresh again, used
+        when the server confirms the entry was not modified.
+        """
+
+        entry = self.get(key)
+
+        if entry is None:
+            return None
+
+        return self.set(key, entry.body, entry.etag, entry.last_modified)
+
+    def delete(self, key):
+
+        path = self._path(key)
+
+        try:
+            length = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+
+        if self._size is not None:
+            self._size -= length
+
+    def size(self):
+
+        if self._size is None or time.time() - self._scanned > RESCAN_INTERVAL:
+            self._size = sum([x[1] for x in self._stats()])
+            self._scanned = time.time()
+
+        return self._size
+
+    def _evict(self):
+
+        if self.max_size is None or self.size() <= self.max_size:
+            return
+
+        entries = sorted(self._stats())
+
+        target = int(self.max_size * self.low_watermark)
+        size = sum([x[1] for x in entries])
+        for mtime, length, path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= length
+            logging.debug('Cache entry evicted (%s)', path)
+
+        self._size = size
+        self._scanned = time.time()
+
+
+def configure(directory=None, **kwargs):
+    """
+    This method set the ResponseCache used by the current process, a None
+    directory disables the cache.
+    """
+    global _cache
+
+    _settings.clear()
+
+    if directory:
+        _settings.update(kwargs, directory=directory)
+
+    _cache = None
+
+
+def get_cache():
+    """
+    This method retrieve the ResponseCache of the current process or None when
+    the cache is disabled.
+    """
+    global _cache
+
+    if _cache is None and _settings:
+        _cache = ResponseCache(**_settings)
+
+    return _cache
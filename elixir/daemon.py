@@ -0,0 +1,358 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+from socketserver import ThreadingMixIn, UnixStreamServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from elixir import batch
+from elixir import feedstock
+from elixir import fetcher
+from elixir import index
+from elixir import metrics
+from elixir import writers
+
+QUEUED = 'queued'
+RUNNING = 'running'
+
+DEFAULT_HISTORY = 1000
+
+MAX_WAIT = 300
+
+LOCKS = 64
+
+
+class Job(object):
+    """
+    Packing of a document requested to the Daemon.
+
+    Keyword arguments:
+    pid -- document ID.
+    incremental -- when True, the document is skipped if its package is up to date.
+    package_format -- format of the package, see writers.FORMATS.
+    """
+
+    def __init__(self, pid, incremental=False, package_format=writers.DEFAULT_FORMAT):
+        self.id = uuid.uuid4().hex
+        self.pid = pid
+        self.incremental = incremental
+        self.package_format = package_format
+        self.status = QUEUED
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.package = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        This method wait for the job to finish and retrieve True when it did.
+        """
+
+        return self._done.wait(timeout)
+
+    def as_dict(self):
+
+        data = {
+            'id': self.id,
+            'pid': self.pid,
+            'status': self.status,
+            'format': self.package_format,
+            'incremental': self.incremental,
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished
+        }
+
+        if self.result is not None:
+            data['error'] = self.result.error
+            data['elapsed'] = self.result.elapsed
+            data['package'] = self.package
+
+        return data
+
+
+class Daemon(object):
+    """
+    Long running packer. The jobs are packed by a pool of threads of the
+    current process, so the source index, the metadata cache and the HTTP
+    session pool stay warm between jobs. Before each job, the source
+    directories of the issue of the document are rescanned if they changed.
+    Jobs of the same document are packed one after another.
+
+    The last history jobs are kept to report their status.
+
+    Keyword arguments:
+    source_dir -- source directory where the pdf, images and html's could be fetched.
+    deposit_dir -- directory to receive the packages.
+    workers -- number of jobs packed at a time.
+    compression -- utils.CompressionPolicy of the package members.
+    history -- number of finished jobs kept.
+    """
+
+    def __init__(self, source_dir='.', deposit_dir=None, workers=1, compression=None,
+                 history=DEFAULT_HISTORY):
+        self.source_dir = source_dir
+        self.deposit_dir = deposit_dir or '.'
+        self.compression = compression
+        self.history = history
+        self.start = time.time()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._documents = [threading.Lock() for _ in range(LOCKS)]
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix='elixir-daemon'
+        )
+
+    def submit(self, pid, incremental=False, package_format=writers.DEFAULT_FORMAT):
+        """
+        This method queue the packing of a document and retrieve its Job.
+        """
+
+        if not feedstock.is_valid_pid(pid):
+            raise ValueError(u'Invalid PID: %s' % pid)
+
+        writers.extension(package_format)
+
+        job = Job(pid, incremental, package_format)
+
+        with self._lock:
+            self._jobs[job.id] = job
+            self._forget()
+
+        collector = metrics.get_metrics()
+
+        if collector is not None:
+            collector.submitted()
+
+        self._executor.submit(self._run, job)
+
+        logging.debug('Job (%s) queued for (%s)', job.id, pid)
+
+        return job
+
+    def _forget(self):
+
+        finished = [k for k, v in self._jobs.items() if v.done]
+
+        for key in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[key]
+
+    def _run(self, job):
+
+        with self._documents[hash(job.pid) % LOCKS]:
+            self._pack(job)
+
+        job._done.set()
+
+        collector = metrics.get_metrics()
+
+        if collector is not None:
+            collector.observe(job.result)
+
+    def _pack(self, job):
+
+        job.status = RUNNING
+        job.started = time.time()
+
+        stage = 'fetch metadata'
+
+        try:
+            xml = feedstock.loadXML(job.pid)
+            raw_data = feedstock.load_rawdata(job.pid)
+
+            stage = 'refresh the index'
+            key = batch.issue_key(fetcher.Fetched(job.pid, xml, raw_data, None))
+
+            if key is not None:
+                index.get_index(self.source_dir).refresh(*key)
+
+            stage = 'pack'
+            job.result = batch.pack(
+                job.pid,
+                self.source_dir,
+                self.deposit_dir,
+                xml=xml,
+                raw_data=raw_data,
+                compression=self.compression,
+                incremental=job.incremental,
+                package_format=job.package_format
+            )
+        except Exception as e:
+            logging.error('Unable to %s for (%s): %s', stage, job.pid, e)
+            job.result = batch.Result(
+                job.pid, batch.FAILURE, '%s: %s' % (e.__class__.__name__, e),
+                time.time() - job.started
+            )
+
+        if job.result.status != batch.FAILURE:
+            job.package = '/'.join([
+                self.deposit_dir, job.pid + writers.extension(job.package_format)
+            ])
+
+        job.status = job.result.status
+        job.finished = time.time()
+
+    def job(self, job_id):
+        """
+        This method retrieve a Job by its id, or None.
+        """
+
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+
+        with self._lock:
+            return list(self._jobs.values())
+
+    def status(self):
+        """
+        This method retrieve the counts of the jobs kept by status and the
+        state of the warm caches.
+        """
+
+        counts = {}
+
+        for job in self.jobs():
+            counts[job.status] = counts.get(job.status, 0) + 1
+
+        return {
+            'uptime': time.time() - self.start,
+            'jobs': counts,
+            'indexed_directories': len(index.get_index(self.source_dir))
+        }
+
+    def close(self, wait=True):
+
+        self._executor.shutdown(wait=wait)
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of the Daemon:
+
+    POST /jobs {"pid": ..., "incremental": false, "format": "zip"} queue a job.
+    GET /jobs/<id> retrieve the status of a job.
+    GET /jobs retrieve the status of the jobs kept.
+    GET /status retrieve the status of the daemon.
+
+    POST /jobs and GET /jobs/<id> take a wait=<seconds> parameter to wait
+    for the job to finish before answering.
+    """
+
+    def _send(self, code, data):
+
+        body = json.dumps(data, sort_keys=True).encode('utf-8')
+
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _wait(self, job, query):
+
+        try:
+            wait = min(float(query.get('wait', ['0'])[0]), MAX_WAIT)
+        except ValueError:
+            wait = 0
+
+        if wait > 0:
+            job.wait(wait)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.rstrip('/')
+        daemon = self.server.daemon
+
+        if path == '/status':
+            self._send(200, daemon.status())
+        elif path == '/jobs':
+            self._send(200, [x.as_dict() for x in daemon.jobs()])
+        elif path.startswith('/jobs/'):
+            job = daemon.job(path[len('/jobs/'):])
+
+            if job is None:
+                self._send(404, {'error': 'Job not found'})
+                return
+
+            self._wait(job, parse_qs(url.query))
+            self._send(200, job.as_dict())
+        else:
+            self._send(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+
+        if url.path.rstrip('/') != '/jobs':
+            self._send(404, {'error': 'Not found'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            data = json.loads(self.rfile.read(length).decode('utf-8') or '{}')
+            job = self.server.daemon.submit(
+                data.get('pid'),
+                incremental=bool(data.get('incremental', False)),
+                package_format=data.get('format', writers.DEFAULT_FORMAT)
+            )
+        except (ValueError, TypeError, AttributeError) as e:
+            self._send(400, {'error': str(e)})
+            return
+
+        self._wait(job, parse_qs(url.query))
+        self._send(200 if job.done else 202, job.as_dict())
+
+    def address_string(self):
+
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+
+        return self.server.server_address
+
+    def log_message(self, format, *args):
+        logging.debug('Daemon API: ' + format, *args)
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+
+    daemon_threads = True
+
+    def server_bind(self):
+        UnixStreamServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def make_server(daemon, host='127.0.0.1', port=None, socket_path=None):
+    """
+    This method retrieve the HTTP server of the Daemon API, listening at the
+    Unix socket when a socket_path is given, or at host and port otherwise.
+    A previous socket file is replaced.
+    """
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+        server = UnixHTTPServer(socket_path, DaemonHandler)
+        logging.info('Daemon listening at (%s)', socket_path)
+    else:
+        server = ThreadingHTTPServer((host, port or 0), DaemonHandler)
+        server.daemon_threads = True
+        logging.info('Daemon listening at (http://%s:%d)', *server.server_address[:2])
+
+    server.daemon = daemon
+
+    return server
@@ -1,12 +1,30 @@
+import os
+import sys
+import time
+import json
 import argparse
 import logging
 
 from elixir import feedstock
+from elixir import batch
+from elixir import fetcher
+from elixir import session
+from elixir import cache
+from elixir import sources
+from elixir import references
+from elixir import timing
+from elixir import metrics
+from elixir import logs
+from elixir import utils
+from elixir import writers
+from elixir import readahead
+from elixir import daemon
+from elixir import jobqueue
 
 __version__ = '0.0.1'
 
 
-def _config_logging(logging_level='INFO', logging_file=None):
+def _config_logging(logging_level='INFO', logging_file=None, log_format='text'):
 
     allowed_levels = {
         'DEBUG': logging.DEBUG,
@@ -16,29 +34,238 @@ def _config_logging(logging_level='INFO', logging_file=None):
         'CRITICAL': logging.CRITICAL
     }
 
-    logging_config = {
-        'level': allowed_levels.get(logging_level, 'INFO'),
-        'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    }
+    logging.basicConfig(
+        level=allowed_levels.get(logging_level, 'INFO'),
+        handlers=[logs.handler(logging_file, log_format)]
+    )
+
+    if log_format == 'json':
+        timing.enable()
+
+
+def _config_session(timeout=None, retries=None, concurrency=None):
+
+    settings = {}
+
+    if concurrency:
+        settings['pool_size'] = max(session.DEFAULT_POOL_SIZE, concurrency * 2)
+
+    if timeout:
+        settings['timeout'] = timeout
+
+    if retries is not None:
+        settings['retries'] = retries
+
+    session.configure(**settings)
+
+
+def _config_cache(cache_dir=None, cache_ttl=None, cache_size=None):
+
+    cache.configure(
+        cache_dir,
+        ttl=cache_ttl,
+        max_size=cache_size * 1024 * 1024 if cache_size else None
+    )
+
+
+def _config_source(articlemeta_url=None, store=None):
+
+    if store:
+        sources.configure(sources.LocalStore(store))
+    elif articlemeta_url:
+        sources.configure(sources.ArticleMetaSource(articlemeta_url))
+    else:
+        sources.configure()
+
+
+def _config_references(reference_index=None, source_dir='.'):
+
+    references.configure(reference_index, source_dir)
+
+
+def _config_timing(timing_log=None):
+
+    timing.configure(timing_log)
+
 
-    if logging_file:
-        logging_config['filename'] = logging_file
+def _config_readahead(readers=None):
 
-    logging.basicConfig(**logging_config)
+    readahead.configure(readers)
 
 
-def main(pid, source_dir='.', logging_level='Info', logging_file=None, deposit_dir=None):
+def _config_metrics(metrics_file=None, metrics_interval=None, metrics_port=None):
 
-    _config_logging(logging_level, logging_file)
+    return metrics.configure(
+        metrics_file,
+        interval=metrics_interval or metrics.DEFAULT_INTERVAL,
+        port=metrics_port
+    )
+
+
+def changed_pids(changed_files, reference_index, source_dir='.'):
+    """
+    This method retrieve the PIDs of the documents referencing the changed
+    source files, listed one per line in changed_files.
+    """
+
+    paths = list(batch.read_pids(changed_files))
+
+    return references.ReferenceIndex(reference_index, source_dir).pids(*paths)
+
+
+def import_main(dump, store, logging_level='Info', logging_file=None, log_format='text'):
+
+    _config_logging(logging_level, logging_file, log_format)
+
+    logging.info('Importing (%s) into (%s)', dump, store)
+
+    return sources.LocalStore(store).import_dump(dump)
+
+
+def main(pid, source_dir='.', logging_level='Info', logging_file=None, deposit_dir=None,
+         timeout=None, retries=None, cache_dir=None, cache_ttl=None, cache_size=None,
+         articlemeta_url=None, store=None, compression=None, reference_index=None,
+         timing_log=None, log_format='text', package_format=writers.DEFAULT_FORMAT,
+         readers=None):
+
+    _config_logging(logging_level, logging_file, log_format)
+    _config_session(timeout, retries)
+    _config_cache(cache_dir, cache_ttl, cache_size)
+    _config_source(articlemeta_url, store)
+    _config_references(reference_index, source_dir)
+    _config_timing(timing_log)
+    _config_readahead(readers)
 
     logging.info('Starting to pack a document')
 
     if feedstock.is_valid_pid(pid):
-        xml = feedstock.loadXML(pid)
-        raw_data = feedstock.load_rawdata(pid)
-        article = feedstock.Article(pid, xml, raw_data, source_dir, deposit_dir)
+        start = time.time()
+
+        with timing.document(pid) as timings:
+            xml = feedstock.loadXML(pid)
+            raw_data = feedstock.load_rawdata(pid)
+            article = feedstock.Article(pid, xml, raw_data, source_dir, deposit_dir)
+
+            article.wrap_document(compression=compression, package_format=package_format)
+
+        if references.get_references() is not None:
+            references.get_references().update(pid, article.referenced_sources)
+
+        logs.log_document(
+            batch.Result(
+                pid, batch.SUCCESS, None, time.time() - start,
+                timings.as_dict() if timings else None
+            ),
+            article
+        )
+
+
+def batch_main(pid_file, source_dir='.', logging_level='Info', logging_file=None,
+               deposit_dir=None, report_file=None, workers=1,
+               chunksize=batch.DEFAULT_CHUNKSIZE, timeout=None, retries=None,
+               concurrency=None, cache_dir=None, cache_ttl=None, cache_size=None,
+               articlemeta_url=None, store=None, compression=None, by_issue=False,
+               window=batch.DEFAULT_WINDOW, incremental=False, reference_index=None,
+               changed_files=None, timing_log=None, metrics_file=None,
+               metrics_interval=None, metrics_port=None, log_format='text',
+               memory_budget=None, package_format=writers.DEFAULT_FORMAT, readers=None,
+               job_queue=None, lease=jobqueue.DEFAULT_LEASE,
+               max_attempts=jobqueue.DEFAULT_ATTEMPTS, retry_failed=False):
+
+    _config_logging(logging_level, logging_file, log_format)
+    _config_session(timeout, retries, concurrency)
+    _config_cache(cache_dir, cache_ttl, cache_size)
+    _config_source(articlemeta_url, store)
+    _config_references(reference_index, source_dir)
+    _config_timing(timing_log)
+    _config_readahead(readers)
+    _config_metrics(metrics_file, metrics_interval, metrics_port)
+
+    if changed_files:
+        logging.info('Starting to pack documents referencing the files from (%s)', changed_files)
+        pids = changed_pids(changed_files, reference_index, source_dir)
+    elif pid_file:
+        logging.info('Starting to pack documents from (%s)', pid_file)
+        pids = batch.read_pids(pid_file)
+    else:
+        pids = []
+
+    queue = None
+
+    if job_queue:
+        queue = jobqueue.JobQueue(job_queue, lease=lease, max_attempts=max_attempts)
+        queue.add(pids)
+
+        if retry_failed:
+            logging.info('%d failed jobs queued again', queue.retry())
 
-        article.wrap_document()
+        logging.info('Starting to pack the jobs from (%s): %s', job_queue, queue.progress())
+        pids = queue.claimed(ahead=(
+            max(1, workers) * chunksize * 2 + (concurrency or fetcher.DEFAULT_CONCURRENCY) +
+            (window if by_issue else 0)
+        ))
+
+    report = open(report_file, 'w') if report_file else None
+
+    try:
+        summary = batch.run(
+            pids,
+            source_dir=source_dir,
+            deposit_dir=deposit_dir,
+            report=report,
+            workers=workers,
+            chunksize=chunksize,
+            concurrency=concurrency,
+            compression=compression,
+            by_issue=by_issue,
+            window=window,
+            incremental=incremental,
+            memory_budget=memory_budget * 1024 * 1024 if memory_budget else None,
+            package_format=package_format,
+            job_queue=queue
+        )
+    finally:
+        if queue is not None:
+            queue.release()
+            logging.info('Jobs at (%s): %s', job_queue, queue.progress())
+        if report:
+            report.close()
+        metrics.shutdown()
+
+    return summary
+
+
+def daemon_main(source_dir='.', logging_level='Info', logging_file=None,
+                deposit_dir=None, workers=1, port=None, socket_path=None,
+                timeout=None, retries=None, cache_dir=None, cache_ttl=None,
+                cache_size=None, articlemeta_url=None, store=None, compression=None,
+                reference_index=None, timing_log=None, metrics_file=None,
+                metrics_interval=None, metrics_port=None, log_format='text',
+                readers=None):
+
+    _config_logging(logging_level, logging_file, log_format)
+    _config_session(timeout, retries, workers)
+    _config_cache(cache_dir, cache_ttl, cache_size)
+    _config_source(articlemeta_url, store)
+    _config_references(reference_index, source_dir)
+    _config_timing(timing_log)
+    _config_readahead(readers)
+    _config_metrics(metrics_file, metrics_interval, metrics_port)
+
+    packer = daemon.Daemon(source_dir, deposit_dir, workers, compression)
+    server = daemon.make_server(packer, port=port, socket_path=socket_path)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info('Daemon interrupted')
+    finally:
+        server.server_close()
+        packer.close()
+        metrics.shutdown()
+
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
 
 
 def argp():
@@ -52,6 +279,232 @@ def argp():
         help='Document ID, must be the PID number'
     )
 
+    parser.add_argument(
+        '--pid_file',
+        '-f',
+        default=None,
+        help='File with one PID per line, use - to read the PIDs from the standard input'
+    )
+
+    parser.add_argument(
+        '--report_file',
+        '-r',
+        default=None,
+        help='File to record the status of each PID when packing from a PID file'
+    )
+
+    parser.add_argument(
+        '--workers',
+        '-w',
+        type=int,
+        default=1,
+        help='Number of worker processes used when packing from a PID file, or of threads of the daemon'
+    )
+
+    parser.add_argument(
+        '--chunksize',
+        '-c',
+        type=int,
+        default=batch.DEFAULT_CHUNKSIZE,
+        help='Number of PIDs dispatched to a worker at a time'
+    )
+
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Run as a daemon packing the documents requested to its HTTP API, see elixir.daemon'
+    )
+
+    parser.add_argument(
+        '--daemon_port',
+        type=int,
+        default=None,
+        help='Port of the daemon API at http://127.0.0.1:<port>'
+    )
+
+    parser.add_argument(
+        '--daemon_socket',
+        default=None,
+        help='Unix socket of the daemon API, used instead of --daemon_port'
+    )
+
+    parser.add_argument(
+        '--memory_budget',
+        type=int,
+        default=None,
+        help='Budget in MB of the estimated memory of the documents packed at a time by all the workers, larger documents are packed alone'
+    )
+
+    parser.add_argument(
+        '--reference_index',
+        default=None,
+        help='SQLite file recording the source files used by each package, updated when packing'
+    )
+
+    parser.add_argument(
+        '--changed_files',
+        default=None,
+        help='File with one changed source file per line, use - to read from the standard input. Only the documents referencing them in --reference_index are packed'
+    )
+
+    parser.add_argument(
+        '--timing_log',
+        default=None,
+        help='JSON lines file to record the time and the bytes read and written by each stage of the packing of each document'
+    )
+
+    parser.add_argument(
+        '--metrics_file',
+        default=None,
+        help='Prometheus textfile to receive a snapshot of the batch metrics every --metrics_interval seconds'
+    )
+
+    parser.add_argument(
+        '--metrics_interval',
+        type=float,
+        default=metrics.DEFAULT_INTERVAL,
+        help='Seconds between two snapshots of the batch metrics'
+    )
+
+    parser.add_argument(
+        '--metrics_port',
+        type=int,
+        default=None,
+        help='Port to serve the batch metrics at http://127.0.0.1:<port>/metrics'
+    )
+
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Skip the documents whose package is up to date with its manifest, when packing from a PID file'
+    )
+
+    parser.add_argument(
+        '--by_issue',
+        action='store_true',
+        help='Fetch the metadata first and pack the documents of the same issue together, when packing from a PID file'
+    )
+
+    parser.add_argument(
+        '--window',
+        type=int,
+        default=batch.DEFAULT_WINDOW,
+        help='Number of documents grouped by issue at a time'
+    )
+
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=None,
+        help='Number of documents with metadata being fetched at a time when packing from a PID file'
+    )
+
+    parser.add_argument(
+        '--timeout',
+        '-t',
+        type=float,
+        default=None,
+        help='Seconds to wait for the ArticleMeta responses'
+    )
+
+    parser.add_argument(
+        '--retries',
+        type=int,
+        default=None,
+        help='Number of retries of a failed ArticleMeta request'
+    )
+
+    parser.add_argument(
+        '--articlemeta_url',
+        default=None,
+        help='ArticleMeta base url, default is %s' % sources.ARTICLEMETA_URL
+    )
+
+    parser.add_argument(
+        '--store',
+        default=None,
+        help='SQLite file with the documents metadata, when given the ArticleMeta API is not used'
+    )
+
+    parser.add_argument(
+        '--import_dump',
+        default=None,
+        help='NDJSON dump of ArticleMeta documents to import into the --store file'
+    )
+
+    parser.add_argument(
+        '--cache_dir',
+        default=None,
+        help='Directory to cache the ArticleMeta responses, if None the responses are not cached'
+    )
+
+    parser.add_argument(
+        '--cache_ttl',
+        type=int,
+        default=None,
+        help='Seconds a cached response is used before being revalidated, if None the responses never expire'
+    )
+
+    parser.add_argument(
+        '--cache_size',
+        type=int,
+        default=None,
+        help='Maximum size in MB of the cached responses, the least recently used are evicted'
+    )
+
+    parser.add_argument(
+        '--job_queue',
+        default=None,
+        help='SQLite file keeping the state of each PID of the run, see elixir.jobqueue. The PIDs are added to it and only those not done yet are packed, so an interrupted run is resumed by running it again'
+    )
+
+    parser.add_argument(
+        '--lease',
+        type=int,
+        default=jobqueue.DEFAULT_LEASE,
+        help='Seconds a PID claimed from the job queue is reserved, after that it is claimed again'
+    )
+
+    parser.add_argument(
+        '--max_attempts',
+        type=int,
+        default=jobqueue.DEFAULT_ATTEMPTS,
+        help='Number of times a PID of the job queue is tried before it is failed'
+    )
+
+    parser.add_argument(
+        '--retry_failed',
+        action='store_true',
+        help='Queue again the failed PIDs of the job queue'
+    )
+
+    parser.add_argument(
+        '--queue_status',
+        action='store_true',
+        help='Print the number of PIDs of the job queue in each state and the failed ones as JSON'
+    )
+
+    parser.add_argument(
+        '--readers',
+        type=int,
+        default=readahead.DEFAULT_READERS,
+        help='Number of threads reading ahead the source files of each package, 1 reads them one after another'
+    )
+
+    parser.add_argument(
+        '--format',
+        default=writers.DEFAULT_FORMAT,
+        choices=sorted(writers.FORMATS),
+        help='Format of the packages, dir writes each package as a plain directory'
+    )
+
+    parser.add_argument(
+        '--compression',
+        type=utils.CompressionPolicy.parse,
+        default=None,
+        help='Compression of the zip package members by extension, ex: xml,htm,html=deflate:6,*=stored. Methods: %s' % ', '.join(sorted(utils.COMPRESSION_METHODS))
+    )
+
     parser.add_argument(
         '--source_dir',
         '-s',
@@ -74,6 +527,13 @@ def argp():
         help='File to record all logging data, if None the log will be send to the standard out'
     )
 
+    parser.add_argument(
+        '--log_format',
+        default='text',
+        choices=logs.LOG_FORMATS,
+        help='Format of the log records, json writes one JSON object per line with a summary record per document'
+    )
+
     parser.add_argument(
         '--deposit_dir',
         '-d',
@@ -83,12 +543,123 @@ def argp():
 
     args = parser.parse_args()
 
+    if args.import_dump:
+        if not args.store:
+            parser.error('--import_dump requires --store')
+
+        import_main(
+            args.import_dump,
+            args.store,
+            logging_level=args.logging_level,
+            logging_file=args.logging_file,
+            log_format=args.log_format
+        )
+        return
+
+    if args.daemon:
+        if not args.daemon_port and not args.daemon_socket:
+            parser.error('--daemon requires --daemon_port or --daemon_socket')
+
+        daemon_main(
+            source_dir=args.source_dir,
+            logging_level=args.logging_level,
+            logging_file=args.logging_file,
+            deposit_dir=args.deposit_dir,
+            workers=args.workers,
+            port=args.daemon_port,
+            socket_path=args.daemon_socket,
+            timeout=args.timeout,
+            retries=args.retries,
+            cache_dir=args.cache_dir,
+            cache_ttl=args.cache_ttl,
+            cache_size=args.cache_size,
+            articlemeta_url=args.articlemeta_url,
+            store=args.store,
+            compression=args.compression,
+            reference_index=args.reference_index,
+            timing_log=args.timing_log,
+            metrics_file=args.metrics_file,
+            metrics_interval=args.metrics_interval,
+            metrics_port=args.metrics_port,
+            log_format=args.log_format,
+            readers=args.readers
+        )
+        return
+
+    if args.queue_status:
+        if not args.job_queue:
+            parser.error('--queue_status requires --job_queue')
+
+        queue = jobqueue.JobQueue(args.job_queue)
+        status = queue.progress()
+        status['failures'] = [
+            {'pid': pid, 'attempts': attempts, 'error': error}
+            for pid, attempts, error in queue.failures()
+        ]
+        print(json.dumps(status, indent=2, sort_keys=True))
+        return
+
+    if args.changed_files and not args.reference_index:
+        parser.error('--changed_files requires --reference_index')
+
+    if args.pid_file or args.changed_files or args.job_queue:
+        summary = batch_main(
+            args.pid_file,
+            source_dir=args.source_dir,
+            logging_level=args.logging_level,
+            logging_file=args.logging_file,
+            deposit_dir=args.deposit_dir,
+            report_file=args.report_file,
+            workers=args.workers,
+            chunksize=args.chunksize,
+            timeout=args.timeout,
+            retries=args.retries,
+            concurrency=args.concurrency,
+            cache_dir=args.cache_dir,
+            cache_ttl=args.cache_ttl,
+            cache_size=args.cache_size,
+            articlemeta_url=args.articlemeta_url,
+            store=args.store,
+            compression=args.compression,
+            by_issue=args.by_issue,
+            window=args.window,
+            incremental=args.incremental,
+            reference_index=args.reference_index,
+            changed_files=args.changed_files,
+            timing_log=args.timing_log,
+            metrics_file=args.metrics_file,
+            metrics_interval=args.metrics_interval,
+            metrics_port=args.metrics_port,
+            log_format=args.log_format,
+            memory_budget=args.memory_budget,
+            package_format=args.format,
+            readers=args.readers,
+            job_queue=args.job_queue,
+            lease=args.lease,
+            max_attempts=args.max_attempts,
+            retry_failed=args.retry_failed
+        )
+        sys.exit(1 if summary.failed else 0)
+
     main(
         args.pid,
         source_dir=args.source_dir,
         logging_level=args.logging_level,
         logging_file=args.logging_file,
-        deposit_dir=args.deposit_dir
+        deposit_dir=args.deposit_dir,
+        timeout=args.timeout,
+        retries=args.retries,
+        cache_dir=args.cache_dir,
+        cache_ttl=args.cache_ttl,
+        cache_size=args.cache_size,
+        articlemeta_url=args.articlemeta_url,
+        store=args.store,
+        compression=args.compression,
+        reference_index=args.reference_index,
+        timing_log=args.timing_log,
+        log_format=args.log_format,
+        package_format=args.format,
+        readers=args.readers
     )
 
 if __name__ == "__main__":
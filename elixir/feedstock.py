@@ -1,4 +1,3 @@
-import requests
 import json
 import re
 import os
@@ -6,62 +5,79 @@ import sys
 import re
 import logging
 import codecs
+import hashlib
+from io import BytesIO
 from html import unescape
 
 from lxml import etree
 from xylose import scielodocument
 from elixir import utils
+from elixir import sources
+from elixir import index
+from elixir import manifest
+from elixir import timing
+from elixir import logs
+from elixir import writers
 
 html_regex = re.compile(r'<body[^>]*>(.*)</body>', re.DOTALL | re.IGNORECASE)
 midias_regex = re.compile(r'href=["\'](.*)["\']', re.IGNORECASE)
 images_regex = re.compile(r'["\'](/img.*|\\img.*)["\']', re.IGNORECASE)
 
+XLINK_HREF = '{http://www.w3.org/1999/xlink}href'
+XML_IMAGES_TAGS = ('graphic', 'inline-graphic')
+XML_MIDIAS_TAGS = ('media', 'midia', 'supplementary-material')
+SOURCE_KINDS = ('img', 'pdf', 'html', 'xml')
+
 
 def html_decode(string):
 
     try:
         string = unescape(string)
-        logging.info('HTML entities replaced')
+        logging.debug('HTML entities replaced')
     except:
-        logging.info('Unable to replace the HTML entities')
+        logging.warning('Unable to replace the HTML entities')
         return string
 
     return string
 
 
-def loadXML(pid):
-    url = 'http://192.168.1.162:7000/api/v1/article?code=%s&format=xmlrsps' % pid
+def loadXML(pid, source=None):
+    source = source or sources.get_source()
     try:
-        xml = requests.get(
-            url,
-            timeout=10
-        ).text.strip()
-        logging.info('XML retrieved from (%s)' % url)
+        with timing.stage('fetch_xml') as stage:
+            xml = source.xml(pid).strip()
+
+            if stage.enabled:
+                stage.read(len(xml.encode('utf-8')))
+        logging.debug('XML retrieved for (%s) from (%s)', pid, source)
     except:
+        logging.error('Unable to retrieve XML for (%s) from (%s)', pid, source)
         raise
-        logging.error('Timeout opening (%s)' % url)
 
     return xml
 
 
-def load_rawdata(pid):
-    url = 'http://192.168.1.162:7000/api/v1/article?code=%s' % pid
+def load_rawdata(pid, source=None):
+    source = source or sources.get_source()
     try:
-        json_data = json.loads(
-            requests.get(
-                url,
-                timeout=10
-            ).text.strip()
-        )
-        logging.info('JSON data retrieved from (%s)' % url)
+        with timing.stage('fetch_json') as stage:
+            body = source.json(pid)
+
+            if stage.enabled:
+                stage.read(len(body.encode('utf-8')))
+
+        json_data = json.loads(body)
+        logging.debug('JSON data retrieved for (%s) from (%s)', pid, source)
     except:
-        logging.error('Timeout opening (%s)' % 'http://192.168.1.162:7000/api/v1/article?code=%s&format=xmlwos' % pid)
+        logging.error('Unable to retrieve JSON data for (%s) from (%s)', pid, source)
+        raise
 
     try:
         rawdata = scielodocument.Article(json_data)
-        logging.info('JSON data parsed')
+        logging.debug('JSON data parsed')
     except:
-        logging.error('Unable to parse json retrieved by (%s)' % url)
+        logging.error('Unable to parse json retrieved for (%s)', pid)
+        raise
 
     return rawdata
 
@@ -70,10 +86,10 @@ def is_valid_pid(pid):
     pid_regex = re.compile("^S[0-9]{4}-[0-9]{3}[0-9xX][0-2][0-9]{3}[0-9]{4}[0-9]{5}$", re.IGNORECASE)
 
     if pid_regex.search(pid) is None:
-        logging.error('Invalid PID (%s)' % pid)
+        logging.error('Invalid PID (%s)', pid)
         return False
 
-    logging.info('Valid PID (%s)' % pid)
+    logging.debug('Valid PID (%s)', pid)
 
     return True
 
@@ -89,10 +105,15 @@ def read_file(fl, replace_entities=False, encoding='utf-8', version='sps'):
     """
 
     try:
-        content = codecs.open(fl, 'r', encoding=encoding).read()
-        logging.debug('Local file readed (%s)' % fl)
+        with timing.stage('read') as stage:
+            with codecs.open(fl, 'r', encoding=encoding) as f:
+                content = f.read()
+
+            if stage.enabled:
+                stage.read(os.path.getsize(fl))
+        logging.debug('Local file readed (%s)', fl)
     except FileNotFoundError:
-        logging.error('Unable to read file (%s)' % fl)
+        logging.error('Unable to read file (%s)', fl)
         raise FileNotFoundError(
             u'File does not exists: %s' % fl
         )
@@ -100,23 +121,46 @@ def read_file(fl, replace_entities=False, encoding='utf-8', version='sps'):
     if not replace_entities or version == 'sps':
         return content
 
+    return html_body(content)
+
+
+def html_body(content):
+    """
+    This method retrieve the body of a legacy HTML string, replacing the
+    entities.
+    """
+
     content = html_decode(content).replace('\n', '')
 
     return html_regex.findall(content)[0]
 
 
-def get_document_images(document):
+def read_html(path):
     """
-    This method retrieve a list of images paths founded into a HTML.
-
-    Keyword arguments:
-    document -- could be a valid file path to a HTML document or a string withing an HTML.
+    This method retrieve the content of a legacy HTML file, read as
+    iso-8859-1, and the SHA-1 of its bytes, as a tuple.
     """
 
     try:
-        html = read_file(document, encoding='iso-8859-1')
+        with timing.stage('read') as stage:
+            with open(path, 'rb') as f:
+                data = f.read()
+
+            stage.read(len(data))
+        logging.debug('Local file readed (%s)', path)
     except FileNotFoundError:
-        html = document
+        logging.error('Unable to read file (%s)', path)
+        raise FileNotFoundError(
+            u'File does not exists: %s' % path
+        )
+
+    return data.decode('iso-8859-1'), hashlib.sha1(data).hexdigest()
+
+
+def html_document_images(html):
+    """
+    This method retrieve a list of images paths founded into a HTML string.
+    """
 
     images = images_regex.findall(html)
 
@@ -125,64 +169,143 @@ def get_document_images(document):
     return fixed_slashs
 
 
-def get_document_midias(document):
+def html_document_midias(html):
     """
-    This method retrieve a list of midia files founded into a HTML.
+    This method retrieve a list of midia files founded into a HTML string.
+    """
+    allowed_midias = ['mp4', 'doc', 'mp3', 'pdf', 'avi', 'mov', 'mpeg', 'ppt', 'xls']
+
+    midias = midias_regex.findall(html)
+
+    fltr_allowed = [x.replace('\\', '/').lower() for x in midias if x.split('.')[-1].lower() in allowed_midias]
+
+    return fltr_allowed
+
+
+def scan_html(path=None, content=None):
+    """
+    This method retrieve the images and the midias referenced by a legacy
+    HTML document, as a tuple of two lists. The file is read only once for
+    both lists.
+
+    Keyword arguments:
+    path -- path to a HTML document, read as iso-8859-1.
+    content -- string with the HTML, used instead of reading a path.
+    """
+
+    if content is None:
+        if path is None:
+            raise ValueError('Expected a path or the content of a HTML document')
+
+        content = read_file(path, encoding='iso-8859-1')
+
+    return (html_document_images(content), html_document_midias(content))
+
+
+def _is_html_content(document):
+
+    return '<' in document or '\n' in document
+
+
+def get_document_images(document):
+    """
+    This method retrieve a list of images paths founded into a HTML.
 
     Keyword arguments:
     document -- could be a valid file path to a HTML document or a string withing an HTML.
     """
-    allowed_midias = ['mp4', 'doc', 'mp3', 'pdf', 'avi', 'mov', 'mpeg', 'ppt', 'xls']
+
+    if _is_html_content(document):
+        return html_document_images(document)
 
     try:
-        html = read_file(document, encoding='iso-8859-1')
+        return scan_html(path=document)[0]
     except FileNotFoundError:
-        html = document
+        return html_document_images(document)
 
-    midias = midias_regex.findall(html)
 
-    fltr_allowed = [x.replace('\\', '/').lower() for x in midias if x.split('.')[-1].lower() in allowed_midias]
-
-    return fltr_allowed
+def get_document_midias(document):
+    """
+    This method retrieve a list of midia files founded into a HTML.
 
+    Keyword arguments:
+    document -- could be a valid file path to a HTML document or a string withing an HTML.
+    """
 
-def get_xml_document_images(document):
+    if _is_html_content(document):
+        return html_document_midias(document)
 
     try:
-        xml = etree.parse(document)
-        logging.debug('XML file parsed')
-    except:
-        logging.error('XML file could not be parsed')
-        raise
+        return scan_html(path=document)[1]
+    except FileNotFoundError:
+        return html_document_midias(document)
 
-    graphics = xml.findall('//graphic')+xml.findall('//inline-graphic')
 
-    files = []
-    for fname in [x.get('{http://www.w3.org/1999/xlink}href') for x in graphics]:
-        if not '.' in fname:
-            files.append('%s.jpg' % fname)
-        else:
-            files.append(fname)
+def get_xml_document_assets(document):
+    """
+    This method retrieve the images and the midias referenced by a XML SPS
+    document, as a tuple of two lists, reading the document in a single
+    streaming pass. The elements are cleared as soon as they are read, so the
+    memory used does not depend on the document size.
 
-    return files
+    Images are the graphic and inline-graphic elements, images without
+    extension are retrieved as .jpg. Midias are the media, midia and
+    supplementary-material elements. Each href is retrieved once, in the
+    order it is first found, as a media is usually nested in a
+    supplementary-material with the same href.
 
+    Keyword arguments:
+    document -- path to a XML document or a file like object.
+    """
 
-def get_xml_document_midias(document):
+    encoding = None
+
+    if hasattr(document, 'read') and isinstance(document.read(0), str):
+        document = BytesIO(document.read().encode('utf-8'))
+        encoding = 'utf-8'
+
+    images = []
+    midias = []
+    seen_images = set()
+    seen_midias = set()
 
     try:
-        xml = etree.parse(document)
+        for event, element in etree.iterparse(document, events=('end',), encoding=encoding):
+            tag = element.tag
+
+            if tag in XML_IMAGES_TAGS:
+                fname = element.get(XLINK_HREF)
+                if fname:
+                    fname = fname if '.' in fname else '%s.jpg' % fname
+                    if fname not in seen_images:
+                        seen_images.add(fname)
+                        images.append(fname)
+            elif tag in XML_MIDIAS_TAGS:
+                fname = element.get(XLINK_HREF)
+                if fname and fname not in seen_midias:
+                    seen_midias.add(fname)
+                    midias.append(fname)
+
+            element.clear(keep_tail=True)
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
         logging.debug('XML file parsed')
     except:
         logging.error('XML file could not be parsed')
         raise
 
-    midias = xml.findall('//midia')
+    return (images, midias)
 
-    files = []
-    for fname in [x.get('{http://www.w3.org/1999/xlink}href') for x in midias]:
-        files.append(fname)
 
-    return files
+def get_xml_document_images(document):
+
+    return get_xml_document_assets(document)[0]
+
+
+def get_xml_document_midias(document):
+
+    return get_xml_document_assets(document)[1]
 
 
 def check_images_availability(available_images, document_images):
@@ -203,10 +326,10 @@ def check_images_availability(available_images, document_images):
 
     for image_name, image_path in html_images.items():
         if image_name in av_images:
-            logging.info('Image available in the file system (%s)' % image_path)
+            logging.debug('Image available in the file system (%s)', image_path)
             images_availability.append((av_images[image_name], True))
         else:
-            logging.warning('Image not available in the file system (%s)' % image_path)
+            logging.debug('Image not available in the file system (%s)', image_path)
             images_availability.append((image_path, False))
 
     return images_availability
@@ -216,9 +339,9 @@ def list_path(path):
 
     try:
         files = os.listdir(path)
-        logging.debug('Source directory found (%s)' % path)
+        logging.debug('Source directory found (%s)', path)
     except FileNotFoundError:
-        logging.error('Source directory not found (%s)' % path)
+        logging.error('Source directory not found (%s)', path)
         raise FileNotFoundError(
             u'Source directory does not exists: %s' % path
         )
@@ -242,26 +365,65 @@ def fix_images_paths(content):
     return images_regex.sub(get_file_name, content)
 
 
+def issue_label(raw_data):
+    """
+    This method retrieve the name of the directory, where the article
+    store the static files. The name is returned in compliance with
+    the SciELO patterns. Once this pattern is controlled manually in
+    the file system, this method maybe not find a related static
+    directory for some articles.
+
+    Keyword arguments:
+    raw_data -- xylose Article of the document.
+    """
+
+    issue_dir = ''
+
+    if raw_data.issue == 'ahead':
+        issue_dir += raw_data.publication_date[0:4]
+
+    if raw_data.volume:
+        issue_dir += 'v%s' % raw_data.volume
+
+    if raw_data.supplement_volume:
+        issue_dir += 's%s' % raw_data.supplement_volume
+
+    if raw_data.issue:
+        issue_dir += 'n%s' % raw_data.issue
+
+    if raw_data.supplement_issue:
+        issue_dir += 's%s' % raw_data.supplement_issue
+
+    if raw_data.document_type == 'press-release':
+        issue_dir += 'pr'
+
+    return issue_dir.lower()
+
+
 class Article(object):
 
-    def __init__(self, pid, xml, raw_data, source_dir, deposit_dir):
+    def __init__(self, pid, xml, raw_data, source_dir, deposit_dir, source_index=None):
 
         if not is_valid_pid(pid):
             raise ValueError(u'Invalid PID: %s' % pid)
 
-        try:
-            os.listdir(source_dir)
-            logging.debug('Source directory found (%s)' % source_dir)
-        except FileNotFoundError:
-            logging.error('Source directory not found (%s)' % source_dir)
+        if not os.path.isdir(source_dir):
+            logging.error('Source directory not found (%s)', source_dir)
             raise FileNotFoundError(u'Invalid source directory: %s' % source_dir)
 
+        logging.debug('Source directory found (%s)', source_dir)
+
         self.deposit_dir = deposit_dir or '.'
 
         if self.deposit_dir[-1] in ['/', '\\']:
             self.deposit_dir = deposit_dir[0:-1]
 
         self.source_dir = source_dir or '.'
+        self.source_index = source_index
+
+        if self.source_index is None:
+            self.source_index = index.get_index(self.source_dir)
+
         self.xml = xml
         self.xylose = raw_data
         self.pid = pid
@@ -274,20 +436,20 @@ class Article(object):
     def _journal_issn(self):
         issn = self.xylose.scielo_issn
 
-        logging.info('Journal ISSN for source files is (%s)' % issn)
+        logging.debug('Journal ISSN for source files is (%s)', issn)
 
         return issn
 
     def _journal_acronym(self):
         ja = self.xylose.journal_acronym
 
-        logging.info('Journal acronym for source files is (%s)' % ja)
+        logging.debug('Journal acronym for source files is (%s)', ja)
 
         return ja
 
     def _file_code(self):
 
-        logging.info('File code is (%s)' % self.xylose.file_code)
+        logging.debug('File code is (%s)', self.xylose.file_code)
 
         return self.xylose.file_code
 
@@ -307,46 +469,23 @@ class Article(object):
         if extension == 'xml':
             version = 'sps'
 
-        logging.info('Content version (%s)' % version)
+        logging.debug('Content version (%s)', version)
 
         return version
 
     def _issue_label(self):
         """
         This method retrieve the name of the directory, where the article
-        store the static files. The name is returned in compliance with
-        the SciELO patterns. Once this pattern is controlled manually in
-        the file system, this method maybe not find a related static
-        directory for some articles.
+        store the static files. See issue_label.
         """
 
-        issue_dir = ''
-
-        if self.xylose.issue == 'ahead':
-            issue_dir += self.xylose.publication_date[0:4]
-
-        if self.xylose.volume:
-            issue_dir += 'v%s' % self.xylose.volume
+        label = issue_label(self.xylose)
 
-        if self.xylose.supplement_volume:
-            issue_dir += 's%s' % self.xylose.supplement_volume
+        logging.debug('Issue label for source files is (%s)', label)
 
-        if self.xylose.issue:
-            issue_dir += 'n%s' % self.xylose.issue
+        return label
 
-        if self.xylose.supplement_issue:
-            issue_dir += 's%s' % self.xylose.supplement_issue
-
-        if self.xylose.document_type == 'press-release':
-            issue_dir += 'pr'
-
-        issue_label = issue_dir.lower()
-
-        logging.info('Issue label for source files is (%s)' % issue_label)
-
-        return issue_label
-
-    @property
+    @utils.memoized_property
     def _get_body_from_files(self):
 
         htmls = {}
@@ -358,14 +497,10 @@ class Article(object):
 
         for html, filenames in htmls.items():
             for doc in filenames['files']:
-                docs.append(
-                    read_file(
-                        doc,
-                        replace_entities=True,
-                        encoding='iso-8859-1',
-                        version=self.content_version
-                    )
-                )
+                if self.content_version == 'sps':
+                    docs.append(read_file(doc, encoding='iso-8859-1'))
+                else:
+                    docs.append(html_body(self._html_contents[doc][0]))
 
             content = ''.join(docs).strip()
 
@@ -373,117 +508,164 @@ class Article(object):
 
         return htmls
 
-    @property
+    @utils.memoized_property
     def list_source_images(self):
 
-        path = '/'.join(
-            [self.source_dir, 'img', self.journal_acronym, self.issue_label]
-        )
+        path = self.source_index.path('img', self.journal_acronym, self.issue_label)
+        names = self.source_index.names('img', self.journal_acronym, self.issue_label)
 
-        images = ['/'.join([path, x]) for x in list_path(path)]
+        images = ['/'.join([path, x]) for x in names]
 
         if len(images) == 0:
-            logging.debug('No source images available for the issue (%s)' % self.issue_label)
+            logging.debug('No source images available for the issue (%s)', self.issue_label)
 
-        for image in images:
-            logging.debug('Image (%s) available in source for the issue (%s)' % (image, self.issue_label))
+        if logs.debug_enabled():
+            for image in images:
+                logging.debug('Image (%s) available in source for the issue (%s)', image, self.issue_label)
 
         return images
 
-    @property
+    @utils.memoized_property
+    def _html_contents(self):
+        """
+        This method retrieve the content and the SHA-1 of each legacy HTML of
+        the document, see read_html. Each HTML is read once for its assets,
+        its body and the manifest.
+        """
+
+        return dict([(x, read_html(x)) for x in self.list_documents])
+
+    @utils.memoized_property
+    def _documents_assets(self):
+        """
+        This method retrieve the images and midias required by each document,
+        reading and parsing each document only once for both lists.
+        """
+
+        assets = []
+        documents = self.list_documents
+
+        with timing.stage('parse') as stage:
+            for document in documents:
+                if self.content_version == 'sps':
+                    assets.append(get_xml_document_assets(document))
+
+                    if stage.enabled:
+                        stage.read(os.path.getsize(document))
+                else:
+                    assets.append(scan_html(content=self._html_contents[document][0]))
+
+        return assets
+
+    @utils.memoized_property
     def list_document_images(self):
 
         doc_images = []
 
-        for document in self.list_documents:
-            if self.content_version == 'sps':
-                doc_images += get_xml_document_images(document)
-            else:
-                doc_images += get_document_images(document)
+        for images, midias in self._documents_assets:
+            doc_images += images
 
         if len(doc_images) == 0:
-            logging.info('Images not required for (%s)' % (self.pid))
+            logging.debug('Images not required for (%s)', self.pid)
 
-        for image in doc_images:
-            logging.info('Image (%s) required for (%s)' % (image, self.pid))
+        if logs.debug_enabled():
+            for image in doc_images:
+                logging.debug('Image (%s) required for (%s)', image, self.pid)
 
         return doc_images
 
-    @property
+    @utils.memoized_property
     def list_document_midia(self):
 
         doc_midias = []
 
-        for document in self.list_documents:
-            if self.content_version == 'sps':
-                doc_midias += get_xml_document_midias(document)
-            else:
-                doc_midias += get_document_midias(document)
+        for images, midias in self._documents_assets:
+            doc_midias += midias
 
         if len(doc_midias) == 0:
-            logging.info('Midia not required for (%s)' % (self.pid))
+            logging.debug('Midia not required for (%s)', self.pid)
 
-        for midia in doc_midias:
-            logging.info('Midia (%s) required for (%s)' % (midia, self.pid))
+        if logs.debug_enabled():
+            for midia in doc_midias:
+                logging.debug('Midia (%s) required for (%s)', midia, self.pid)
 
         return doc_midias
 
-    @property
+    @utils.memoized_property
     def list_pdfs(self):
 
-        path = '/'.join(
-            [self.source_dir, 'pdf', self.journal_acronym, self.issue_label]
-        )
+        path = self.source_index.path('pdf', self.journal_acronym, self.issue_label)
+        names = self.source_index.names('pdf', self.journal_acronym, self.issue_label)
 
-        pdfs = ['/'.join([path, x]) for x in list_path(path) if self.file_code in x]
+        pdfs = ['/'.join([path, x]) for x in names if self.file_code in x]
 
         if len(pdfs) == 0:
-            logging.warning('PDF not found for (%s)' % self.pid)
+            logging.debug('PDF not found for (%s)', self.pid)
 
-        for pdf in pdfs:
-            logging.info('PDF (%s) found for (%s)' % (pdf, self.pid))
+        if logs.debug_enabled():
+            for pdf in pdfs:
+                logging.debug('PDF (%s) found for (%s)', pdf, self.pid)
 
         return pdfs
 
-    @property
+    @utils.memoized_property
     def list_htmls(self):
 
-        path1 = '/'.join(
-            [self.source_dir, 'html', self.journal_acronym, self.issue_label]
-        )
+        path = self.source_index.path('html', self.journal_acronym, self.issue_label)
+        names = self.source_index.names('html', self.journal_acronym, self.issue_label)
 
-        htmls = ['/'.join([path1, x]) for x in list_path(path1) if self.file_code in x]
+        htmls = ['/'.join([path, x]) for x in names if self.file_code in x]
 
         if len(htmls) == 0:
-            logging.warning('HTML not found for (%s)' % self.pid)
+            logging.debug('HTML not found for (%s)', self.pid)
 
-        for html in htmls:
-            logging.info('HTML (%s) found for (%s)' % (html, self.pid))
+        if logs.debug_enabled():
+            for html in htmls:
+                logging.debug('HTML (%s) found for (%s)', html, self.pid)
 
         return htmls
 
-    @property
+    @utils.memoized_property
     def list_xmls(self):
 
-        path = '/'.join(
-            [self.source_dir, 'xml', self.journal_acronym, self.issue_label]
-        )
+        path = self.source_index.path('xml', self.journal_acronym, self.issue_label)
+        names = self.source_index.names('xml', self.journal_acronym, self.issue_label)
 
-        xmls = ['/'.join([path, x]) for x in list_path(path) if self.file_code in x]
+        xmls = ['/'.join([path, x]) for x in names if self.file_code in x]
 
         if len(xmls) == 0:
-            logging.warning('XML not found for (%s)' % self.pid)
+            logging.debug('XML not found for (%s)', self.pid)
 
-        for xml in xmls:
-            logging.info('XML (%s) found for (%s)' % (xml, self.pid))
+        if logs.debug_enabled():
+            for xml in xmls:
+                logging.debug('XML (%s) found for (%s)', xml, self.pid)
 
         return xmls
 
+    def invalidate(self, *names):
+        """
+        This method discard the memoized values of the given properties, or
+        of all the properties when no name is given, so they are evaluated
+        again when accessed.
+        """
+
+        utils.memoized_property.invalidate(self, *names)
+
+    def refresh(self):
+        """
+        This method rescan the changed source directories and discard all the
+        memoized values. Useful for long running processes where the source
+        files may change between two packings of the same document.
+        """
+
+        self.source_index.refresh()
+        self.invalidate()
+
     @property
     def xml_files(self):
         documents = self.list_documents()
 
-    @property
+    @utils.memoized_property
     def list_documents(self):
         """
         This method retrieve the html's or xml's according to the vesion of the
@@ -495,9 +677,14 @@ class Article(object):
         else:
             return self.list_htmls
 
-    @property
+    @utils.memoized_property
     def xml_sps_with_legacy_data(self):
 
+        with timing.stage('legacy_xml'):
+            return self._xml_sps_with_legacy_data()
+
+    def _xml_sps_with_legacy_data(self):
+
         xml = self.xml
 
         try:
@@ -535,50 +722,197 @@ class Article(object):
 
     @property
     def rsps_xml(self):
-
-        docs = []
+        """
+        This method retrieve the XML member of the package. The XML of sps
+        documents is added as it is, by path, see utils.FileMember. The XML of
+        legacy documents is built from the metadata and the html's.
+        """
 
         if self.content_version == 'sps':
-
-            xml = read_file(
-                self.list_documents[0],
-                replace_entities=False,
-                encoding='utf-8',
-                version=self.content_version
-            )
-            return utils.MemoryFileLike('%s.xml' % self.file_code, xml)
+            return utils.FileMember(self.list_documents[0], '%s.xml' % self.file_code)
         else:
-            return utils.MemoryFileLike(
-                '%s.xml' % self.file_code,
-                etree.tostring(
-                    self.xml_sps_with_legacy_data,
-                    encoding='unicode',
-                    pretty_print=True
+            with timing.stage('rsps_xml'):
+                return utils.MemoryFileLike(
+                    '%s.xml' % self.file_code,
+                    etree.tostring(
+                        self.xml_sps_with_legacy_data,
+                        encoding='unicode',
+                        pretty_print=True
+                    )
                 )
+
+    @utils.memoized_property
+    def images_status(self):
+
+        with timing.stage('images'):
+            return check_images_availability(
+                self.list_source_images,
+                self.list_document_images
             )
 
     @property
-    def images_status(self):
-        return check_images_availability(
-            self.list_source_images,
-            self.list_document_images
+    def package_sources(self):
+        """
+        This method retrieve the source files used to build the package: the
+        available images, the pdfs and the html's or xml's of the document.
+        """
+
+        images = [x[0] for x in self.images_status if x[1]]
+
+        return images + self.list_pdfs + self.list_documents
+
+    @property
+    def referenced_sources(self):
+        """
+        This method retrieve the source files the package depends on: the
+        package sources and the images and midias required by the document,
+        given at their expected place in the source directory even when they
+        are not available yet. Midias are resolved by midia_source, those out
+        of the source directory are left out.
+        """
+
+        path = self.source_index.path('img', self.journal_acronym, self.issue_label)
+
+        required = [
+            '/'.join([path, x.split('/')[-1].lower()])
+            for x in self.list_document_images
+        ]
+
+        required += [x for x in map(self.midia_source, self.list_document_midia) if x]
+
+        return sorted(set(self.package_sources + required))
+
+    def midia_source(self, href):
+        """
+        This method retrieve the path in the source directory of a midia
+        referenced by the document, or None when it is not a source file.
+        Legacy hrefs, like /pdf/rsp/v40n6/07.pdf or
+        /img/revistas/rsp/v40n6/07.mp4, give the kind of the source directory
+        and may give the journal and the issue. Bare names, as in the SPS
+        documents, are in the img directory of the issue. External URLs and
+        unknown directories are not source files.
+        """
+
+        if '://' in href or href.lower().startswith('mailto:'):
+            return None
+
+        parts = [x for x in href.replace('\\', '/').split('/') if x and x not in ('.', '..')]
+
+        if not parts:
+            return None
+
+        kind = 'img'
+        journal_acronym, issue = self.journal_acronym, self.issue_label
+
+        if len(parts) > 1:
+            kind = parts[0].lower()
+
+            if kind not in SOURCE_KINDS:
+                return None
+
+            rest = [x for x in parts[1:-1] if x.lower() != 'revistas']
+
+            if len(rest) == 2:
+                journal_acronym, issue = rest[0].lower(), rest[1].lower()
+
+        return '/'.join([
+            self.source_index.path(kind, journal_acronym, issue), parts[-1].lower()
+        ])
+
+    def assets_summary(self):
+        """
+        This method retrieve the counts of the assets of the document and the
+        images required but not available, as logged by logs.log_document.
+        """
+
+        return {
+            'content_version': self.content_version,
+            'documents': len(self.list_documents),
+            'images': len(self.images_status),
+            'images_missing': [x[0] for x in self.images_status if not x[1]],
+            'midias': len(self.list_document_midia),
+            'pdfs': len(self.list_pdfs)
+        }
+
+    def package_path(self, file_name=None, package_format=writers.DEFAULT_FORMAT):
+
+        if not file_name:
+            file_name = '%s%s' % (self.pid, writers.extension(package_format))
+
+        return '/'.join([self.deposit_dir, file_name])
+
+    def is_up_to_date(self, file_name=None, package_format=writers.DEFAULT_FORMAT):
+        """
+        This method check if the package was already built from the current
+        source files and metadata, using the manifest saved by wrap_document.
+        """
+
+        fn = self.package_path(file_name, package_format)
+
+        if not os.path.exists(fn):
+            return False
+
+        package_manifest = manifest.Manifest.load(fn + manifest.MANIFEST_SUFFIX)
+
+        if package_manifest is None:
+            return False
+
+        changes = package_manifest.changes(
+            self.package_sources,
+            manifest.metadata_revision(self.xml, self.xylose)
         )
 
-    def wrap_document(self, file_name=None):
+        if changes:
+            logging.debug('Package outdated for (%s): %s', self.pid, '; '.join(changes))
+            return False
+
+        logging.debug('Package up to date for (%s)', self.pid)
+
+        return True
+
+    def wrap_document(self, file_name=None, compression=None,
+                      package_format=writers.DEFAULT_FORMAT):
+        """
+        This method write the package of the document, in the given format,
+        see writers.FORMATS, and its manifest.
+
+        Keyword arguments:
+        file_name -- name of the package, default is the PID with the extension
+        of the format.
+        compression -- utils.CompressionPolicy of the members, zip only.
+        package_format -- format of the package, default is zip.
+        """
+
         images = [x[0] for x in self.images_status if x[1]]
         pdfs = self.list_pdfs
         xml = self.rsps_xml
         files = images+pdfs
         files.append(xml)
 
-        zipf = utils.WrapFiles(*files)
+        fn = self.package_path(file_name, package_format)
+        partial = '%s.part' % fn
 
-        if not file_name:
-            file_name = '%s.zip' % self.pid
+        try:
+            package = writers.open_writer(partial, package_format, compression)
+            try:
+                package.append(*files)
+            finally:
+                package.close()
+            writers.commit(partial, fn)
+        except:
+            writers.discard(partial)
+            raise
+
+        logging.debug('Package writen at (%s)', fn)
 
-        fn = '/'.join([self.deposit_dir, file_name])
+        digests = dict(package.digests)
 
-        with codecs.open(fn, 'wb') as f:
-            f.write(zipf.read())
+        if self.content_version != 'sps':
+            digests.update([(k, v[1]) for k, v in self._html_contents.items()])
 
-        logging.info('ZIP file writen at (%s)' % fn)
+        with timing.stage('manifest'):
+            manifest.Manifest(
+                self.pid,
+                {x: manifest.source_entry(x, digests.get(x)) for x in self.package_sources},
+                manifest.metadata_revision(self.xml, self.xylose)
+            ).save(fn + manifest.MANIFEST_SUFFIX)
@@ -0,0 +1,138 @@
+import time
+import queue
+import asyncio
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from elixir import feedstock
+
+DEFAULT_CONCURRENCY = 16
+
+Fetched = namedtuple('Fetched', ['pid', 'xml', 'raw_data', 'error', 'elapsed'], defaults=(None,))
+
+_END = object()
+
+
+async def fetch_article(pid, executor, semaphore):
+    """
+    This method retrieve the XML and the JSON representations of a document
+    at the same time and return a Fetched tuple. Errors are returned in the
+    tuple instead of being raised.
+
+    The blocking feedstock.loadXML and feedstock.load_rawdata run in the
+    given executor, so the pooled session, its retries and its backoff are
+    used as they are.
+
+    Keyword arguments:
+    pid -- document ID, must be the PID number.
+    executor -- concurrent.futures executor running the requests.
+    semaphore -- asyncio.Semaphore limiting the documents in flight.
+    """
+
+    loop = asyncio.get_running_loop()
+
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            xml, raw_data = await asyncio.gather(
+                loop.run_in_executor(executor, feedstock.loadXML, pid),
+                loop.run_in_executor(executor, feedstock.load_rawdata, pid)
+            )
+        except Exception as e:
+            logging.error('Unable to fetch metadata for (%s): %s', pid, e)
+            return Fetched(
+                pid, None, None, '%s: %s' % (e.__class__.__name__, e),
+                time.perf_counter() - start
+            )
+
+    return Fetched(pid, xml, raw_data, None, time.perf_counter() - start)
+
+
+async def fetch_articles(pids, callback, concurrency=DEFAULT_CONCURRENCY):
+    """
+    This method fetch the metadata of all the given PIDs keeping at most
+    concurrency documents in flight. The callback is called with each Fetched
+    tuple as soon as it is ready, so the results come in completion order.
+    When the callback is a coroutine function it is awaited, which allows a
+    slow consumer to hold the fetching back.
+
+    Keyword arguments:
+    pids -- iterable of PIDs.
+    callback -- callable receiving the Fetched tuples.
+    concurrency -- maximum number of documents being fetched at a time.
+    """
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def deliver(tasks):
+        for task in tasks:
+            result = callback(task.result())
+            if asyncio.iscoroutine(result):
+                await result
+
+    with ThreadPoolExecutor(max_workers=concurrency * 2) as executor:
+        pending = set()
+
+        for pid in pids:
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                await deliver(done)
+
+            pending.add(
+                asyncio.ensure_future(fetch_article(pid, executor, semaphore))
+            )
+
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            await deliver(done)
+
+
+def prefetch(pids, concurrency=DEFAULT_CONCURRENCY):
+    """
+    This method retrieve a generator of Fetched tuples for the given PIDs. The
+    metadata is fetched by an event loop running in a background thread, and
+    at most concurrency fetched documents wait for the consumer, so the
+    memory used does not depend on the number of PIDs.
+
+    Keyword arguments:
+    pids -- iterable of PIDs.
+    concurrency -- maximum number of documents being fetched at a time.
+    """
+
+    fetched = queue.Queue(maxsize=concurrency)
+
+    def produce():
+        loop = asyncio.new_event_loop()
+
+        async def put(item):
+            await loop.run_in_executor(None, fetched.put, item)
+
+        try:
+            loop.run_until_complete(fetch_articles(pids, put, concurrency))
+        except Exception as e:
+            logging.error('Metadata fetching interrupted: %s', e)
+            fetched.put(e)
+        finally:
+            loop.close()
+            fetched.put(_END)
+
+    producer = threading.Thread(target=produce, name='elixir-prefetch')
+    producer.daemon = True
+    producer.start()
+
+    while True:
+        item = fetched.get()
+
+        if item is _END:
+            break
+
+        if isinstance(item, Exception):
+            raise item
+
+        yield item
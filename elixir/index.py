@@ -0,0 +1,181 @@
+import os
+import logging
+import threading
+from collections import namedtuple
+
+from elixir import timing
+
+Entry = namedtuple('Entry', ['name', 'size', 'mtime'])
+
+_indexes = {}
+
+
+class SourceIndex(object):
+    """
+    Index of the files available in the source directory. Each directory
+    source_dir/<kind>/<journal_acronym>/<issue_label> is scanned once, when
+    first required, and the lowercase names, sizes and modification times of
+    its files are kept in memory. Directories not found are also remembered.
+
+    refresh rescans only the directories whose modification time changed
+    since they were scanned.
+
+    The directories are scanned out of the index lock, each one holding its
+    own lock, so a slow scan only holds the threads asking for the same
+    directory.
+
+    Keyword arguments:
+    source_dir -- source directory where the pdf, images and html's could be fetched.
+    """
+
+    def __init__(self, source_dir):
+        self.source_dir = source_dir
+        self._directories = {}
+        self._scanning = {}
+        self._lock = threading.Lock()
+
+    def path(self, kind, journal_acronym, issue_label):
+
+        return '/'.join([self.source_dir, kind, journal_acronym, issue_label])
+
+    def _key_lock(self, key):
+
+        with self._lock:
+            return self._scanning.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def _mtime(path):
+
+        try:
+            return os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _scan(self, path):
+
+        mtime = self._mtime(path)
+
+        if mtime is None:
+            logging.debug('Source directory not found (%s)', path)
+            return (None, None)
+
+        entries = []
+        with timing.stage('scan'):
+            with os.scandir(path) as it:
+                for item in it:
+                    stat = item.stat()
+                    entries.append(Entry(item.name.lower(), stat.st_size, stat.st_mtime))
+
+        logging.debug('Source directory indexed (%s), %d files', path, len(entries))
+
+        return (mtime, entries)
+
+    def entries(self, kind, journal_acronym, issue_label):
+        """
+        This method retrieve the list of Entry of a source directory.
+
+        Keyword arguments:
+        kind -- type of the source files, one of img, pdf, html or xml.
+        journal_acronym -- journal acronym.
+        issue_label -- issue directory name.
+        """
+
+        key = (kind, journal_acronym, issue_label)
+
+        with self._lock:
+            scanned = self._directories.get(key)
+
+        if scanned is None:
+            with self._key_lock(key):
+                with self._lock:
+                    scanned = self._directories.get(key)
+
+                if scanned is None:
+                    scanned = self._scan(self.path(*key))
+
+                    with self._lock:
+                        self._directories[key] = scanned
+
+        mtime, entries = scanned
+
+        if entries is None:
+            logging.error('Source directory not found (%s)', self.path(*key))
+            raise FileNotFoundError(
+                u'Source directory does not exists: %s' % self.path(*key)
+            )
+
+        return entries
+
+    def names(self, kind, journal_acronym, issue_label):
+
+        return [x.name for x in self.entries(kind, journal_acronym, issue_label)]
+
+    def refresh(self, journal_acronym=None, issue_label=None):
+        """
+        This method rescan the indexed directories changed since they were
+        scanned and retrieve the number of directories rescanned. When an
+        issue is given, only its directories are checked.
+        """
+
+        refreshed = 0
+
+        with self._lock:
+            indexed = [
+                (k, v) for k, v in self._directories.items()
+                if journal_acronym is None or k[1:] == (journal_acronym, issue_label)
+            ]
+
+        for key, scanned in indexed:
+            path = self.path(*key)
+
+            with self._key_lock(key):
+                with self._lock:
+                    if self._directories.get(key) is not scanned:
+                        continue
+
+                if self._mtime(path) == scanned[0]:
+                    continue
+
+                scanned = self._scan(path)
+
+                with self._lock:
+                    self._directories[key] = scanned
+
+            refreshed += 1
+
+        logging.debug('Source index refreshed, %d directories changed', refreshed)
+
+        return refreshed
+
+    def forget(self, journal_acronym, issue_label):
+        """
+        This method discard the indexed directories of an issue, of all kinds,
+        when they are not needed anymore.
+        """
+
+        with self._lock:
+            for key in list(self._directories):
+                if key[1:] == (journal_acronym, issue_label):
+                    del self._directories[key]
+                    self._scanning.pop(key, None)
+
+    def invalidate(self):
+
+        with self._lock:
+            self._directories.clear()
+            self._scanning.clear()
+
+    def __len__(self):
+        return len(self._directories)
+
+
+def get_index(source_dir):
+    """
+    This method retrieve the SourceIndex shared by the current process for the
+    given source directory.
+    """
+
+    if source_dir not in _indexes:
+        _indexes[source_dir] = SourceIndex(source_dir)
+
+    return _indexes[source_dir]
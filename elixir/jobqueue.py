@@ -0,0 +1,368 @@
+import os
+import time
+import socket
+import sqlite3
+import logging
+import threading
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+STATES = (PENDING, RUNNING, DONE, FAILED)
+
+DEFAULT_LEASE = 600
+DEFAULT_ATTEMPTS = 3
+DEFAULT_CLAIM = 100
+
+
+def worker_id():
+    """
+    This method retrieve the id of the current process as a worker of a
+    JobQueue, host:pid.
+    """
+
+    return '%s:%d' % (socket.gethostname(), os.getpid())
+
+
+class JobQueue(object):
+    """
+    Persistent queue of the PIDs of a packing run, in a SQLite database. Each
+    PID is a job with a state, pending, running, done or failed, the number
+    of attempts and the last error, so a run interrupted at any point is
+    resumed with the jobs not done yet.
+
+    Jobs are claimed by a worker for lease seconds. The jobs of a worker
+    that stopped without completing them are claimed again when their lease
+    expires, up to max_attempts attempts, and then are failed.
+
+    Each process, and each thread, uses its own connection to the database,
+    so many runs on the same host may claim jobs from the same queue.
+
+    Keyword arguments:
+    path -- path to the SQLite database file, created when missing.
+    lease -- seconds a claimed job is reserved to its worker.
+    max_attempts -- number of times a job is tried before it is failed.
+    """
+
+    def __init__(self, path, lease=DEFAULT_LEASE, max_attempts=DEFAULT_ATTEMPTS):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._ahead = threading.Condition()
+        self._outstanding = 0
+        self._worker = None
+        self._renewed = 0
+
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'pid TEXT PRIMARY KEY, state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+                'error TEXT, worker TEXT, lease_until REAL, elapsed REAL, updated REAL'
+                ') WITHOUT ROWID'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_until)'
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+
+        if conn is None or self._local.owner != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = _Transactions(conn)
+            self._local.owner = os.getpid()
+
+        return self._local.conn
+
+    def add(self, pids, batch_size=1000):
+        """
+        This method add the given PIDs as pending jobs and retrieve the number
+        of jobs added. PIDs already in the queue are kept as they are, so
+        adding the PIDs of an interrupted run again resumes it.
+
+        Keyword arguments:
+        pids -- iterable of PIDs.
+        batch_size -- number of PIDs written per transaction.
+        """
+
+        added = 0
+        rows = []
+
+        def flush():
+            with self._connection() as conn:
+                cursor = conn.executemany(
+                    'INSERT OR IGNORE INTO jobs (pid, state, updated) VALUES (?, ?, ?)',
+                    rows
+                )
+            del rows[:]
+
+            return cursor.rowcount
+
+        for pid in pids:
+            rows.append((pid, PENDING, time.time()))
+
+            if len(rows) >= batch_size:
+                added += flush()
+
+        if rows:
+            added += flush()
+
+        logging.info('%d jobs added to (%s)', added, self.path)
+
+        return added
+
+    def claim(self, worker=None, count=1):
+        """
+        This method atomically claim up to count jobs, the pending ones and
+        those whose lease expired, and retrieve their PIDs. Jobs whose lease
+        expired after max_attempts attempts are failed instead.
+
+        Keyword arguments:
+        worker -- id of the worker claiming the jobs, default is worker_id().
+        count -- maximum number of jobs claimed.
+        """
+
+        worker = worker or worker_id()
+        now = time.time()
+
+        with self._connection() as conn:
+            conn.execute(
+                'UPDATE jobs SET state = ?, error = ?, worker = NULL, lease_until = NULL, updated = ? '
+                'WHERE state = ? AND lease_until < ? AND attempts >= ?',
+                (FAILED, 'Lease expired', now, RUNNING, now, self.max_attempts)
+            )
+
+            pids = [x[0] for x in conn.execute(
+                'SELECT pid FROM jobs WHERE state = ? '
+                'OR (state = ? AND lease_until < ?) LIMIT ?',
+                (PENDING, RUNNING, now, count)
+            )]
+
+            conn.executemany(
+                'UPDATE jobs SET state = ?, attempts = attempts + 1, worker = ?, '
+                'lease_until = ?, updated = ? WHERE pid = ?',
+                [(RUNNING, worker, now + self.lease, now, x) for x in pids]
+            )
+
+        return pids
+
+    def claimed(self, worker=None, count=DEFAULT_CLAIM, ahead=None):
+        """
+        This method retrieve a generator of PIDs claimed count at a time,
+        until no job is left to claim.
+
+        A multiprocessing.Pool takes all of its input at once, so with ahead
+        the generator waits while ahead PIDs it retrieved are not completed,
+        and no more than ahead PIDs are claimed at a time. The consumer must
+        not keep more than ahead PIDs before completing them, or it waits
+        forever.
+
+        The leases of the jobs of the worker are renewed every lease / 3
+        seconds while the generator is consumed or its jobs are completed, so
+        the lease must be longer than the packing of a single document.
+
+        Keyword arguments:
+        worker -- id of the worker claiming the jobs, default is worker_id().
+        count -- number of jobs claimed at a time.
+        ahead -- maximum number of PIDs retrieved and not completed yet.
+        """
+
+        worker = worker or worker_id()
+
+        if ahead:
+            count = min(count, ahead)
+
+        with self._ahead:
+            self._worker = worker
+            self._renewed = time.time()
+
+        while True:
+            pids = self.claim(worker, count)
+
+            if not pids:
+                return
+
+            for pid in pids:
+                self._wait_ahead(ahead)
+                yield pid
+
+    def _wait_ahead(self, ahead):
+
+        with self._ahead:
+            self._keep_leases()
+
+            while ahead and self._outstanding >= ahead:
+                self._ahead.wait(self.lease / 3.0)
+                self._keep_leases()
+
+            self._outstanding += 1
+
+    def _keep_leases(self):
+
+        if self._worker is None or time.time() - self._renewed <= self.lease / 3.0:
+            return
+
+        self.renew(self._worker)
+        self._renewed = time.time()
+
+    def renew(self, worker=None):
+        """
+        This method extend the lease of the running jobs of a worker and
+        retrieve the number of jobs renewed.
+        """
+
+        worker = worker or worker_id()
+
+        with self._connection() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET lease_until = ? WHERE state = ? AND worker = ?',
+                (time.time() + self.lease, RUNNING, worker)
+            )
+
+        return cursor.rowcount
+
+    def complete(self, result):
+        """
+        This method record the batch.Result of a job. Successful and skipped
+        jobs are done. Failed jobs are pending again to be retried, until
+        max_attempts attempts, and then are failed.
+        """
+
+        now = time.time()
+
+        with self._ahead:
+            self._outstanding = max(0, self._outstanding - 1)
+            self._keep_leases()
+            self._ahead.notify()
+
+        with self._connection() as conn:
+            if not result.error:
+                conn.execute(
+                    'UPDATE jobs SET state = ?, error = NULL, worker = NULL, lease_until = NULL, '
+                    'elapsed = ?, updated = ? WHERE pid = ?',
+                    (DONE, result.elapsed, now, result.pid)
+                )
+                return
+
+            conn.execute(
+                'UPDATE jobs SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, '
+                'error = ?, worker = NULL, lease_until = NULL, elapsed = ?, updated = ? '
+                'WHERE pid = ?',
+                (self.max_attempts, FAILED, PENDING, result.error, result.elapsed, now, result.pid)
+            )
+
+    def release(self, worker=None):
+        """
+        This method return the running jobs of a worker to the pending state,
+        not counting their attempt, and retrieve the number of jobs released.
+        Used when a worker stops before completing its jobs.
+        """
+
+        worker = worker or worker_id()
+
+        with self._connection() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET state = ?, attempts = MAX(0, attempts - 1), worker = NULL, '
+                'lease_until = NULL, updated = ? WHERE state = ? AND worker = ?',
+                (PENDING, time.time(), RUNNING, worker)
+            )
+
+        if cursor.rowcount:
+            logging.info('%d jobs released by (%s)', cursor.rowcount, worker)
+
+        return cursor.rowcount
+
+    def retry(self, state=FAILED):
+        """
+        This method return the jobs in the given state to the pending state,
+        with no attempts, and retrieve the number of jobs.
+        """
+
+        with self._connection() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET state = ?, attempts = 0, updated = ? WHERE state = ?',
+                (PENDING, time.time(), state)
+            )
+
+        return cursor.rowcount
+
+    def progress(self):
+        """
+        This method retrieve the number of jobs in each state and the total.
+        """
+
+        counts = dict([(x, 0) for x in STATES])
+
+        for state, count in self._connection().execute(
+            'SELECT state, COUNT(*) FROM jobs GROUP BY state'
+        ):
+            counts[state] = count
+
+        counts['total'] = sum([counts[x] for x in STATES])
+
+        return counts
+
+    def failures(self, limit=None):
+        """
+        This method retrieve the (pid, attempts, error) of the failed jobs.
+        """
+
+        rows = self._connection().execute(
+            'SELECT pid, attempts, error FROM jobs WHERE state = ? ORDER BY pid LIMIT ?',
+            (FAILED, -1 if limit is None else limit)
+        )
+
+        return [tuple(x) for x in rows]
+
+    def state(self, pid):
+        """
+        This method retrieve the (state, attempts, error) of a job, or None.
+        """
+
+        row = self._connection().execute(
+            'SELECT state, attempts, error FROM jobs WHERE pid = ?', (pid,)
+        ).fetchone()
+
+        return tuple(row) if row else None
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+
+    def __str__(self):
+        return self.path
+
+
+class _Transactions(object):
+    """
+    Connection in autocommit mode whose with blocks are immediate
+    transactions, so the jobs claimed by a worker are locked from the first
+    read and never claimed by another worker.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, *args):
+        return self.conn.execute(*args)
+
+    def executemany(self, *args):
+        return self.conn.executemany(*args)
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        if exc_type is None:
+            self.conn.execute('COMMIT')
+        else:
+            self.conn.execute('ROLLBACK')
+
+        return False
@@ -0,0 +1,126 @@
+import json
+import logging
+
+LOG_FORMATS = ('text', 'json')
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Format each log record as a JSON object in a single line. The summary of
+    a document, see log_document, is given in the document field.
+    """
+
+    def format(self, record):
+
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+
+        document = getattr(record, 'document', None)
+
+        if document is not None:
+            data['document'] = document
+
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+
+        return json.dumps(data, sort_keys=True, default=str)
+
+
+def handler(logging_file=None, log_format='text'):
+    """
+    This method retrieve the logging handler writing to the logging file, or
+    to the standard error when None, in the given format.
+    """
+
+    if logging_file:
+        log_handler = logging.FileHandler(logging_file)
+    else:
+        log_handler = logging.StreamHandler()
+
+    if log_format == 'json':
+        log_handler.setFormatter(JSONFormatter())
+    else:
+        log_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    return log_handler
+
+
+def debug_enabled():
+    """
+    This method check if the DEBUG records are emitted, so the loops only
+    logging the details of each file are skipped otherwise.
+    """
+
+    return logging.getLogger().isEnabledFor(logging.DEBUG)
+
+
+def log_document(result, article=None):
+    """
+    This method log the summary of the packing of a document in a single
+    record: status, elapsed time, assets found and missing and, when the
+    timing is enabled, the time of each stage. Failures are logged as
+    ERROR, documents with missing assets as WARNING and the others as INFO.
+
+    Keyword arguments:
+    result -- batch.Result of the document.
+    article -- feedstock.Article packed, to summarize its assets.
+    """
+
+    level = logging.INFO
+    assets = None
+
+    if result.error:
+        level = logging.ERROR
+    elif article is not None:
+        assets = article.assets_summary()
+        if assets['images_missing'] or not assets['documents']:
+            level = logging.WARNING
+
+    if not logging.getLogger().isEnabledFor(level):
+        return
+
+    data = {
+        'pid': result.pid,
+        'status': result.status,
+        'elapsed': result.elapsed
+    }
+
+    if result.error:
+        data['error'] = result.error
+
+    detail = ''
+
+    if assets is not None:
+        data.update(assets)
+        detail = ': %d documents, %d images (%d missing), %d midias, %d pdfs' % (
+            assets['documents'],
+            assets['images'],
+            len(assets['images_missing']),
+            assets['midias'],
+            assets['pdfs']
+        )
+    elif result.error:
+        detail = ': %s' % result.error
+
+    timings = getattr(result, 'timings', None)
+
+    if timings:
+        data['bytes_read'] = timings['bytes_read']
+        data['bytes_written'] = timings['bytes_written']
+        data['stages'] = {k: v['elapsed'] for k, v in timings['stages'].items()}
+
+    logging.log(
+        level,
+        'Document (%s) %s in %.3fs%s',
+        result.pid,
+        result.status,
+        result.elapsed,
+        detail,
+        extra={'document': data}
+    )
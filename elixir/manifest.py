@@ -0,0 +1,169 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+
+MANIFEST_SUFFIX = '.manifest.json'
+CHUNK_SIZE = 1024 * 1024
+
+
+def elixir_version():
+
+    from elixir import elixir
+
+    return elixir.__version__
+
+
+def file_digest(path):
+    """
+    This method retrieve the SHA-1 of a file, read in chunks.
+    """
+
+    digest = hashlib.sha1()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def metadata_revision(xml, raw_data):
+    """
+    This method retrieve a SHA-1 identifying the metadata revision of a
+    document, from its ArticleMeta XML and JSON.
+
+    Keyword arguments:
+    xml -- XML retrieved from ArticleMeta.
+    raw_data -- xylose Article retrieved from ArticleMeta.
+    """
+
+    digest = hashlib.sha1()
+    digest.update((xml or '').encode('utf-8'))
+    digest.update(json.dumps(raw_data.data, sort_keys=True).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def source_entry(path, digest=None):
+    """
+    This method retrieve the manifest entry of a source file, with its size,
+    modification time and SHA-1. The SHA-1 is computed when not given.
+    """
+
+    stat = os.stat(path)
+
+    return {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'sha1': digest or file_digest(path)
+    }
+
+
+class Manifest(object):
+    """
+    Record of how a package was built: the source files with their size,
+    modification time and SHA-1, the metadata revision and the elixir
+    version. Saved next to the package, it allows to tell if the package
+    must be rebuilt.
+
+    Keyword arguments:
+    pid -- document ID.
+    sources -- dict of source file path to its entry, see source_entry.
+    revision -- metadata revision, see metadata_revision.
+    version -- elixir version, default is the running version.
+    """
+
+    def __init__(self, pid, sources, revision, version=None):
+        self.pid = pid
+        self.sources = sources
+        self.revision = revision
+        self.version = version or elixir_version()
+
+    @classmethod
+    def load(cls, path):
+        """
+        This method retrieve the Manifest saved at the given path, or None
+        when it does not exist or could not be read.
+        """
+
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+
+            return cls(data['pid'], data['sources'], data['revision'], data['version'])
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError):
+            logging.warning('Invalid manifest (%s)', path)
+            return None
+
+    def as_dict(self):
+
+        return {
+            'pid': self.pid,
+            'version': self.version,
+            'revision': self.revision,
+            'sources': self.sources
+        }
+
+    def save(self, path):
+
+        directory = os.path.dirname(path) or '.'
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.as_dict(), f, indent=2, sort_keys=True)
+            os.replace(tmp, path)
+        except:
+            os.remove(tmp)
+            raise
+
+        logging.debug('Manifest writen at (%s)', path)
+
+    def changes(self, paths, revision, version=None):
+        """
+        This method retrieve the list of the reasons to rebuild the package,
+        empty when the package is up to date. Files with the same size and
+        modification time are considered unchanged, files with a different
+        modification time are compared by their SHA-1.
+
+        Keyword arguments:
+        paths -- the source files of the package as it would be built now.
+        revision -- current metadata revision.
+        version -- current elixir version, default is the running version.
+        """
+
+        changes = []
+
+        if self.version != (version or elixir_version()):
+            changes.append('elixir version changed')
+
+        if self.revision != revision:
+            changes.append('metadata changed')
+
+        paths = set(paths)
+
+        for path in sorted(paths - set(self.sources)):
+            changes.append('new source file %s' % path)
+
+        for path in sorted(set(self.sources) - paths):
+            changes.append('source file removed %s' % path)
+
+        for path in sorted(paths & set(self.sources)):
+            entry = self.sources[path]
+
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                changes.append('source file removed %s' % path)
+                continue
+
+            if stat.st_size != entry['size']:
+                changes.append('source file changed %s' % path)
+            elif stat.st_mtime != entry['mtime'] and file_digest(path) != entry['sha1']:
+                changes.append('source file changed %s' % path)
+
+        return changes
@@ -0,0 +1,431 @@
+import os
+import time
+import logging
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from elixir import timing
+
+DEFAULT_INTERVAL = 15
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_metrics = None
+
+
+def _escape(value):
+
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+
+    pairs = list(zip(names, values)) + list(extra or [])
+
+    if not pairs:
+        return ''
+
+    return '{%s}' % ','.join(['%s="%s"' % (k, _escape(v)) for k, v in pairs])
+
+
+def _number(value):
+
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(object):
+    """
+    Base of the metrics kept in a Registry. Each combination of label values
+    is a sample.
+
+    Keyword arguments:
+    name -- metric name.
+    documentation -- help text of the metric.
+    labels -- names of the labels of the metric.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+
+        return tuple([labels[x] for x in self.labels])
+
+    def value(self, **labels):
+
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+
+        with self._lock:
+            values = sorted(self._values.items())
+
+        return [(self.name, _labels(self.labels, k), v) for k, v in values]
+
+    def render(self):
+
+        lines = [
+            '# HELP %s %s' % (self.name, self.documentation),
+            '# TYPE %s %s' % (self.name, self.kind)
+        ]
+
+        lines += ['%s%s %s' % (n, l, _number(v)) for n, l, v in self.samples()]
+
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+
+    kind = 'counter'
+
+    def inc(self, value=1, **labels):
+
+        key = self._key(labels)
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(Metric):
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, value=1, **labels):
+
+        key = self._key(labels)
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def dec(self, value=1, **labels):
+
+        self.inc(-value, **labels)
+
+
+class Histogram(Metric):
+    """
+    Histogram with cumulative buckets, the percentiles are computed by the
+    Prometheus server with histogram_quantile.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        super(Histogram, self).__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value):
+
+        with self._lock:
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[index] += 1
+                    break
+            self._sum += value
+            self._count += 1
+
+    @property
+    def count(self):
+        return self._count
+
+    def samples(self):
+
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        samples = []
+        cumulative = 0
+        for bound, value in zip(self.buckets, counts):
+            cumulative += value
+            samples.append(
+                ('%s_bucket' % self.name, _labels((), (), [('le', _number(bound))]), cumulative)
+            )
+
+        samples.append(('%s_sum' % self.name, '', total))
+        samples.append(('%s_count' % self.name, '', count))
+
+        return samples
+
+
+class Registry(object):
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, buckets))
+
+    def render(self):
+        """
+        This method retrieve the metrics in the Prometheus text format.
+        """
+
+        return '\n'.join([x.render() for x in self.metrics]) + '\n'
+
+
+class BatchMetrics(object):
+    """
+    Counters and histograms of a batch run, updated by the batch driver with
+    the Results coming back from the workers, see batch.run.
+    """
+
+    def __init__(self):
+        self.registry = Registry()
+        self.start = time.time()
+
+        self.documents = self.registry.counter(
+            'elixir_documents_total', 'Documents processed, by status.', ['status'])
+        self.failures = self.registry.counter(
+            'elixir_failures_total', 'Documents failed, by error type.', ['error'])
+        self.bytes_read = self.registry.counter(
+            'elixir_bytes_read_total', 'Bytes read while packing the documents.')
+        self.bytes_written = self.registry.counter(
+            'elixir_bytes_written_total', 'Bytes written to the packages.')
+        self.packing = self.registry.histogram(
+            'elixir_packing_seconds', 'Time to pack a document.')
+        self.fetch = self.registry.histogram(
+            'elixir_fetch_seconds', 'Time to fetch the metadata of a document.')
+        self.queue_depth = self.registry.gauge(
+            'elixir_queue_depth', 'Documents dispatched and not packed yet.')
+        self.documents_rate = self.registry.gauge(
+            'elixir_documents_per_second', 'Documents processed per second since the start of the batch.')
+        self.bytes_rate = self.registry.gauge(
+            'elixir_bytes_per_second', 'Bytes written per second since the start of the batch.')
+        self.start_time = self.registry.gauge(
+            'elixir_batch_start_time_seconds', 'Start of the batch, as an unix timestamp.')
+        self.last_update = self.registry.gauge(
+            'elixir_last_update_time_seconds', 'Time of the snapshot, as an unix timestamp.')
+
+        self.start_time.set(self.start)
+
+    def submitted(self, count=1):
+        self.queue_depth.inc(count)
+
+    def observe_fetch(self, elapsed):
+        self.fetch.observe(elapsed)
+
+    def observe(self, result):
+        """
+        This method account a batch.Result.
+        """
+
+        self.queue_depth.dec()
+        self.documents.inc(status=result.status)
+        self.packing.observe(result.elapsed)
+
+        if result.error:
+            self.failures.inc(error=result.error.split(':')[0])
+
+        timings = getattr(result, 'timings', None)
+
+        if not timings:
+            return
+
+        self.bytes_read.inc(timings['bytes_read'])
+        self.bytes_written.inc(timings['bytes_written'])
+
+        fetch = [
+            timings['stages'][x]['elapsed']
+            for x in ['fetch_xml', 'fetch_json'] if x in timings['stages']
+        ]
+
+        if fetch:
+            self.fetch.observe(sum(fetch))
+
+    def render(self):
+
+        now = time.time()
+        elapsed = max(now - self.start, 1e-9)
+
+        self.documents_rate.set(self.packing.count / elapsed)
+        self.bytes_rate.set(self.bytes_written.value() / elapsed)
+        self.last_update.set(now)
+
+        return self.registry.render()
+
+
+def write_textfile(path, content):
+    """
+    This method write a snapshot to a file at once, so the node exporter
+    textfile collector never reads a partial file.
+    """
+
+    directory = os.path.dirname(path) or '.'
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except:
+        os.remove(tmp)
+        raise
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+
+        if self.path.split('?')[0] not in ['/', '/metrics']:
+            self.send_error(404)
+            return
+
+        body = self.server.metrics.render().encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug('Metrics endpoint: ' + format, *args)
+
+
+class Exporter(object):
+    """
+    Export the BatchMetrics while the batch runs: a snapshot is written to the
+    textfile every interval seconds and, when a port is given, the metrics
+    are served at /metrics.
+
+    Keyword arguments:
+    metrics -- BatchMetrics to export.
+    textfile -- path of the Prometheus textfile, None to not write it.
+    interval -- seconds between two snapshots.
+    port -- port of the HTTP endpoint, None to not serve the metrics.
+    host -- address of the HTTP endpoint.
+    """
+
+    def __init__(self, metrics, textfile=None, interval=DEFAULT_INTERVAL,
+                 port=None, host='127.0.0.1'):
+        self.metrics = metrics
+        self.textfile = textfile
+        self.interval = interval
+        self._stop = threading.Event()
+        self._writer = None
+        self.server = None
+
+        if textfile:
+            self._writer = threading.Thread(target=self._write_loop, name='elixir-metrics')
+            self._writer.daemon = True
+            self._writer.start()
+
+        if port is not None:
+            self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+            self.server.daemon_threads = True
+            self.server.metrics = metrics
+            thread = threading.Thread(target=self.server.serve_forever, name='elixir-metrics-http')
+            thread.daemon = True
+            thread.start()
+            logging.info('Metrics served at (http://%s:%d/metrics)', *self.server.server_address[:2])
+
+    def write(self):
+
+        if not self.textfile:
+            return
+
+        try:
+            write_textfile(self.textfile, self.metrics.render())
+        except OSError as e:
+            logging.warning('Unable to write the metrics to (%s): %s', self.textfile, e)
+
+    def _write_loop(self):
+
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def close(self):
+        """
+        This method stop the export, writing a last snapshot.
+        """
+
+        self._stop.set()
+
+        if self._writer:
+            self._writer.join()
+
+        self.write()
+
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def configure(textfile=None, interval=DEFAULT_INTERVAL, port=None, host='127.0.0.1'):
+    """
+    This method set the BatchMetrics of the current process and start its
+    export. Without textfile and port the metrics are disabled. The stages
+    timing is enabled while the metrics are, to account the bytes and the
+    fetch latency.
+    """
+    global _metrics
+
+    shutdown()
+
+    if not textfile and port is None:
+        return None
+
+    timing.enable()
+
+    metrics = BatchMetrics()
+    metrics.exporter = Exporter(metrics, textfile, interval, port, host)
+    _metrics = metrics
+
+    return metrics
+
+
+def get_metrics():
+    """
+    This method retrieve the BatchMetrics of the current process or None when
+    the metrics are disabled.
+    """
+
+    return _metrics
+
+
+def shutdown():
+    """
+    This method stop the export of the metrics, writing a last snapshot, and
+    disable them.
+    """
+    global _metrics
+
+    if _metrics is None:
+        return
+
+    _metrics.exporter.close()
+    timing.disable()
+    _metrics = None
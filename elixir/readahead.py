@@ -0,0 +1,140 @@
+import io
+import os
+import logging
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_READERS = 8
+
+DEFAULT_LIMIT = 1024 * 1024
+
+_settings = {'readers': DEFAULT_READERS, 'limit': DEFAULT_LIMIT}
+
+
+class Source(namedtuple('Source', ['path', 'stat', 'fp'])):
+    """
+    Source file opened to be added to a package, with its os.stat result. The
+    fp is the open file, or a BytesIO with its content when it was read
+    ahead. It must be closed by the consumer.
+    """
+
+    def close(self):
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+        return False
+
+
+def open_source(path, limit=0):
+    """
+    This method open a source file and retrieve a Source. Files up to limit
+    bytes are read at once and kept in memory, the larger ones are left open
+    to be copied in chunks.
+
+    Keyword arguments:
+    path -- path to the source file.
+    limit -- maximum size in bytes of the files read at once.
+    """
+
+    fp = open(path, 'rb')
+
+    try:
+        stat = os.fstat(fp.fileno())
+
+        if stat.st_size > limit:
+            return Source(path, stat, fp)
+
+        content = fp.read()
+    except:
+        fp.close()
+        raise
+
+    fp.close()
+
+    return Source(path, stat, io.BytesIO(content))
+
+
+def sources(paths, readers=None, limit=None):
+    """
+    This method retrieve a generator of the Source of each path, in the given
+    order, and None for the None paths. With more than one reader, the next
+    files are opened, and those up to limit bytes are read, by a pool of
+    threads while the current one is consumed, so the latency of each open
+    and read on network file systems overlaps. At most 2 * readers files are
+    ahead of the consumer.
+
+    An error opening a file is raised when its Source is retrieved. Close the
+    generator when the Sources are not consumed to the end.
+
+    Keyword arguments:
+    paths -- list of paths to the source files.
+    readers -- number of threads, default is set by configure.
+    limit -- maximum size in bytes of the files read ahead, default is set by
+    configure.
+    """
+
+    readers = readers or _settings['readers']
+    limit = _settings['limit'] if limit is None else limit
+
+    if readers <= 1 or len([x for x in paths if x]) <= 1:
+        for path in paths:
+            yield open_source(path) if path else None
+        return
+
+    paths = iter(paths)
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=readers, thread_name_prefix='elixir-readahead') as executor:
+
+        def submit():
+            for path in paths:
+                pending.append(executor.submit(open_source, path, limit) if path else None)
+                return
+
+        for _ in range(readers * 2):
+            submit()
+
+        try:
+            while pending:
+                future = pending.popleft()
+                submit()
+
+                yield future.result() if future is not None else None
+        finally:
+            for future in pending:
+                if future is None or future.cancel():
+                    continue
+
+                try:
+                    future.result().close()
+                except Exception:
+                    pass
+
+
+def buffered():
+    """
+    This method retrieve the maximum number of bytes kept in memory by the
+    read ahead of a package.
+    """
+
+    if _settings['readers'] <= 1:
+        return 0
+
+    return 2 * _settings['readers'] * _settings['limit']
+
+
+def configure(readers=DEFAULT_READERS, limit=DEFAULT_LIMIT):
+    """
+    This method set the number of threads reading the source files of a
+    package ahead, 1 disables the read ahead, and the maximum size of the
+    files read at once by them.
+    """
+
+    _settings.update(readers=readers or DEFAULT_READERS, limit=limit)
+
+    logging.debug('Source files read ahead by %d threads', _settings['readers'])
@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import logging
+import threading
+
+_settings = {}
+_references = None
+
+
+class ReferenceIndex(object):
+    """
+    Reverse index of the source files used by each package, persisted in a
+    SQLite database. For each source file, the images, midias, pdfs, html's
+    and xml's, it records the PIDs of the documents referencing it, so when a
+    source file is replaced only the affected packages are rebuilt.
+
+    The paths are stored relative to the source directory and lowercase, as
+    they are indexed by the feedstock.
+
+    Each process, and each thread, uses its own connection to the database.
+
+    Keyword arguments:
+    path -- path to the SQLite database file, created when missing.
+    source_dir -- source directory where the pdf, images and html's could be fetched.
+    """
+
+    def __init__(self, path, source_dir='.'):
+        self.path = path
+        self.source_dir = source_dir
+        self._local = threading.local()
+
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS refs '
+                '(path TEXT, pid TEXT, PRIMARY KEY (path, pid)) WITHOUT ROWID'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS refs_pid ON refs (pid)'
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+
+        if conn is None or self._local.owner != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+            self._local.owner = os.getpid()
+
+        return conn
+
+    def key(self, path):
+        """
+        This method retrieve the path of a source file as stored in the index,
+        relative to the source directory and lowercase.
+        """
+
+        relative = os.path.relpath(
+            os.path.abspath(path),
+            os.path.abspath(self.source_dir)
+        )
+
+        return relative.replace(os.sep, '/').lower()
+
+    def update(self, pid, paths):
+        """
+        This method replace the source files referenced by a document.
+
+        Keyword arguments:
+        pid -- document ID.
+        paths -- the source files referenced by the document.
+        """
+
+        rows = set([(self.key(x), pid) for x in paths])
+
+        with self._connection() as conn:
+            conn.execute('DELETE FROM refs WHERE pid = ?', (pid,))
+            conn.executemany(
+                'INSERT OR IGNORE INTO refs (path, pid) VALUES (?, ?)', rows
+            )
+
+        logging.debug('%d source files referenced by (%s)', len(rows), pid)
+
+    def remove(self, pid):
+
+        with self._connection() as conn:
+            conn.execute('DELETE FROM refs WHERE pid = ?', (pid,))
+
+    def paths(self, pid):
+        """
+        This method retrieve the source files referenced by a document,
+        relative to the source directory.
+        """
+
+        rows = self._connection().execute(
+            'SELECT path FROM refs WHERE pid = ? ORDER BY path', (pid,)
+        )
+
+        return [x[0] for x in rows]
+
+    def pids(self, *paths):
+        """
+        This method retrieve the sorted PIDs of the documents referencing any
+        of the given source files.
+        """
+
+        pids = set()
+        conn = self._connection()
+
+        for path in paths:
+            rows = conn.execute(
+                'SELECT pid FROM refs WHERE path = ?', (self.key(path),)
+            )
+            pids.update([x[0] for x in rows])
+
+        logging.info('%d documents referencing %d source files', len(pids), len(paths))
+
+        return sorted(pids)
+
+    def __contains__(self, pid):
+        row = self._connection().execute(
+            'SELECT 1 FROM refs WHERE pid = ? LIMIT 1', (pid,)
+        ).fetchone()
+
+        return row is not None
+
+    def __len__(self):
+        return self._connection().execute(
+            'SELECT COUNT(DISTINCT pid) FROM refs'
+        ).fetchone()[0]
+
+    def __str__(self):
+        return self.path
+
+
+def configure(path=None, source_dir='.'):
+    """
+    This method set the ReferenceIndex updated by the current process, a None
+    path disables the index.
+    """
+    global _references
+
+    _settings.clear()
+
+    if path:
+        _settings.update(path=path, source_dir=source_dir)
+
+    _references = None
+
+
+def get_references():
+    """
+    This method retrieve the ReferenceIndex of the current process or None
+    when the index is disabled.
+    """
+    global _references
+
+    if _references is None and _settings:
+        _references = ReferenceIndex(**_settings)
+
+    return _references
@@ -0,0 +1,110 @@
+import os
+import time
+import random
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TIMEOUT = (3.05, 10)
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_POOL_SIZE = 10
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+_settings = {}
+_session = None
+
+
+class Session(object):
+    """
+    HTTP session with keep-alive connection pooling, bounded retries and
+    exponential backoff with full jitter between the attempts. Connection
+    errors, timeouts and the status codes in RETRY_STATUS are retried.
+    """
+
+    def __init__(self, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_backoff=30, timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE):
+
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def backoff_time(self, attempt):
+        """
+        This method retrieve the seconds to wait before the given retry
+        attempt, a random value between 0 and backoff * 2 ** attempt.
+        """
+
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def get(self, url, **kwargs):
+
+        kwargs.setdefault('timeout', self.timeout)
+
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            else:
+                if response.status_code not in RETRY_STATUS:
+                    return response
+
+                error = requests.HTTPError(
+                    u'%s Error for url: %s' % (response.status_code, url),
+                    response=response
+                )
+
+            if attempt == self.retries:
+                break
+
+            wait = self.backoff_time(attempt)
+            logging.warning('Retrying (%s) in %.2fs: %s', url, wait, error)
+            time.sleep(wait)
+
+        logging.error('Giving up (%s) after %d attempts', url, self.retries + 1)
+        raise error
+
+    def close(self):
+        self.session.close()
+
+
+def configure(**kwargs):
+    """
+    This method set the arguments used to create the shared Session. The
+    Session already created, if any, is discarded.
+    """
+    global _session
+
+    _settings.update(kwargs)
+    _session = None
+
+
+def get_session():
+    """
+    This method retrieve the Session shared by the current process.
+    """
+    global _session
+
+    if _session is None:
+        _session = Session(**_settings)
+
+    return _session
+
+
+def _reset_after_fork():
+    global _session
+
+    _session = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
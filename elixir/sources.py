@@ -0,0 +1,246 @@
+import os
+import json
+import zlib
+import sqlite3
+import logging
+import threading
+
+from elixir import session
+from elixir import cache
+
+ARTICLEMETA_URL = 'http://192.168.1.162:7000'
+
+_source = None
+
+
+class ArticleMetaSource(object):
+    """
+    Retrieve the documents metadata from the ArticleMeta API, using the shared
+    pooled session and, when enabled, the response cache.
+
+    Keyword arguments:
+    url -- ArticleMeta base url.
+    """
+
+    def __init__(self, url=ARTICLEMETA_URL):
+        self.url = url.rstrip('/')
+
+    def fetch(self, url, key):
+        """
+        This method retrieve the body of the given ArticleMeta url. When the
+        response cache is enabled, fresh entries are used without any request
+        and stale entries are revalidated with a conditional request.
+
+        Keyword arguments:
+        url -- ArticleMeta url.
+        key -- key of the response in the cache, the format and the PID.
+        """
+
+        response_cache = cache.get_cache()
+        entry = None
+        headers = {}
+
+        if response_cache:
+            entry = response_cache.get(key)
+
+            if entry and response_cache.is_fresh(entry):
+                logging.debug('Cache hit (%s)', key)
+                return entry.body
+
+            if entry:
+                headers = entry.validators()
+
+        response = session.get_session().get(url, headers=headers)
+
+        if entry and response.status_code == 304:
+            logging.debug('Cache entry revalidated (%s)', key)
+            response_cache.touch(key)
+            return entry.body
+
+        response.raise_for_status()
+
+        body = response.text.strip()
+
+        if response_cache:
+            response_cache.set(
+                key,
+                body,
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified')
+            )
+
+        return body
+
+    def xml(self, pid):
+        url = '%s/api/v1/article?code=%s&format=xmlrsps' % (self.url, pid)
+
+        return self.fetch(url, 'xmlrsps:%s' % pid)
+
+    def json(self, pid):
+        url = '%s/api/v1/article?code=%s' % (self.url, pid)
+
+        return self.fetch(url, 'json:%s' % pid)
+
+    def __str__(self):
+        return self.url
+
+
+class LocalStore(object):
+    """
+    Local SQLite store of the documents metadata, indexed by PID. The XML and
+    the JSON of each document are stored zlib compressed. The store is filled
+    with import_dump and then used as a source without any network access.
+
+    Each process, and each thread, uses its own connection to the database.
+
+    Keyword arguments:
+    path -- path to the SQLite database file, created when missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS documents '
+                '(pid TEXT PRIMARY KEY, json BLOB, xml BLOB) WITHOUT ROWID'
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+
+        if conn is None or self._local.owner != os.getpid():
+            conn = sqlite3.connect(self.path)
+            self._local.conn = conn
+            self._local.owner = os.getpid()
+
+        return conn
+
+    def _get(self, pid, column):
+        row = self._connection().execute(
+            'SELECT %s FROM documents WHERE pid = ?' % column, (pid,)
+        ).fetchone()
+
+        if row is None or row[0] is None:
+            logging.error('Document not found in the local store (%s)', pid)
+            raise LookupError(u'Document not found: %s' % pid)
+
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def xml(self, pid):
+        return self._get(pid, 'xml')
+
+    def json(self, pid):
+        return self._get(pid, 'json')
+
+    def __contains__(self, pid):
+        row = self._connection().execute(
+            'SELECT 1 FROM documents WHERE pid = ?', (pid,)
+        ).fetchone()
+
+        return row is not None
+
+    def __len__(self):
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM documents'
+        ).fetchone()[0]
+
+    def add(self, pid, json_data=None, xml=None):
+
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO documents (pid, json, xml) VALUES (?, ?, ?)',
+                self._row(pid, json_data, xml)
+            )
+
+    @staticmethod
+    def _row(pid, json_data, xml):
+
+        if isinstance(json_data, dict):
+            json_data = json.dumps(json_data)
+
+        return (
+            pid,
+            zlib.compress(json_data.encode('utf-8')) if json_data else None,
+            zlib.compress(xml.strip().encode('utf-8')) if xml else None
+        )
+
+    def import_dump(self, fp, batch_size=1000):
+        """
+        This method import an ArticleMeta dump in the NDJSON format, one
+        document per line. Each line is the article JSON, as retrieved by the
+        ArticleMeta API, with the PID in the code field. The XML of the
+        document, when available, must be given in the xml field. Documents
+        already in the store are replaced.
+
+        Keyword arguments:
+        fp -- path to the dump or a file like object.
+        batch_size -- number of documents written per transaction.
+        """
+
+        if isinstance(fp, str):
+            with open(fp, 'r', encoding='utf-8') as f:
+                return self.import_dump(f, batch_size)
+
+        imported = 0
+        rows = []
+
+        def flush():
+            with self._connection() as conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO documents (pid, json, xml) VALUES (?, ?, ?)',
+                    rows
+                )
+            del rows[:]
+
+        for number, line in enumerate(fp, 1):
+            line = line.strip()
+
+            if not line:
+                continue
+
+            try:
+                data = json.loads(line)
+                pid = data['code']
+            except (ValueError, KeyError):
+                logging.warning('Invalid document at line %d of the dump', number)
+                continue
+
+            xml = data.pop('xml', None)
+            rows.append(self._row(pid, data, xml))
+            imported += 1
+
+            if len(rows) >= batch_size:
+                flush()
+                logging.info('%d documents imported', imported)
+
+        flush()
+        logging.info('%d documents imported into (%s)', imported, self.path)
+
+        return imported
+
+    def __str__(self):
+        return self.path
+
+
+def configure(source=None):
+    """
+    This method set the metadata source used by the current process, None
+    restores the ArticleMeta API.
+    """
+    global _source
+
+    _source = source
+
+
+def get_source():
+    """
+    This method retrieve the metadata source used by the current process.
+    """
+    global _source
+
+    if _source is None:
+        _source = ArticleMetaSource()
+
+    return _source
@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import logging
+import threading
+
+_callbacks = []
+_enabled = 0
+_log = None
+_local = threading.local()
+
+
+class _NullStage(object):
+    """
+    Stage used when the timing is disabled, it records nothing.
+    """
+
+    enabled = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def read(self, size):
+        pass
+
+    def written(self, size):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Stage(object):
+    """
+    Measure the wall time and the bytes read and written of a stage of the
+    packing of a document. The time of the stages nested in it is not
+    counted, so the stages of a document add up to its packing time.
+    """
+
+    enabled = True
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.nested = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.timings.stack.append(self)
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.start
+        self.timings.stack.pop()
+
+        if self.timings.stack:
+            self.timings.stack[-1].nested += elapsed
+
+        self.timings.add(self.name, elapsed - self.nested, self.bytes_read, self.bytes_written)
+
+        return False
+
+    def read(self, size):
+        self.bytes_read += size
+
+    def written(self, size):
+        self.bytes_written += size
+
+
+class Timings(object):
+    """
+    Timing of the stages of the packing of a document.
+
+    Keyword arguments:
+    pid -- document ID.
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.stages = {}
+        self.stack = []
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.elapsed = None
+        self.error = None
+
+    def add(self, name, elapsed, bytes_read=0, bytes_written=0):
+
+        stage = self.stages.setdefault(
+            name, {'elapsed': 0.0, 'count': 0, 'bytes_read': 0, 'bytes_written': 0}
+        )
+        stage['elapsed'] += elapsed
+        stage['count'] += 1
+        stage['bytes_read'] += bytes_read
+        stage['bytes_written'] += bytes_written
+
+    def as_dict(self):
+
+        return {
+            'pid': self.pid,
+            'timestamp': self.timestamp,
+            'elapsed': self.elapsed,
+            'error': self.error,
+            'bytes_read': sum([x['bytes_read'] for x in self.stages.values()]),
+            'bytes_written': sum([x['bytes_written'] for x in self.stages.values()]),
+            'stages': self.stages
+        }
+
+
+class _Document(object):
+
+    def __init__(self, pid):
+        self.timings = Timings(pid)
+
+    def __enter__(self):
+        self.previous = getattr(_local, 'timings', None)
+        _local.timings = self.timings
+
+        return self.timings
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.timings = self.previous
+        self.timings.elapsed = time.perf_counter() - self.timings.start
+
+        if exc_type is not None:
+            self.timings.error = exc_type.__name__
+
+        record = self.timings.as_dict()
+
+        for callback in list(_callbacks):
+            try:
+                callback(record)
+            except Exception as e:
+                logging.warning('Timing callback failed: %s', e)
+
+        return False
+
+
+class _NullDocument(object):
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_DOCUMENT = _NullDocument()
+
+
+def document(pid):
+    """
+    This method retrieve a context manager timing the packing of a document in
+    the current thread. When it exits, the callbacks are called with the
+    timing of the document as a dict. When no callback is registered and the
+    timing was not enabled nothing is recorded and None is retrieved.
+
+    Keyword arguments:
+    pid -- document ID.
+    """
+
+    if not _callbacks and not _enabled:
+        return _NULL_DOCUMENT
+
+    return _Document(pid)
+
+
+def stage(name):
+    """
+    This method retrieve a context manager timing a stage of the document
+    being packed in the current thread, see document. Out of a document it
+    records nothing.
+
+    Keyword arguments:
+    name -- name of the stage, the timing of stages with the same name is added.
+    """
+
+    timings = getattr(_local, 'timings', None)
+
+    if timings is None:
+        return _NULL_STAGE
+
+    return Stage(timings, name)
+
+
+def register(callback):
+    """
+    This method register a callable to receive the timing of each document
+    packed, as a dict.
+    """
+
+    if callback not in _callbacks:
+        _callbacks.append(callback)
+
+
+def unregister(callback):
+
+    if callback in _callbacks:
+        _callbacks.remove(callback)
+
+
+def enable():
+    """
+    This method enable the timing of the documents without any callback, the
+    timing is then retrieved by the caller of document. Each enable must be
+    followed by a disable.
+    """
+    global _enabled
+
+    _enabled += 1
+
+
+def disable():
+    global _enabled
+
+    _enabled = max(0, _enabled - 1)
+
+
+class TimingLog(object):
+    """
+    Timing callback appending the timing of each document to a JSON lines
+    file. Each process opens the file on its own and writes each line at once,
+    so the workers of a batch share the same log.
+
+    Keyword arguments:
+    path -- path to the timing log.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._owner = None
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+
+        line = json.dumps(record, sort_keys=True) + '\n'
+
+        with self._lock:
+            if self._file is None or self._owner != os.getpid():
+                self._file = open(self.path, 'a', encoding='utf-8')
+                self._owner = os.getpid()
+
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+
+        with self._lock:
+            if self._file is not None and self._owner == os.getpid():
+                self._file.close()
+            self._file = None
+
+
+def configure(timing_log=None):
+    """
+    This method set the JSON lines file receiving the timing of the documents
+    packed by the current process, None disables the timing log.
+    """
+    global _log
+
+    if _log is not None:
+        unregister(_log)
+        _log.close()
+        _log = None
+
+    if timing_log:
+        _log = TimingLog(timing_log)
+        register(_log)
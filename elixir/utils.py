@@ -1,43 +1,344 @@
 from io import StringIO, BytesIO
-from zipfile import ZipFile
-import codecs
+from zipfile import ZipFile, ZipInfo, ZIP64_LIMIT
+import os
+import time
+import shutil
 import logging
+import zipfile
+import hashlib
+
+from elixir import timing
+from elixir import readahead
+
+COMPRESSION_METHODS = {
+    'stored': zipfile.ZIP_STORED,
+    'deflate': zipfile.ZIP_DEFLATED,
+    'bzip2': zipfile.ZIP_BZIP2,
+    'lzma': zipfile.ZIP_LZMA
+}
+
+if hasattr(zipfile, 'ZIP_ZSTANDARD'):
+    COMPRESSION_METHODS['zstd'] = zipfile.ZIP_ZSTANDARD
+
+TEXT_EXTENSIONS = ['xml', 'htm', 'html', 'txt', 'css', 'js', 'svg', 'csv', 'json']
+
+
+class CompressionPolicy(object):
+    """
+    Choose the compression method and level of each package member by its
+    file extension. The default policy deflates the text files and stores
+    everything else, since images, PDFs and videos are already compressed.
+
+    Keyword arguments:
+    rules -- dict of extension to (method, level), the method is a key of
+    COMPRESSION_METHODS and a None level uses the method default.
+    default -- (method, level) of the extensions not given in rules.
+    """
+
+    def __init__(self, rules=None, default=('stored', None)):
+
+        if rules is None:
+            rules = {x: ('deflate', 6) for x in TEXT_EXTENSIONS}
+
+        for method, level in list(rules.values()) + [default]:
+            if method not in COMPRESSION_METHODS:
+                raise ValueError(
+                    'Compression method not available: %s, expected one of %s' % (
+                        method, ', '.join(sorted(COMPRESSION_METHODS))
+                    )
+                )
+
+        self.rules = {k.lower(): v for k, v in rules.items()}
+        self.default = default
+
+    @classmethod
+    def parse(cls, text):
+        """
+        This method retrieve a CompressionPolicy from a string like
+        'xml,htm=deflate:9,pdf=stored,*=stored', with comma separated
+        extension=method[:level] items and * for the other extensions.
+        Extensions without a method take the method of the next item.
+        """
+
+        rules = {}
+        default = ('stored', None)
+        extensions = []
+
+        for item in [x.strip() for x in text.split(',') if x.strip()]:
+            if '=' not in item:
+                extensions.append(item)
+                continue
+
+            extension, method = item.split('=', 1)
+            method, level = (method.split(':', 1) + [None])[0:2]
+            rule = (method.strip(), int(level) if level else None)
+
+            for x in extensions + [extension.strip()]:
+                if x == '*':
+                    default = rule
+                else:
+                    rules[x] = rule
+
+            extensions = []
+
+        return cls(rules, default)
+
+    def compression(self, name):
+        """
+        This method retrieve the zipfile compress type and level for a member.
+        """
+
+        extension = name.split('.')[-1].lower() if '.' in name else ''
+        method, level = self.rules.get(extension, self.default)
+
+        return (COMPRESSION_METHODS[method], level)
+
+    def zipinfo(self, name, path=None, stat=None):
+        """
+        This method retrieve a ZipInfo for a member, with the date of the file
+        when a path or its os.stat result is given.
+        """
+
+        if path and stat is None:
+            stat = os.stat(path)
+
+        if stat is not None:
+            zinfo = ZipInfo(name, time.localtime(stat.st_mtime)[:6])
+            zinfo.external_attr = (stat.st_mode & 0xFFFF) << 16
+            zinfo.file_size = stat.st_size
+        else:
+            zinfo = ZipInfo(name, time.localtime(time.time())[:6])
+            zinfo.external_attr = 0o600 << 16
+
+        zinfo.compress_type, level = self.compression(name)
+        set_compress_level(zinfo, level)
+
+        return zinfo
+
+
+def set_compress_level(zinfo, level):
+    """
+    This method set the compression level of a ZipInfo, used by ZipFile.open
+    when writing the member. The attribute is public as compress_level since
+    Python 3.13, the previous versions read the private _compresslevel.
+    """
+
+    if hasattr(ZipInfo, 'compress_level'):
+        zinfo.compress_level = level
+    elif hasattr(ZipInfo, '_compresslevel'):
+        zinfo._compresslevel = level
+    else:
+        raise RuntimeError('The compression level of the zip members is not supported')
+
+
+DEFAULT_COMPRESSION = CompressionPolicy()
+
+
+class memoized_property(object):
+    """
+    Property evaluated at most once per instance. The value is kept in the
+    instance until discarded with memoized_property.invalidate.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner):
+
+        if instance is None:
+            return self
+
+        memoized = instance.__dict__.setdefault('_memoized', {})
+
+        if self.__name__ not in memoized:
+            memoized[self.__name__] = self.func(instance)
+
+        return memoized[self.__name__]
+
+    @staticmethod
+    def invalidate(instance, *names):
+
+        memoized = instance.__dict__.get('_memoized', {})
+
+        if not names:
+            memoized.clear()
+
+        for name in names:
+            memoized.pop(name, None)
+
+
+class _DigestWriter(object):
+
+    def __init__(self, fp, digest):
+        self.fp = fp
+        self.digest = digest
+
+    def write(self, data):
+        self.digest.update(data)
+        return self.fp.write(data)
+
+
+def source_path(item):
+    """
+    This method retrieve the path of the source file of a package member, or
+    None for the MemoryFileLike members.
+    """
+
+    if isinstance(item, MemoryFileLike):
+        return None
+
+    if isinstance(item, FileMember):
+        return item.path
+
+    return item
+
+
+def member_name(item):
+    """
+    This method retrieve the name in the package of a member given as a path,
+    FileMember or MemoryFileLike.
+    """
+
+    if isinstance(item, (FileMember, MemoryFileLike)):
+        return item.name.split('/')[-1]
+
+    return item.split('/')[-1]
+
+
+def read_sources(items, package='package'):
+    """
+    This method retrieve a generator of (item, readahead.Source) for the
+    given package members, in order, with the source files read ahead, see
+    readahead.sources. The Source is None for the MemoryFileLike members.
+    """
+
+    sources = readahead.sources([source_path(x) for x in items])
+
+    try:
+        for item in items:
+            try:
+                source = next(sources)
+            except FileNotFoundError:
+                logging.info('Unable to prepare %s, file not found (%s)', package, source_path(item))
+                raise
+
+            yield (item, source)
+    finally:
+        sources.close()
 
 
 class WrapFiles(object):
-    def __init__(self, *args):
-        self.memory_zip = BytesIO()
-        self.thezip = ZipFile(self.memory_zip, 'a')
+    """
+    Build a zip package with the given files. When a target path is given the
+    zip is written straight to it and each member is copied in chunks of
+    CHUNK_SIZE bytes, so the memory used does not depend on the package
+    size. Without a target the package is built in memory and retrieved by
+    read.
+
+    Each member is compressed as set by the CompressionPolicy. The SHA-1 of
+    the files copied, computed while copying, are kept in digests.
+
+    Keyword arguments:
+    args -- paths to files, FileMember or MemoryFileLike objects.
+    target -- path of the zip file to write.
+    compression -- CompressionPolicy, default is DEFAULT_COMPRESSION.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, *args, target=None, compression=None):
+        self.target = target
+        self.compression = compression or DEFAULT_COMPRESSION
+        self.digests = {}
+
+        if target:
+            self.memory_zip = None
+            self.thezip = ZipFile(target, 'w')
+        else:
+            self.memory_zip = BytesIO()
+            self.thezip = ZipFile(self.memory_zip, 'a')
 
         if len(args) > 0:
             self.append(*args)
 
+    def _copy(self, item, source):
+
+        name = member_name(item)
+        size = source.stat.st_size
+
+        with source:
+            zinfo = self.compression.zipinfo(name, stat=source.stat)
+            digest = hashlib.sha1()
+            with self.thezip.open(zinfo, 'w', force_zip64=size > ZIP64_LIMIT) as member:
+                shutil.copyfileobj(source.fp, _DigestWriter(member, digest), self.CHUNK_SIZE)
+
+        self.digests[source.path] = digest.hexdigest()
+
+        return (size, zinfo.compress_size)
+
+    def _write(self, item):
+
+        zinfo = self.compression.zipinfo(item.name.split('/')[-1])
+        content = item.read().encode('utf-8')
+
+        self.thezip.writestr(zinfo, content)
+
+        return (len(content), zinfo.compress_size)
+
     def append(self, *args):
 
-        for item in args:
+        with timing.stage('zip') as stage:
+            for item, source in read_sources(args, 'zip file'):
 
-            if isinstance(item, MemoryFileLike):
-                x = item
-            else:
-                x = codecs.open(item, 'rb')
+                if isinstance(item, MemoryFileLike):
+                    size, compressed = self._write(item)
+                else:
+                    size, compressed = self._copy(item, source)
 
-            name = x.name.split('/')[-1]
-            try:
-                self.thezip.writestr(name, x.read())
-            except FileNotFoundError:
-                logging.info('Unable to prepare zip file, file not found (%s)' % item)
-                raise
+                stage.read(size)
+                stage.written(compressed)
 
-        logging.info('Zip file prepared')
+        logging.debug('Zip file prepared')
 
         return self.thezip
 
+    def close(self):
+
+        with timing.stage('write'):
+            self.thezip.close()
+
     def read(self):
-        self.thezip.close()
+        self.close()
+
+        if self.memory_zip is None:
+            with open(self.target, 'rb') as f:
+                return f.read()
+
         self.memory_zip.seek(0)
         return self.memory_zip.read()
 
 
+class FileMember(object):
+    """
+    Source file added to a package by path under the given member name. Its
+    bytes are copied as they are, never decoded, so the member is identical
+    to the file.
+
+    Keyword arguments:
+    path -- path to the source file.
+    name -- name of the member, default is the name of the file.
+    """
+
+    def __init__(self, path, name=None):
+        self.path = path
+        self.name = name or path.split('/')[-1]
+
+    def __repr__(self):
+        return 'FileMember(%r, %r)' % (self.path, self.name)
+
+
 class MemoryFileLike(object):
 
     def __init__(self, file_name, content=None, encoding='utf-8'):
@@ -0,0 +1,270 @@
+import os
+import io
+import time
+import shutil
+import hashlib
+import logging
+import tarfile
+
+from elixir import timing
+from elixir import utils
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_FORMAT = 'zip'
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class _DigestReader(object):
+
+    def __init__(self, fp, digest):
+        self.fp = fp
+        self.digest = digest
+
+    def read(self, size=-1):
+        data = self.fp.read(size)
+        self.digest.update(data)
+        return data
+
+
+class TarWriter(object):
+    """
+    Build a tar package with the given files. The tar is written as a stream
+    straight to the target and each member is copied in chunks, so the memory
+    used does not depend on the package size. The whole stream is compressed
+    by the given method, the CompressionPolicy does not apply.
+
+    The SHA-1 of the files copied, computed while copying, are kept in
+    digests.
+
+    Keyword arguments:
+    args -- paths to files, FileMember or MemoryFileLike objects.
+    target -- path of the tar file to write.
+    method -- compression of the stream, None or one of gz, bz2, xz and zst.
+    compression -- ignored, accepted for compatibility with utils.WrapFiles.
+    """
+
+    def __init__(self, *args, target=None, method=None, compression=None):
+
+        if not target:
+            raise ValueError('A target is required to write a tar package')
+
+        self.target = target
+        self.digests = {}
+        self._stream = None
+
+        if method == 'zst' and 'zst' not in tarfile.TarFile.OPEN_METH:
+            self._stream = zstandard.ZstdCompressor().stream_writer(open(target, 'wb'))
+            self.thetar = tarfile.open(fileobj=self._stream, mode='w|')
+        else:
+            self.thetar = tarfile.open(target, 'w|%s' % (method or ''))
+
+        self.thetar.copybufsize = CHUNK_SIZE
+
+        if len(args) > 0:
+            self.append(*args)
+
+    def _copy(self, item, source):
+
+        with source:
+            tarinfo = tarfile.TarInfo(utils.member_name(item))
+            tarinfo.size = source.stat.st_size
+            tarinfo.mtime = source.stat.st_mtime
+            tarinfo.mode = 0o644
+            digest = hashlib.sha1()
+            self.thetar.addfile(tarinfo, _DigestReader(source.fp, digest))
+
+        self.digests[source.path] = digest.hexdigest()
+
+        return source.stat.st_size
+
+    def _write(self, item):
+
+        content = item.read().encode('utf-8')
+        tarinfo = tarfile.TarInfo(item.name.split('/')[-1])
+        tarinfo.size = len(content)
+        tarinfo.mtime = time.time()
+        tarinfo.mode = 0o600
+
+        self.thetar.addfile(tarinfo, io.BytesIO(content))
+
+        return len(content)
+
+    def append(self, *args):
+
+        with timing.stage('tar') as stage:
+            for item, source in utils.read_sources(args, 'tar file'):
+
+                if isinstance(item, utils.MemoryFileLike):
+                    stage.read(self._write(item))
+                else:
+                    stage.read(self._copy(item, source))
+
+        logging.debug('Tar file prepared')
+
+        return self.thetar
+
+    def close(self):
+
+        with timing.stage('write') as stage:
+            self.thetar.close()
+
+            if self._stream is not None:
+                self._stream.close()
+
+            if stage.enabled:
+                stage.written(os.path.getsize(self.target))
+
+
+class DirectoryWriter(object):
+    """
+    Write the package as a plain directory with one file per member, ready to
+    be synchronized with rsync. The files are copied in chunks keeping their
+    modification time.
+
+    The SHA-1 of the files copied, computed while copying, are kept in
+    digests.
+
+    Keyword arguments:
+    args -- paths to files, FileMember or MemoryFileLike objects.
+    target -- path of the directory to write, created when missing.
+    compression -- ignored, accepted for compatibility with utils.WrapFiles.
+    """
+
+    def __init__(self, *args, target=None, compression=None):
+
+        if not target:
+            raise ValueError('A target is required to write a directory package')
+
+        self.target = target
+        self.digests = {}
+
+        os.makedirs(target, exist_ok=True)
+
+        if len(args) > 0:
+            self.append(*args)
+
+    def _copy(self, item, source):
+
+        destination = os.path.join(self.target, utils.member_name(item))
+
+        with source, open(destination, 'wb') as f:
+            digest = hashlib.sha1()
+            shutil.copyfileobj(_DigestReader(source.fp, digest), f, CHUNK_SIZE)
+
+        os.utime(destination, (source.stat.st_atime, source.stat.st_mtime))
+        self.digests[source.path] = digest.hexdigest()
+
+        return source.stat.st_size
+
+    def _write(self, item):
+
+        content = item.read().encode('utf-8')
+
+        with open(os.path.join(self.target, item.name.split('/')[-1]), 'wb') as f:
+            f.write(content)
+
+        return len(content)
+
+    def append(self, *args):
+
+        with timing.stage('copy') as stage:
+            for item, source in utils.read_sources(args, 'the package directory'):
+
+                if isinstance(item, utils.MemoryFileLike):
+                    size = self._write(item)
+                else:
+                    size = self._copy(item, source)
+
+                stage.read(size)
+                stage.written(size)
+
+        logging.debug('Package directory prepared')
+
+    def close(self):
+        pass
+
+
+FORMATS = {
+    'zip': ('.zip', utils.WrapFiles, {}),
+    'tar': ('.tar', TarWriter, {'method': None}),
+    'tar.gz': ('.tar.gz', TarWriter, {'method': 'gz'}),
+    'tar.bz2': ('.tar.bz2', TarWriter, {'method': 'bz2'}),
+    'tar.xz': ('.tar.xz', TarWriter, {'method': 'xz'}),
+    'dir': ('', DirectoryWriter, {})
+}
+
+if 'zst' in tarfile.TarFile.OPEN_METH or zstandard is not None:
+    FORMATS['tar.zst'] = ('.tar.zst', TarWriter, {'method': 'zst'})
+
+
+def _format(package_format):
+
+    if package_format not in FORMATS:
+        raise ValueError(
+            'Package format not available: %s, expected one of %s' % (
+                package_format, ', '.join(sorted(FORMATS))
+            )
+        )
+
+    return FORMATS[package_format]
+
+
+def extension(package_format=DEFAULT_FORMAT):
+    """
+    This method retrieve the extension of the packages of the given format,
+    the directory packages have none.
+    """
+
+    return _format(package_format)[0]
+
+
+def open_writer(target, package_format=DEFAULT_FORMAT, compression=None):
+    """
+    This method retrieve the writer of a package of the given format. The
+    writers take paths to files, utils.FileMember and utils.MemoryFileLike
+    objects with append, must be closed and keep the SHA-1 of the files
+    copied in digests.
+
+    Keyword arguments:
+    target -- path of the package to write.
+    package_format -- one of FORMATS, default is zip.
+    compression -- utils.CompressionPolicy of the members, used by zip only.
+    """
+
+    writer, kwargs = _format(package_format)[1:]
+
+    return writer(target=target, compression=compression, **kwargs)
+
+
+def commit(partial, target):
+    """
+    This method move a package written at partial to its target, replacing
+    the previous one. A previous directory package is moved aside first and
+    removed afterwards.
+    """
+
+    if os.path.isdir(target) and not os.path.islink(target):
+        previous = '%s.old' % target
+        shutil.rmtree(previous, ignore_errors=True)
+        os.replace(target, previous)
+        os.replace(partial, target)
+        shutil.rmtree(previous)
+        return
+
+    os.replace(partial, target)
+
+
+def discard(partial):
+    """
+    This method remove a package partially written, if any.
+    """
+
+    if os.path.isdir(partial) and not os.path.islink(partial):
+        shutil.rmtree(partial)
+    elif os.path.exists(partial):
+        os.remove(partial)
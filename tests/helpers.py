@@ -0,0 +1,18 @@
+from unittest import mock
+
+
+def raw_data(acronym, volume, number, file_code=None):
+    """
+    This method retrieve a stand-in of the xylose Article of a document of
+    the given issue, with the fields used to locate its source files.
+    """
+
+    return mock.Mock(
+        journal_acronym=acronym,
+        issue=number,
+        volume=volume,
+        supplement_volume=None,
+        supplement_issue=None,
+        document_type='research-article',
+        file_code=file_code
+    )
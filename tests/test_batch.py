@@ -0,0 +1,269 @@
+import unittest
+import io
+from unittest import mock
+
+from elixir import batch, budget, fetcher, timing
+from tests.helpers import raw_data
+
+
+class ReadPidsTests(unittest.TestCase):
+
+    def test_read_pids(self):
+        source = io.StringIO(
+            u'S0034-89102013000400674\n\n# comment\n  S0034-89102006000700007  \n'
+        )
+
+        pids = list(batch.read_pids(source))
+
+        self.assertEqual(
+            pids, [u'S0034-89102013000400674', u'S0034-89102006000700007']
+        )
+
+    def test_read_pids_from_stdin(self):
+
+        with mock.patch('sys.stdin', io.StringIO(u'S0034-89102013000400674\n')):
+            pids = list(batch.read_pids('-'))
+
+        self.assertEqual(pids, [u'S0034-89102013000400674'])
+
+
+class PackTests(unittest.TestCase):
+
+    def test_pack_invalid_pid(self):
+
+        result = batch.pack(u'S003489102013000400674')
+
+        self.assertEqual(result.status, batch.FAILURE)
+        self.assertTrue(result.error.startswith('ValueError'))
+
+    def test_pack_records_failure(self):
+
+        with mock.patch('elixir.feedstock.loadXML', side_effect=IOError('timeout')):
+            result = batch.pack(u'S0034-89102013000400674')
+
+        self.assertEqual(result.pid, u'S0034-89102013000400674')
+        self.assertEqual(result.status, batch.FAILURE)
+        self.assertEqual(result.error, 'OSError: timeout')
+
+    def test_pack_success(self):
+
+        with mock.patch('elixir.feedstock.loadXML'), \
+                mock.patch('elixir.feedstock.load_rawdata'), \
+                mock.patch('elixir.feedstock.Article') as article:
+            result = batch.pack(u'S0034-89102013000400674', '.', '/tmp')
+
+        self.assertEqual(result.status, batch.SUCCESS)
+        self.assertIsNone(result.error)
+        self.assertTrue(article.return_value.wrap_document.called)
+
+    def test_pack_incremental_skips_up_to_date(self):
+
+        with mock.patch('elixir.feedstock.loadXML'), \
+                mock.patch('elixir.feedstock.load_rawdata'), \
+                mock.patch('elixir.feedstock.Article') as article:
+            article.return_value.is_up_to_date.return_value = True
+            result = batch.pack(u'S0034-89102013000400674', '.', '/tmp', incremental=True)
+
+        self.assertEqual(result.status, batch.SKIPPED)
+        self.assertFalse(article.return_value.wrap_document.called)
+
+    def test_pack_incremental_rebuilds_changed(self):
+
+        with mock.patch('elixir.feedstock.loadXML'), \
+                mock.patch('elixir.feedstock.load_rawdata'), \
+                mock.patch('elixir.feedstock.Article') as article:
+            article.return_value.is_up_to_date.return_value = False
+            result = batch.pack(u'S0034-89102013000400674', '.', '/tmp', incremental=True)
+
+        self.assertEqual(result.status, batch.SUCCESS)
+        self.assertTrue(article.return_value.wrap_document.called)
+
+    def test_pack_records_timing(self):
+        records = []
+        timing.register(records.append)
+        self.addCleanup(timing.unregister, records.append)
+
+        with mock.patch('elixir.feedstock.loadXML', side_effect=IOError('timeout')):
+            batch.pack(u'S0034-89102013000400674')
+
+        self.assertEqual(records[0]['pid'], u'S0034-89102013000400674')
+        self.assertEqual(records[0]['error'], 'OSError')
+
+    def test_pack_records_references(self):
+        reference_index = mock.Mock()
+
+        with mock.patch('elixir.feedstock.loadXML'), \
+                mock.patch('elixir.feedstock.load_rawdata'), \
+                mock.patch('elixir.feedstock.Article') as article, \
+                mock.patch('elixir.references.get_references', return_value=reference_index):
+            article.return_value.referenced_sources = ['src/img/rsp/v47n4/fig1.jpg']
+            batch.pack(u'S0034-89102013000400674', '.', '/tmp')
+
+        reference_index.update.assert_called_once_with(
+            u'S0034-89102013000400674', ['src/img/rsp/v47n4/fig1.jpg']
+        )
+
+
+class SummaryTests(unittest.TestCase):
+
+    def test_add(self):
+        report = io.StringIO()
+        summary = batch.Summary(report)
+
+        summary.add(batch.Result('a', batch.SUCCESS, None, 1.0))
+        summary.add(batch.Result('b', batch.FAILURE, 'ValueError: x', 0.5))
+        summary.add(batch.Result('c', batch.SUCCESS, None, 1.0))
+
+        self.assertEqual(summary.total, 3)
+        self.assertEqual(summary.succeeded, 2)
+        self.assertEqual(summary.failed, 1)
+        self.assertEqual(summary.failures, [('b', 'ValueError: x')])
+        self.assertEqual(summary.as_dict()['packing_time'], 2.5)
+        self.assertEqual(
+            report.getvalue(),
+            'a\tsuccess\t\nb\tfailure\tValueError: x\nc\tsuccess\t\n'
+        )
+
+    def test_add_skipped(self):
+        summary = batch.Summary(io.StringIO())
+
+        summary.add(batch.Result('a', batch.SKIPPED, None, 0.1))
+        summary.add(batch.Result('b', batch.SUCCESS, None, 1.0))
+
+        self.assertEqual(summary.total, 2)
+        self.assertEqual(summary.skipped, 1)
+        self.assertEqual(summary.as_dict()['skipped'], 1)
+
+    def test_run_does_not_abort_on_failure(self):
+        results = [
+            batch.Result('a', batch.FAILURE, 'IOError: x', 0),
+            batch.Result('b', batch.SUCCESS, None, 0)
+        ]
+
+        with mock.patch('elixir.batch.pack', side_effect=results) as pack:
+            summary = batch.run(['a', 'b'], 'src', 'dst')
+
+        self.assertEqual(pack.call_count, 2)
+        self.assertEqual(summary.succeeded, 1)
+        self.assertEqual(summary.failed, 1)
+
+    def test_run_with_workers(self):
+        pids = [u'S003489102013000400674', u'invalid', u'xxx']
+
+        summary = batch.run(pids, workers=2, chunksize=1)
+
+        self.assertEqual(summary.total, 3)
+        self.assertEqual(summary.failed, 3)
+        self.assertEqual(
+            sorted([pid for pid, error in summary.failures]), sorted(pids)
+        )
+        self.assertTrue(
+            all([error.startswith('ValueError') for pid, error in summary.failures])
+        )
+
+    def test_run_with_prefetched_metadata(self):
+
+        with mock.patch('elixir.feedstock.loadXML', return_value='xml') as load_xml, \
+                mock.patch('elixir.feedstock.load_rawdata', return_value='json'), \
+                mock.patch('elixir.feedstock.Article') as article:
+            summary = batch.run(
+                [u'S0034-89102013000400674', u'S0034-89102006000700007'],
+                'src',
+                'dst',
+                concurrency=2
+            )
+
+        self.assertEqual(summary.succeeded, 2)
+        self.assertEqual(load_xml.call_count, 2)
+        article.assert_any_call(u'S0034-89102013000400674', 'xml', 'json', 'src', 'dst')
+
+    def test_pack_fetched_with_error(self):
+        result = batch.pack_fetched(
+            fetcher.Fetched(u'S0034-89102013000400674', None, None, 'OSError: x')
+        )
+
+        self.assertEqual(result.status, batch.FAILURE)
+        self.assertEqual(result.error, 'OSError: x')
+
+
+class GroupByIssueTests(unittest.TestCase):
+
+    def test_issue_key(self):
+        item = fetcher.Fetched('a', 'xml', raw_data('rsp', '40', '6'), None)
+
+        self.assertEqual(batch.issue_key(item), ('rsp', 'v40n6'))
+
+    def test_issue_key_without_metadata(self):
+        item = fetcher.Fetched('a', None, None, 'OSError: x')
+
+        self.assertIsNone(batch.issue_key(item))
+
+    def test_group_by_issue(self):
+        items = [
+            fetcher.Fetched('a', 'xml', raw_data('rsp', '40', '6'), None),
+            fetcher.Fetched('b', 'xml', raw_data('rsp', '47', '4'), None),
+            fetcher.Fetched('c', None, None, 'OSError: x'),
+            fetcher.Fetched('d', 'xml', raw_data('rsp', '40', '6'), None),
+            fetcher.Fetched('e', 'xml', raw_data('rsp', '47', '4'), None),
+        ]
+
+        groups = [[x.pid for x in group] for group in batch.group_by_issue(items)]
+
+        self.assertEqual(sorted(groups), [['a', 'd'], ['b', 'e'], ['c']])
+
+    def test_group_by_issue_window(self):
+        items = [
+            fetcher.Fetched(str(x), 'xml', raw_data('rsp', '40', '6'), None)
+            for x in range(5)
+        ]
+
+        groups = [len(group) for group in batch.group_by_issue(items, window=2)]
+
+        self.assertEqual(groups, [2, 2, 1])
+
+    def test_pack_group(self):
+        group = [
+            fetcher.Fetched(u'S0034-89102006000700007', 'xml', raw_data('rsp', '40', '6'), None),
+            fetcher.Fetched(u'S0034-89102006000700008', 'xml', raw_data('rsp', '40', '6'), None)
+        ]
+
+        with mock.patch('elixir.feedstock.Article'), \
+                mock.patch('elixir.index.SourceIndex.forget') as forget:
+            results = batch.pack_group(group, 'src', 'dst')
+
+        self.assertEqual([x.status for x in results], [batch.SUCCESS, batch.SUCCESS])
+        forget.assert_called_once_with('rsp', 'v40n6')
+
+    def test_run_by_issue(self):
+        pids = [u'S0034-89102006000700007', u'S0034-89102013000400674', u'S0034-89102006000700008']
+        issues = {
+            pids[0]: raw_data('rsp', '40', '6'),
+            pids[1]: raw_data('rsp', '47', '4'),
+            pids[2]: raw_data('rsp', '40', '6')
+        }
+        packed = []
+
+        with mock.patch('elixir.feedstock.loadXML', return_value='xml'), \
+                mock.patch('elixir.feedstock.load_rawdata', side_effect=issues.get), \
+                mock.patch('elixir.feedstock.Article', side_effect=lambda pid, *args: packed.append(pid) or mock.MagicMock()):
+            summary = batch.run(pids, 'src', 'dst', by_issue=True)
+
+        self.assertEqual(summary.succeeded, 3)
+        self.assertEqual(
+            abs(packed.index(pids[0]) - packed.index(pids[2])), 1
+        )
+
+    def test_run_with_memory_budget(self):
+        pids = [u'S0034-89102006000700007', u'S0034-89102013000400674']
+        budgets = []
+        memory_budget = budget.MemoryBudget
+
+        with mock.patch('elixir.feedstock.loadXML', return_value='xml'), \
+                mock.patch('elixir.feedstock.load_rawdata', side_effect=lambda pid: raw_data('rsp', '40', '6')), \
+                mock.patch('elixir.feedstock.Article'), \
+                mock.patch('elixir.budget.MemoryBudget', side_effect=lambda limit: budgets.append(memory_budget(limit)) or budgets[-1]):
+            summary = batch.run(pids, 'src', 'dst', memory_budget=1024)
+
+        self.assertEqual(summary.succeeded, 2)
+        self.assertEqual(budgets[0].oversized, 2)
+        self.assertEqual(budgets[0].reserved, 0)
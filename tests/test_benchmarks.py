@@ -0,0 +1,131 @@
+import unittest
+import os
+import json
+import shutil
+import tempfile
+
+import requests
+
+from elixir import sources
+from benchmarks import corpus, articlemeta, bench
+
+
+class CorpusTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def settings(self, version):
+
+        return corpus.Settings(
+            version=version, journals=1, issues=2, articles=2, html_size=2,
+            images=2, image_size=1, pdf_size=1
+        )
+
+    def test_generate_sps(self):
+
+        pids = corpus.generate(self.directory, self.settings('sps'))
+
+        self.assertEqual(len(pids), 4)
+        self.assertEqual(len(sources.LocalStore(self.directory + '/articlemeta.db')), 4)
+        self.assertEqual(
+            sorted(os.listdir(self.directory + '/source/xml/j01/v10n1')),
+            ['a001.xml', 'a002.xml']
+        )
+        self.assertEqual(
+            sorted(os.listdir(self.directory + '/source/pdf/j01/v10n1')),
+            ['a001.pdf', 'a002.pdf', 'en_a001.pdf', 'en_a002.pdf']
+        )
+        self.assertEqual(len(os.listdir(self.directory + '/source/img/j01/v10n1')), 4)
+
+    def test_generate_legacy(self):
+
+        pids = corpus.generate(self.directory, self.settings('legacy'))
+        data = json.loads(sources.LocalStore(self.directory + '/articlemeta.db').json(pids[0]))
+
+        self.assertEqual(data['article']['v702'][0]['_'], 'j01/v10n1/a001.htm')
+        self.assertTrue(
+            'pt_ba001.htm' in os.listdir(self.directory + '/source/html/j01/v10n1')
+        )
+
+    def test_generate_is_reproducible(self):
+
+        corpus.generate(self.directory + '/a', self.settings('sps'))
+        corpus.generate(self.directory + '/b', self.settings('sps'))
+
+        with open(self.directory + '/a/source/img/j01/v10n1/a001-gf01.jpg', 'rb') as a, \
+                open(self.directory + '/b/source/img/j01/v10n1/a001-gf01.jpg', 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_articlemeta_stand_in(self):
+
+        pids = corpus.generate(self.directory, self.settings('sps'))
+        server = articlemeta.serve(self.directory + '/articlemeta.db')
+        self.addCleanup(server.shutdown)
+
+        source = sources.ArticleMetaSource(articlemeta.server_url(server))
+
+        self.assertEqual(json.loads(source.json(pids[0]))['code'], pids[0])
+        self.assertTrue(source.xml(pids[0]).startswith('<article'))
+
+        with self.assertRaises(requests.HTTPError):
+            source.json('S0000-00000000000000000')
+
+
+class BenchTests(unittest.TestCase):
+
+    def test_statistics(self):
+
+        stats = bench.statistics([3.0, 1.0, 2.0])
+
+        self.assertEqual(stats['count'], 3)
+        self.assertEqual(stats['median'], 2.0)
+        self.assertEqual(stats['max'], 3.0)
+        self.assertEqual(stats['mean'], 2.0)
+
+    def test_compare(self):
+        baseline = {'results': {'sps': {'end_to_end': {'median': 1.0}, 'stages': {}}}}
+        current = {'results': {'sps': {'end_to_end': {'median': 2.0}, 'stages': {}}}}
+
+        lines = bench.compare(baseline, current)
+
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].endswith('2.00x'))
+
+    def test_run_formats(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = corpus.Settings(
+            journals=1, issues=1, articles=2, html_size=2, images=1,
+            image_size=1, pdf_size=1
+        )
+
+        results = bench.run(
+            directory, settings, versions=['sps'], repeat=1, formats=['zip', 'tar.gz']
+        )
+
+        self.assertEqual(sorted(results['results']), ['sps', 'sps:tar.gz'])
+        self.assertTrue(results['results']['sps:tar.gz']['package_bytes'] > 0)
+        self.assertEqual(results['results']['sps']['end_to_end']['count'], 2)
+
+    def test_run_compressions(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = corpus.Settings(
+            journals=1, issues=1, articles=2, html_size=2, images=1,
+            image_size=1, pdf_size=1
+        )
+
+        results = bench.run(
+            directory, settings, versions=['sps'], repeat=1,
+            compressions=[None, '*=stored']
+        )
+
+        self.assertEqual(sorted(results['results']), ['sps', 'sps:*=stored'])
+        self.assertEqual(results['compressions'], ['default', '*=stored'])
+        self.assertEqual(results['results']['sps:*=stored']['cpu']['count'], 2)
+        self.assertTrue(
+            results['results']['sps:*=stored']['package_bytes'] >
+            results['results']['sps']['package_bytes']
+        )
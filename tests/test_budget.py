@@ -0,0 +1,117 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+
+from elixir import budget, fetcher, readahead
+from tests.helpers import raw_data
+
+
+class EstimatorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        for kind, name, size in [('html', '07.htm', 100), ('html', 'b07.htm', 50),
+                                 ('html', '08.htm', 1000), ('pdf', '07.pdf', 5000)]:
+            os.makedirs(self.directory + '/%s/rsp/v40n6' % kind, exist_ok=True)
+            with open(self.directory + '/%s/rsp/v40n6/%s' % (kind, name), 'wb') as f:
+                f.write(b'x' * size)
+
+    def test_documents_size(self):
+        estimator = budget.Estimator(self.directory)
+
+        self.assertEqual(estimator.documents_size('rsp', 'v40n6', '07'), 150)
+        self.assertEqual(estimator.documents_size('rsp', 'v40n6', '08'), 1000)
+        self.assertEqual(estimator.documents_size('rsp', 'v99n1', '08'), 0)
+
+    def test_footprint(self):
+        estimator = budget.Estimator(self.directory)
+        item = fetcher.Fetched('a', 'xml', raw_data('rsp', '40', '6', '07'), None)
+
+        self.assertEqual(
+            estimator.footprint(item),
+            budget.BASE_FOOTPRINT + readahead.buffered() + budget.DOCUMENT_FACTOR * 150
+        )
+
+    def test_footprint_without_metadata(self):
+        estimator = budget.Estimator(self.directory)
+        item = fetcher.Fetched('a', None, None, 'OSError: x')
+
+        self.assertEqual(estimator.footprint(item), budget.BASE_FOOTPRINT + readahead.buffered())
+
+    def test_old_issues_are_forgotten(self):
+        estimator = budget.Estimator(self.directory, issues=1)
+
+        estimator.documents_size('rsp', 'v40n6', '07')
+        self.assertEqual(len(estimator.source_index), 1)
+
+        estimator.documents_size('rsp', 'v99n1', '07')
+        self.assertEqual(len(estimator.source_index), 0)
+
+
+class MemoryBudgetTests(unittest.TestCase):
+
+    def test_invalid_limit(self):
+
+        with self.assertRaises(ValueError):
+            budget.MemoryBudget(0)
+
+    def test_acquire_and_release(self):
+        memory_budget = budget.MemoryBudget(100)
+
+        memory_budget.acquire('a', 60)
+        memory_budget.acquire('b', 40)
+        self.assertEqual(memory_budget.reserved, 100)
+
+        memory_budget.release('a')
+        memory_budget.release('unknown')
+        self.assertEqual(memory_budget.reserved, 40)
+
+    def test_acquire_waits_for_release(self):
+        memory_budget = budget.MemoryBudget(100)
+        memory_budget.acquire('a', 60)
+
+        admitted = threading.Event()
+
+        def acquire():
+            memory_budget.acquire('b', 60)
+            admitted.set()
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+
+        self.assertFalse(admitted.wait(0.1))
+
+        memory_budget.release('a')
+        thread.join(5)
+
+        self.assertTrue(admitted.is_set())
+        self.assertEqual(memory_budget.reserved, 60)
+
+    def test_oversized_is_admitted_alone(self):
+        memory_budget = budget.MemoryBudget(100)
+        memory_budget.acquire('a', 10)
+
+        admitted = threading.Event()
+
+        def acquire():
+            memory_budget.acquire('big', 500)
+            admitted.set()
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+
+        self.assertFalse(admitted.wait(0.1))
+
+        memory_budget.release('a')
+        thread.join(5)
+
+        self.assertTrue(admitted.is_set())
+        self.assertEqual(memory_budget.oversized, 1)
+        self.assertFalse(memory_budget._fits(1))
+
+        memory_budget.release('big')
+        self.assertEqual(memory_budget.reserved, 0)
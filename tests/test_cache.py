@@ -0,0 +1,155 @@
+import unittest
+import os
+import time
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from elixir import cache
+
+
+class ResponseCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_get_missing(self):
+        response_cache = cache.ResponseCache(self.directory)
+
+        self.assertIsNone(response_cache.get('json:S0034-89102013000400674'))
+
+    def test_set_get(self):
+        response_cache = cache.ResponseCache(self.directory)
+
+        response_cache.set('json:pid', u'{"article": "á"}', etag='"abc"')
+        entry = response_cache.get('json:pid')
+
+        self.assertEqual(entry.body, u'{"article": "á"}')
+        self.assertEqual(entry.validators(), {'If-None-Match': '"abc"'})
+
+    def test_entries_are_compressed(self):
+        response_cache = cache.ResponseCache(self.directory)
+
+        response_cache.set('xmlrsps:pid', u'<article/>' * 1000)
+
+        self.assertTrue(response_cache.size() < 1000)
+
+    def test_is_fresh(self):
+        response_cache = cache.ResponseCache(self.directory, ttl=60)
+
+        fresh = response_cache.set('json:a', u'{}')
+        stale = response_cache.set('json:b', u'{}', stored_at=time.time() - 61)
+
+        self.assertTrue(response_cache.is_fresh(fresh))
+        self.assertFalse(response_cache.is_fresh(stale))
+
+    def test_without_ttl_is_always_fresh(self):
+        response_cache = cache.ResponseCache(self.directory)
+
+        entry = response_cache.set('json:a', u'{}', stored_at=1)
+
+        self.assertTrue(response_cache.is_fresh(entry))
+
+    def test_touch(self):
+        response_cache = cache.ResponseCache(self.directory, ttl=60)
+        response_cache.set('json:a', u'{}', etag='"x"', stored_at=1)
+
+        entry = response_cache.touch('json:a')
+
+        self.assertTrue(response_cache.is_fresh(entry))
+        self.assertEqual(entry.etag, '"x"')
+
+    def test_corrupted_entry(self):
+        response_cache = cache.ResponseCache(self.directory)
+        response_cache.set('json:a', u'{}')
+
+        with open(response_cache._path('json:a'), 'wb') as f:
+            f.write(b'not gzip')
+
+        self.assertIsNone(response_cache.get('json:a'))
+        self.assertFalse(os.path.exists(response_cache._path('json:a')))
+
+    def test_lru_eviction(self):
+        response_cache = cache.ResponseCache(self.directory, low_watermark=1.0)
+
+        for key in ['a', 'b', 'c']:
+            response_cache.set(key, os.urandom(512).hex())
+            os.utime(response_cache._path(key), (time.time() - 100, time.time() - 100))
+
+        response_cache.max_size = response_cache.size() + 64
+
+        response_cache.get('a')
+        response_cache.set('d', os.urandom(512).hex())
+
+        self.assertIsNotNone(response_cache.get('a'))
+        self.assertIsNone(response_cache.get('b'))
+        self.assertIsNotNone(response_cache.get('c'))
+        self.assertIsNotNone(response_cache.get('d'))
+        self.assertTrue(response_cache.size() <= response_cache.max_size)
+
+    def test_eviction_down_to_low_watermark(self):
+        response_cache = cache.ResponseCache(self.directory)
+
+        for key in range(50):
+            response_cache.set(str(key), os.urandom(256).hex())
+
+        response_cache.max_size = response_cache.size()
+
+        with mock.patch.object(response_cache, '_entries', wraps=response_cache._entries) as entries:
+            for key in range(50, 60):
+                response_cache.set(str(key), os.urandom(256).hex())
+
+        self.assertTrue(entries.call_count <= 3)
+        self.assertTrue(response_cache.size() <= response_cache.max_size)
+
+    def test_concurrent_writers(self):
+        errors = []
+
+        def write(worker):
+            response_cache = cache.ResponseCache(self.directory, max_size=64 * 1024)
+
+            try:
+                for key in range(100):
+                    response_cache.set('%d:%d' % (worker, key), os.urandom(512).hex())
+                    response_cache.get('%d:%d' % (worker, key))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write, args=(x,)) for x in range(6)]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(60)
+
+        self.assertEqual(errors, [])
+
+    def test_truncated_entry(self):
+        response_cache = cache.ResponseCache(self.directory)
+        response_cache.set('json:a', 'x' * 1000)
+
+        with open(response_cache._path('json:a'), 'rb') as f:
+            content = f.read()
+
+        with open(response_cache._path('json:a'), 'wb') as f:
+            f.write(content[:len(content) // 2])
+
+        self.assertIsNone(response_cache.get('json:a'))
+        self.assertFalse(os.path.exists(response_cache._path('json:a')))
+
+    def test_size_is_recomputed(self):
+        response_cache = cache.ResponseCache(self.directory)
+        response_cache.set('a', 'x')
+        response_cache.size()
+        other = cache.ResponseCache(self.directory)
+        other.set('b', 'y')
+
+        self.assertEqual(response_cache.size(), os.path.getsize(response_cache._path('a')))
+
+        with mock.patch('time.time', return_value=time.time() + cache.RESCAN_INTERVAL + 1):
+            self.assertEqual(
+                response_cache.size(),
+                os.path.getsize(response_cache._path('a')) + os.path.getsize(other._path('b'))
+            )
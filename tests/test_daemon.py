@@ -0,0 +1,125 @@
+import unittest
+import json
+import shutil
+import socket
+import tempfile
+import http.client
+from unittest import mock
+
+import requests
+
+from elixir import batch, daemon
+
+
+def pack(pid, *args, **kwargs):
+    return batch.Result(pid, batch.SUCCESS, None, 0.01)
+
+
+class DaemonTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        for target, kwargs in [('elixir.feedstock.loadXML', {'return_value': 'xml'}),
+                               ('elixir.feedstock.load_rawdata', {'return_value': None}),
+                               ('elixir.batch.pack', {'side_effect': pack})]:
+            patcher = mock.patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.daemon = daemon.Daemon(self.directory, self.directory + '/out', workers=2)
+        self.addCleanup(self.daemon.close)
+
+    def test_submit(self):
+        job = self.daemon.submit(u'S0034-89102013000400674', package_format='tar')
+
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.status, batch.SUCCESS)
+        self.assertEqual(
+            job.as_dict()['package'], self.directory + '/out/S0034-89102013000400674.tar'
+        )
+        self.assertIs(self.daemon.job(job.id), job)
+        self.assertEqual(self.daemon.status()['jobs'], {batch.SUCCESS: 1})
+
+    def test_submit_invalid(self):
+
+        with self.assertRaises(ValueError):
+            self.daemon.submit(u'invalid')
+
+        with self.assertRaises(ValueError):
+            self.daemon.submit(u'S0034-89102013000400674', package_format='rar')
+
+    def test_fetch_failure(self):
+
+        with mock.patch('elixir.feedstock.loadXML', side_effect=IOError('unavailable')):
+            with self.assertLogs(level='ERROR') as logs:
+                job = self.daemon.submit(u'S0034-89102013000400674')
+                job.wait(5)
+
+        self.assertEqual(job.status, batch.FAILURE)
+        self.assertTrue(job.as_dict()['error'].startswith('OSError'))
+        self.assertIsNone(job.package)
+        self.assertIn('Unable to fetch metadata', logs.output[0])
+
+    def test_pack_failure(self):
+
+        with mock.patch('elixir.batch.pack', side_effect=IOError('disk full')):
+            with self.assertLogs(level='ERROR') as logs:
+                job = self.daemon.submit(u'S0034-89102013000400674')
+                job.wait(5)
+
+        self.assertEqual(job.status, batch.FAILURE)
+        self.assertIn('Unable to pack', logs.output[0])
+
+    def test_history(self):
+        self.daemon.history = 2
+
+        for x in range(4):
+            self.daemon.submit(u'S0034-89102013000400674').wait(5)
+
+        self.assertTrue(len(self.daemon.jobs()) <= 3)
+
+    def test_http_api(self):
+        server = daemon.make_server(self.daemon, port=0)
+        self.addCleanup(server.server_close)
+        thread = __import__('threading').Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.shutdown)
+
+        url = 'http://%s:%d' % server.server_address[:2]
+
+        response = requests.post(url + '/jobs?wait=5', json={'pid': u'S0034-89102013000400674'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], batch.SUCCESS)
+
+        job_id = response.json()['id']
+        self.assertEqual(requests.get(url + '/jobs/' + job_id).json()['id'], job_id)
+        self.assertEqual(len(requests.get(url + '/jobs').json()), 1)
+        self.assertEqual(requests.get(url + '/jobs/unknown').status_code, 404)
+        self.assertEqual(requests.post(url + '/jobs', json={'pid': 'x'}).status_code, 400)
+        self.assertEqual(requests.get(url + '/status').json()['jobs'], {batch.SUCCESS: 1})
+
+    def test_unix_socket_api(self):
+        path = self.directory + '/elixir.sock'
+        server = daemon.make_server(self.daemon, socket_path=path)
+        self.addCleanup(server.server_close)
+        thread = __import__('threading').Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.shutdown)
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+        conn = http.client.HTTPConnection('localhost')
+        conn.sock = sock
+        conn.request(
+            'POST', '/jobs?wait=5', json.dumps({'pid': u'S0034-89102013000400674'}),
+            {'Content-Type': 'application/json'}
+        )
+        response = conn.getresponse()
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual(json.loads(response.read())['status'], batch.SUCCESS)
+        conn.close()
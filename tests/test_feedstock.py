@@ -4,10 +4,12 @@ import os
 import json
 import io
 import zipfile
+import shutil
+import tempfile
 from lxml import etree
 from unittest import mock
 
-from elixir import feedstock, utils
+from elixir import feedstock, utils, index, timing, manifest
 from xylose import scielodocument
 
 document_xml = document_json = source_dir = None
@@ -29,18 +31,18 @@ class FeedStockTests(unittest.TestCase):
 
     def test_loadXML(self):
 
-        with unittest.mock.patch('requests.get'):
-            rqts = requests.get(u'ANY URL')
-            rqts.text = document_xml
+        with unittest.mock.patch('requests.Session.get') as rqts:
+            rqts.return_value.status_code = 200
+            rqts.return_value.text = document_xml
             fs = feedstock.loadXML(u'S0034-89102013000400674')
 
         self.assertEqual(fs[0:20], u'<article article-typ')
 
     def test_load_rawdata(self):
 
-        with unittest.mock.patch('requests.get'):
-            rqts = requests.get(u'ANY URL')
-            rqts.text = document_json
+        with unittest.mock.patch('requests.Session.get') as rqts:
+            rqts.return_value.status_code = 200
+            rqts.return_value.text = document_json
             fs = feedstock.load_rawdata(u'S0034-89102013000400674')
 
         self.assertEqual(
@@ -48,6 +50,14 @@ class FeedStockTests(unittest.TestCase):
             u'Avaliacao da confiabilidade e validade do Indice de Qualidade da Dieta Revisado'
         )
 
+    def test_load_rawdata_unavailable(self):
+
+        with unittest.mock.patch('requests.Session.get') as rqts:
+            rqts.side_effect = requests.ConnectionError('refused')
+            with unittest.mock.patch('time.sleep'):
+                with self.assertRaises(requests.ConnectionError):
+                    feedstock.load_rawdata(u'S0034-89102013000400674')
+
     def test_fix_path(self):
         html = """
             <html>
@@ -191,6 +201,67 @@ class FeedStockTests(unittest.TestCase):
         self.assertTrue(u'0034-8910-rsp-47-04-0740-gf03.mp3' in images)
         self.assertEqual(3, len(images))
 
+    def test_get_xml_document_assets(self):
+        xml = b"""<!DOCTYPE article PUBLIC "-//NLM//DTD Journal Publishing DTD v3.0 20080202//EN" "journalpublishing3.dtd">
+                 <article xmlns:xlink="http://www.w3.org/1999/xlink" dtd-version="3.0" xml:lang="pt">
+                    <body>
+                        <sec>
+                            <p><graphic xlink:href="0034-8910-rsp-47-04-0740-gf01"/></p>
+                            <p><inline-graphic xlink:href="0034-8910-rsp-47-04-0740-gf02.png"/></p>
+                            <p><media xlink:href="0034-8910-rsp-47-04-0740-m1.mp4"/></p>
+                            <p><midia xlink:href="0034-8910-rsp-47-04-0740-m2.mov"/></p>
+                        </sec>
+                    </body>
+                    <back>
+                        <supplementary-material xlink:href="0034-8910-rsp-47-04-0740-s1.pdf"/>
+                    </back>
+                </article>
+            """
+
+        images, midias = feedstock.get_xml_document_assets(io.BytesIO(xml))
+
+        self.assertEqual(
+            images,
+            [u'0034-8910-rsp-47-04-0740-gf01.jpg', u'0034-8910-rsp-47-04-0740-gf02.png']
+        )
+        self.assertEqual(
+            midias,
+            [
+                u'0034-8910-rsp-47-04-0740-m1.mp4',
+                u'0034-8910-rsp-47-04-0740-m2.mov',
+                u'0034-8910-rsp-47-04-0740-s1.pdf'
+            ]
+        )
+
+    def test_get_xml_document_assets_nested_midias(self):
+        xml = b"""<article xmlns:xlink="http://www.w3.org/1999/xlink">
+                    <body>
+                        <p><graphic xlink:href="gf01.png"/></p>
+                        <p><graphic xlink:href="gf01.png"/></p>
+                    </body>
+                    <back>
+                        <supplementary-material xlink:href="s1.pdf">
+                            <media xlink:href="s1.pdf"/>
+                        </supplementary-material>
+                        <supplementary-material xlink:href="s2.pdf"/>
+                    </back>
+                </article>
+            """
+
+        images, midias = feedstock.get_xml_document_assets(io.BytesIO(xml))
+
+        self.assertEqual(images, [u'gf01.png'])
+        self.assertEqual(midias, [u's1.pdf', u's2.pdf'])
+
+    def test_get_xml_document_assets_with_real_xml(self):
+        images, midias = feedstock.get_xml_document_assets(
+            source_dir+'/xml/rsp/v47n4/0034-8910-rsp-47-04-0740.xml'
+        )
+
+        self.assertTrue(u'0034-8910-rsp-47-04-0740-gf01.jpg' in images)
+        self.assertEqual(2, len(images))
+        self.assertEqual([], midias)
+
     def test_get_document_images(self):
 
         images = feedstock.get_document_images(source_dir+'/html/rsp/v40n6/en_07.htm')
@@ -244,6 +315,43 @@ class FeedStockTests(unittest.TestCase):
             'http://www.blaus.picles/picles/revistas/rsp/09.avi'
         ], images)
 
+    def test_scan_html(self):
+
+        images, midias = feedstock.scan_html(path=source_dir+'/html/rsp/v40n6/en_07.htm')
+
+        self.assertTrue(u'/img/revistas/rsp/v40n6/e07f1.gif' in images)
+        self.assertEqual(images, feedstock.get_document_images(source_dir+'/html/rsp/v40n6/en_07.htm'))
+        self.assertEqual(midias, feedstock.get_document_midias(source_dir+'/html/rsp/v40n6/en_07.htm'))
+
+    def test_scan_html_content(self):
+        html = '<img src="/img/revistas/rsp/01.gif" />\n<a href="/midia/rsp/02.mp4">Blaus</a>'
+
+        with mock.patch('codecs.open') as fopen:
+            images, midias = feedstock.scan_html(content=html)
+
+        self.assertFalse(fopen.called)
+        self.assertEqual(images, ['/img/revistas/rsp/01.gif'])
+        self.assertEqual(midias, ['/midia/rsp/02.mp4'])
+
+    def test_scan_html_reads_once(self):
+
+        with mock.patch('elixir.feedstock.read_file', return_value='<html></html>') as read:
+            feedstock.scan_html(path=source_dir+'/html/rsp/v40n6/en_07.htm')
+
+        self.assertEqual(read.call_count, 1)
+
+    def test_scan_html_without_document(self):
+
+        with self.assertRaises(ValueError):
+            feedstock.scan_html()
+
+    def test_get_document_images_from_html_does_not_open(self):
+
+        with mock.patch('codecs.open') as fopen:
+            feedstock.get_document_images('<img src="/img/revistas/rsp/01.gif" />')
+
+        self.assertFalse(fopen.called)
+
     def test_get_document_images_crazy_slashes_1(self):
 
         images = feedstock.get_document_images('<img src="/img\html/rsp/v40n6/teste.gif" />')
@@ -355,6 +463,7 @@ class Article(unittest.TestCase):
         rsps_xml = self._article.rsps_xml
 
         self.assertEqual(rsps_xml.name, '0034-8910-rsp-47-04-0675.xml')
+        self.assertEqual(rsps_xml.path, self._article.list_documents[0])
 
     @unittest.skip
     def test_rsps_xml_legacy_mode(self):
@@ -423,6 +532,168 @@ class Article(unittest.TestCase):
 
         article.wrap_document()
 
+    def test_wrap_document_writes_package(self):
+        deposit_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, deposit_dir)
+
+        article = feedstock.Article(
+            'S0034-89102013000400674',
+            document_xml,
+            scielodocument.Article(json.loads(document_json)),
+            source_dir,
+            deposit_dir
+        )
+
+        article.wrap_document()
+
+        self.assertEqual(
+            sorted(os.listdir(deposit_dir)),
+            ['S0034-89102013000400674.zip', 'S0034-89102013000400674.zip.manifest.json']
+        )
+
+        with zipfile.ZipFile(deposit_dir + '/S0034-89102013000400674.zip') as package:
+            self.assertTrue('0034-8910-rsp-47-04-0675.xml' in package.namelist())
+
+    def test_wrap_document_package_format(self):
+        deposit_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, deposit_dir)
+
+        article = feedstock.Article(
+            'S0034-89102013000400674',
+            document_xml,
+            scielodocument.Article(json.loads(document_json)),
+            source_dir,
+            deposit_dir
+        )
+
+        article.wrap_document(package_format='dir')
+
+        self.assertEqual(
+            sorted(os.listdir(deposit_dir)),
+            ['S0034-89102013000400674', 'S0034-89102013000400674.manifest.json']
+        )
+        self.assertTrue(
+            '0034-8910-rsp-47-04-0675.xml' in os.listdir(deposit_dir + '/S0034-89102013000400674')
+        )
+        self.assertTrue(article.is_up_to_date(package_format='dir'))
+        self.assertFalse(article.is_up_to_date())
+
+    def test_wrap_document_timing(self):
+        deposit_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, deposit_dir)
+        records = []
+        timing.register(records.append)
+        self.addCleanup(timing.unregister, records.append)
+
+        with timing.document('S0034-89102013000400674'):
+            article = feedstock.Article(
+                'S0034-89102013000400674',
+                document_xml,
+                scielodocument.Article(json.loads(document_json)),
+                source_dir,
+                deposit_dir,
+                source_index=index.SourceIndex(source_dir)
+            )
+            article.wrap_document()
+
+        stages = records[0]['stages']
+
+        for name in ['scan', 'parse', 'images', 'zip', 'write', 'manifest']:
+            self.assertTrue(name in stages, name)
+
+        self.assertFalse('read' in stages)
+
+        self.assertEqual(
+            stages['zip']['bytes_written'],
+            sum([x.compress_size for x in zipfile.ZipFile(deposit_dir + '/S0034-89102013000400674.zip').infolist()])
+        )
+
+    def test_is_up_to_date(self):
+        deposit_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, deposit_dir)
+
+        def article():
+            return feedstock.Article(
+                'S0034-89102013000400674',
+                document_xml,
+                scielodocument.Article(json.loads(document_json)),
+                source_dir,
+                deposit_dir
+            )
+
+        self.assertFalse(article().is_up_to_date())
+
+        article().wrap_document()
+
+        self.assertTrue(article().is_up_to_date())
+
+        changed = article()
+        changed.xml = document_xml.replace('article-type', 'article-type ')
+
+        self.assertFalse(changed.is_up_to_date())
+
+    def test_referenced_sources(self):
+
+        article = feedstock.Article(
+            'S0034-89102013000400674',
+            document_xml,
+            scielodocument.Article(json.loads(document_json)),
+            source_dir,
+            '.'
+        )
+
+        referenced = article.referenced_sources
+
+        for path in article.package_sources:
+            self.assertTrue(path in referenced)
+
+        for image in article.list_document_images:
+            self.assertTrue(
+                '/'.join([source_dir, 'img/rsp/v47n4', image.split('/')[-1].lower()]) in referenced
+            )
+
+    def test_midia_source(self):
+
+        article = feedstock.Article(
+            'S0034-89102013000400674',
+            document_xml,
+            scielodocument.Article(json.loads(document_json)),
+            source_dir,
+            '.'
+        )
+
+        self.assertEqual(
+            article.midia_source('/pdf/rsp/v40n6/07.pdf'), source_dir + '/pdf/rsp/v40n6/07.pdf'
+        )
+        self.assertEqual(
+            article.midia_source('/img/revistas/rsp/v40n6/07.MP4'), source_dir + '/img/rsp/v40n6/07.mp4'
+        )
+        self.assertEqual(
+            article.midia_source('/pdf/07.pdf'), source_dir + '/pdf/rsp/v47n4/07.pdf'
+        )
+        self.assertEqual(
+            article.midia_source('0034-8910-rsp-47-04-0675-m1.mp4'),
+            source_dir + '/img/rsp/v47n4/0034-8910-rsp-47-04-0675-m1.mp4'
+        )
+        self.assertIsNone(article.midia_source('http://www.opas.org.br/l_saber.pdf'))
+        self.assertIsNone(article.midia_source('/cgi-bin/wxis.exe/x.pdf'))
+
+    def test_is_up_to_date_without_package(self):
+        deposit_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, deposit_dir)
+
+        article = feedstock.Article(
+            'S0034-89102013000400674',
+            document_xml,
+            scielodocument.Article(json.loads(document_json)),
+            source_dir,
+            deposit_dir
+        )
+        article.wrap_document()
+        os.remove(deposit_dir + '/S0034-89102013000400674.zip')
+
+        self.assertFalse(article.is_up_to_date())
+
     def test_xml_sps_with_legacy_data(self):
         json_data = json.loads(document_json)
         json_data['title']['v68'][0]['_'] = 'rsp'
@@ -499,6 +770,64 @@ class Article(unittest.TestCase):
 
         self.assertEqual(len(images), 14)
 
+    def test_legacy_htmls_are_read_once(self):
+        json_data = json.loads(document_json)
+        json_data['title']['v68'][0]['_'] = 'rsp'
+        json_data['article']['v31'][0]['_'] = '40'
+        json_data['article']['v32'][0]['_'] = '6'
+        json_data['article']['v65'][0]['_'] = '2006'
+        json_data['article']['v702'][0]['_'] = '/x/x/y/z/07.htm'
+
+        raw_data = scielodocument.Article(json_data)
+
+        article = feedstock.Article(
+            'S0034-89102006000700007',
+            document_xml,
+            raw_data,
+            source_dir,
+            '/tmp'
+        )
+
+        with mock.patch('elixir.feedstock.read_html', wraps=feedstock.read_html) as read_html:
+            article.list_document_images
+            article.list_document_midia
+            article._get_body_from_files
+
+        self.assertEqual(
+            sorted([x[0][0] for x in read_html.call_args_list]),
+            sorted(article.list_htmls)
+        )
+
+    def test_wrap_document_legacy_digests(self):
+        deposit_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, deposit_dir)
+
+        json_data = json.loads(document_json)
+        json_data['title']['v68'][0]['_'] = 'rsp'
+        json_data['article']['v31'][0]['_'] = '40'
+        json_data['article']['v32'][0]['_'] = '6'
+        json_data['article']['v65'][0]['_'] = '2006'
+        json_data['article']['v702'][0]['_'] = '/x/x/y/z/07.htm'
+
+        article = feedstock.Article(
+            'S0034-89102006000700007',
+            document_xml,
+            scielodocument.Article(json_data),
+            source_dir,
+            deposit_dir
+        )
+
+        with mock.patch('elixir.manifest.file_digest') as file_digest:
+            article.wrap_document()
+
+        self.assertFalse(file_digest.called)
+
+        with open(deposit_dir + '/S0034-89102006000700007.zip.manifest.json') as f:
+            sources = json.load(f)['sources']
+
+        for html in article.list_htmls:
+            self.assertEqual(sources[html]['sha1'], manifest.file_digest(html))
+
     def test_list_images_without_files(self):
         json_data = json.loads(document_json)
         json_data['title']['v68'][0]['_'] = 'rsp'
@@ -564,6 +893,34 @@ class Article(unittest.TestCase):
 
         self.assertEqual(len(pdfs), 2)
 
+    def test_list_pdfs_shares_source_index(self):
+        json_data = json.loads(document_json)
+        json_data['title']['v68'][0]['_'] = 'rsp'
+        json_data['article']['v31'][0]['_'] = '40'
+        json_data['article']['v32'][0]['_'] = '6'
+        json_data['article']['v65'][0]['_'] = '2006'
+        json_data['article']['v702'][0]['_'] = '/x/x/y/z/07.htm'
+
+        raw_data = scielodocument.Article(json_data)
+
+        source_index = index.SourceIndex(source_dir)
+
+        article = feedstock.Article(
+            'S0034-89102006000700007',
+            document_xml,
+            raw_data,
+            source_dir,
+            '/tmp',
+            source_index=source_index
+        )
+
+        self.assertEqual(len(article.list_pdfs), 2)
+
+        with mock.patch('os.scandir') as scandir:
+            self.assertEqual(len(article.list_pdfs), 2)
+
+        self.assertFalse(scandir.called)
+
     def test_list_pdfs_without_files(self):
         json_data = json.loads(document_json)
         json_data['title']['v68'][0]['_'] = 'rsp'
@@ -695,6 +1052,40 @@ class Article(unittest.TestCase):
         self.assertTrue('0034-8910-rsp-47-04-0675-gf01-en.jpg', images)
         self.assertEqual(len(images), 2)
 
+    def test_sps_documents_parsed_once(self):
+        json_data = json.loads(document_json)
+        json_data['title']['v68'][0]['_'] = 'rsp'
+        json_data['article']['v31'][0]['_'] = '47'
+        json_data['article']['v32'][0]['_'] = '4'
+        json_data['article']['v65'][0]['_'] = '2014'
+
+        raw_data = scielodocument.Article(json_data)
+
+        article = feedstock.Article(
+            'S0034-89102013000400674',
+            document_xml,
+            raw_data,
+            source_dir,
+            '/tmp'
+        )
+
+        with mock.patch('elixir.feedstock.get_xml_document_assets', wraps=feedstock.get_xml_document_assets) as parse:
+            article.list_document_images
+            article.list_document_midia
+            article.images_status
+
+        self.assertEqual(parse.call_count, 1)
+
+    def test_invalidate(self):
+        xmls = self._article.list_xmls
+
+        self.assertIs(self._article.list_xmls, xmls)
+
+        self._article.invalidate('list_xmls')
+
+        self.assertIsNot(self._article.list_xmls, xmls)
+        self.assertEqual(self._article.list_xmls, xmls)
+
     def test_list_xmls(self):
         xmls = self._article.list_xmls
 
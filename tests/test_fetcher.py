@@ -0,0 +1,89 @@
+import unittest
+import time
+import asyncio
+import threading
+from unittest import mock
+
+from elixir import fetcher
+
+
+class InFlight(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = 0
+        self.maximum = 0
+
+    def __call__(self, pid):
+        with self.lock:
+            self.current += 1
+            self.maximum = max(self.maximum, self.current)
+
+        time.sleep(0.01)
+
+        with self.lock:
+            self.current -= 1
+
+        return 'data %s' % pid
+
+
+class FetcherTests(unittest.TestCase):
+
+    def test_fetch_articles(self):
+        results = []
+        pids = ['pid%d' % x for x in range(20)]
+
+        with mock.patch('elixir.feedstock.loadXML', side_effect=lambda pid: 'xml %s' % pid), \
+                mock.patch('elixir.feedstock.load_rawdata', side_effect=lambda pid: 'json %s' % pid):
+            asyncio.run(fetcher.fetch_articles(pids, results.append, 4))
+
+        self.assertEqual(sorted([x.pid for x in results]), sorted(pids))
+
+        for item in results:
+            self.assertEqual(item.xml, 'xml %s' % item.pid)
+            self.assertEqual(item.raw_data, 'json %s' % item.pid)
+            self.assertIsNone(item.error)
+
+    def test_fetch_articles_concurrency_limit(self):
+        in_flight = InFlight()
+
+        with mock.patch('elixir.feedstock.loadXML', side_effect=in_flight), \
+                mock.patch('elixir.feedstock.load_rawdata', side_effect=in_flight):
+            asyncio.run(
+                fetcher.fetch_articles(['pid%d' % x for x in range(20)], lambda x: x, 3)
+            )
+
+        # both formats of the 3 documents in flight are requested at once
+        self.assertTrue(in_flight.maximum > 3)
+        self.assertTrue(in_flight.maximum <= 6)
+
+    def test_fetch_article_error(self):
+        results = []
+
+        with mock.patch('elixir.feedstock.loadXML', side_effect=IOError('timeout')), \
+                mock.patch('elixir.feedstock.load_rawdata'):
+            asyncio.run(fetcher.fetch_articles(['pid1'], results.append))
+
+        self.assertEqual(results[0].pid, 'pid1')
+        self.assertIsNone(results[0].xml)
+        self.assertEqual(results[0].error, 'OSError: timeout')
+
+    def test_prefetch(self):
+        pids = ['pid%d' % x for x in range(50)]
+
+        with mock.patch('elixir.feedstock.loadXML', side_effect=lambda pid: 'xml %s' % pid), \
+                mock.patch('elixir.feedstock.load_rawdata', side_effect=lambda pid: 'json %s' % pid):
+            results = list(fetcher.prefetch(iter(pids), 5))
+
+        self.assertEqual(sorted([x.pid for x in results]), sorted(pids))
+
+    def test_prefetch_propagates_interruptions(self):
+
+        def pids():
+            yield 'pid1'
+            raise IOError('broken pid file')
+
+        with mock.patch('elixir.feedstock.loadXML'), \
+                mock.patch('elixir.feedstock.load_rawdata'):
+            with self.assertRaises(IOError):
+                list(fetcher.prefetch(pids(), 5))
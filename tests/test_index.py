@@ -0,0 +1,117 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from elixir import index
+
+source_dir = os.path.dirname(__file__) + '/files'
+
+
+class SourceIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        os.makedirs(self.directory + '/img/rsp/v40n6')
+
+        with open(self.directory + '/img/rsp/v40n6/07F1.GIF', 'wb') as f:
+            f.write(b'GIF89a')
+
+    def test_path(self):
+        source_index = index.SourceIndex('/src')
+
+        self.assertEqual(source_index.path('img', 'rsp', 'v40n6'), '/src/img/rsp/v40n6')
+
+    def test_entries(self):
+        source_index = index.SourceIndex(self.directory)
+
+        entries = source_index.entries('img', 'rsp', 'v40n6')
+
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0].name, '07f1.gif')
+        self.assertEqual(entries[0].size, 6)
+
+    def test_names_with_real_files(self):
+        source_index = index.SourceIndex(source_dir)
+
+        names = source_index.names('pdf', 'rsp', 'v40n6')
+
+        self.assertTrue('07.pdf' in names)
+        self.assertTrue('en_07.pdf' in names)
+
+    def test_directory_scanned_once(self):
+        source_index = index.SourceIndex(self.directory)
+        source_index.names('img', 'rsp', 'v40n6')
+
+        with open(self.directory + '/img/rsp/v40n6/07f2.gif', 'wb') as f:
+            f.write(b'GIF89a')
+
+        self.assertEqual(source_index.names('img', 'rsp', 'v40n6'), ['07f1.gif'])
+
+    def test_directory_not_found(self):
+        source_index = index.SourceIndex(self.directory)
+
+        with self.assertRaises(FileNotFoundError):
+            source_index.names('pdf', 'rsp', 'v40n6')
+
+        with self.assertRaises(FileNotFoundError):
+            source_index.names('pdf', 'rsp', 'v40n6')
+
+    def test_refresh(self):
+        source_index = index.SourceIndex(self.directory)
+        source_index.names('img', 'rsp', 'v40n6')
+        self.assertRaises(FileNotFoundError, source_index.names, 'pdf', 'rsp', 'v40n6')
+
+        self.assertEqual(source_index.refresh(), 0)
+
+        with open(self.directory + '/img/rsp/v40n6/07f2.gif', 'wb') as f:
+            f.write(b'GIF89a')
+        os.makedirs(self.directory + '/pdf/rsp/v40n6')
+        os.utime(self.directory + '/img/rsp/v40n6', (1, 1))
+
+        self.assertEqual(source_index.refresh(), 2)
+        self.assertEqual(
+            sorted(source_index.names('img', 'rsp', 'v40n6')), ['07f1.gif', '07f2.gif']
+        )
+        self.assertEqual(source_index.names('pdf', 'rsp', 'v40n6'), [])
+
+    def test_refresh_issue(self):
+        source_index = index.SourceIndex(self.directory)
+        source_index.names('img', 'rsp', 'v40n6')
+
+        with open(self.directory + '/img/rsp/v40n6/07f2.gif', 'wb') as f:
+            f.write(b'GIF89a')
+        os.utime(self.directory + '/img/rsp/v40n6', (1, 1))
+
+        self.assertEqual(source_index.refresh('rsp', 'v47n4'), 0)
+        self.assertEqual(source_index.refresh('rsp', 'v40n6'), 1)
+
+    def test_slow_scan_does_not_block_other_directories(self):
+        source_index = index.SourceIndex(self.directory)
+        os.makedirs(self.directory + '/pdf/rsp/v40n6')
+        release = threading.Event()
+        scan = source_index._scan
+
+        def slow_scan(path):
+            if '/img/' in path:
+                release.wait(5)
+            return scan(path)
+
+        with mock.patch.object(source_index, '_scan', side_effect=slow_scan):
+            thread = threading.Thread(target=source_index.entries, args=('img', 'rsp', 'v40n6'))
+            thread.start()
+
+            self.assertEqual(source_index.entries('pdf', 'rsp', 'v40n6'), [])
+            self.assertTrue(thread.is_alive())
+
+            release.set()
+            thread.join(5)
+
+        self.assertEqual(len(source_index), 2)
+
+    def test_get_index(self):
+
+        self.assertIs(index.get_index(self.directory), index.get_index(self.directory))
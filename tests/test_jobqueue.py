@@ -0,0 +1,194 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from elixir import batch, jobqueue
+
+
+class JobQueueTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'jobs.db')
+
+    def test_add_ignores_known_pids(self):
+        queue = jobqueue.JobQueue(self.path)
+
+        self.assertEqual(queue.add(['a', 'b']), 2)
+        queue.complete(batch.Result(queue.claim('w')[0], batch.SUCCESS, None, 1.0))
+
+        self.assertEqual(queue.add(['a', 'b', 'c'], batch_size=2), 1)
+        self.assertEqual(len(queue), 3)
+        self.assertEqual(queue.progress()['done'], 1)
+
+    def test_claim_is_exclusive(self):
+        queue = jobqueue.JobQueue(self.path)
+        queue.add(['a', 'b', 'c'])
+
+        first = queue.claim('w1', 2)
+        second = queue.claim('w2', 2)
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse(set(first) & set(second))
+        self.assertEqual(queue.claim('w3'), [])
+        self.assertEqual(queue.state(second[0]), ('running', 1, None))
+
+    def test_claim_from_threads(self):
+        queue = jobqueue.JobQueue(self.path)
+        queue.add(['p%d' % i for i in range(200)])
+        claimed = []
+
+        def claim():
+            for pid in jobqueue.JobQueue(self.path).claimed(count=7):
+                claimed.append(pid)
+
+        threads = [threading.Thread(target=claim) for _ in range(4)]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+
+        self.assertEqual(len(claimed), 200)
+        self.assertEqual(len(set(claimed)), 200)
+
+    def test_expired_lease_is_claimed_again(self):
+        queue = jobqueue.JobQueue(self.path, lease=100, max_attempts=2)
+        queue.add(['a'])
+
+        with mock.patch('time.time', return_value=1000.0):
+            self.assertEqual(queue.claim('w1'), ['a'])
+            self.assertEqual(queue.claim('w2'), [])
+
+        with mock.patch('time.time', return_value=1200.0):
+            self.assertEqual(queue.claim('w2'), ['a'])
+
+        with mock.patch('time.time', return_value=1400.0):
+            self.assertEqual(queue.claim('w3'), [])
+
+        self.assertEqual(queue.state('a'), ('failed', 2, 'Lease expired'))
+
+    def test_renew(self):
+        queue = jobqueue.JobQueue(self.path, lease=100)
+        queue.add(['a'])
+
+        with mock.patch('time.time', return_value=1000.0):
+            queue.claim('w1')
+
+        with mock.patch('time.time', return_value=1090.0):
+            self.assertEqual(queue.renew('w1'), 1)
+
+        with mock.patch('time.time', return_value=1150.0):
+            self.assertEqual(queue.claim('w2'), [])
+
+    def test_claimed_renews_leases_while_completing(self):
+        queue = jobqueue.JobQueue(self.path, lease=100)
+        other = jobqueue.JobQueue(self.path, lease=100)
+        queue.add(['a', 'b', 'c'])
+
+        with mock.patch('time.time', return_value=1000.0):
+            pids = queue.claimed('w1', count=3)
+            first = next(pids)
+
+        for now in [1040.0, 1080.0, 1120.0]:
+            with mock.patch('time.time', return_value=now):
+                queue.complete(batch.Result(first, batch.SUCCESS, None, 1.0))
+                self.assertEqual(other.claim('w2'), [])
+
+        with mock.patch('time.time', return_value=1130.0):
+            self.assertEqual(len(list(pids)), 2)
+
+        self.assertEqual(queue.progress()['running'], 2)
+
+    def test_claimed_claims_up_to_ahead(self):
+        queue = jobqueue.JobQueue(self.path)
+        queue.add(['a', 'b', 'c'])
+
+        pids = queue.claimed('w', count=100, ahead=2)
+        next(pids)
+
+        self.assertEqual(queue.progress()['running'], 2)
+
+    def test_failure_is_retried_until_max_attempts(self):
+        queue = jobqueue.JobQueue(self.path, max_attempts=2)
+        queue.add(['a'])
+
+        queue.claim('w')
+        queue.complete(batch.Result('a', batch.FAILURE, 'IOError: x', 1.0))
+        self.assertEqual(queue.state('a'), ('pending', 1, 'IOError: x'))
+
+        queue.claim('w')
+        queue.complete(batch.Result('a', batch.FAILURE, 'IOError: y', 1.0))
+        self.assertEqual(queue.state('a'), ('failed', 2, 'IOError: y'))
+        self.assertEqual(queue.failures(), [('a', 2, 'IOError: y')])
+
+        self.assertEqual(queue.retry(), 1)
+        self.assertEqual(queue.state('a'), ('pending', 0, 'IOError: y'))
+
+    def test_release(self):
+        queue = jobqueue.JobQueue(self.path)
+        queue.add(['a', 'b'])
+
+        queue.claim('w1', 2)
+
+        self.assertEqual(queue.release('w2'), 0)
+        self.assertEqual(queue.release('w1'), 2)
+        self.assertEqual(queue.progress()['pending'], 2)
+        self.assertEqual(queue.state('a'), ('pending', 0, None))
+
+    def test_progress(self):
+        queue = jobqueue.JobQueue(self.path)
+        queue.add(['a', 'b', 'c'])
+
+        queue.claim('w', 2)
+        queue.complete(batch.Result('a', batch.SKIPPED, None, 0.0))
+
+        self.assertEqual(
+            queue.progress(),
+            {'pending': 1, 'running': 1, 'done': 1, 'failed': 0, 'total': 3}
+        )
+
+    def test_claimed_waits_for_completion(self):
+        queue = jobqueue.JobQueue(self.path)
+        queue.add(['a', 'b'])
+
+        pids = queue.claimed('w', ahead=1)
+        first = next(pids)
+        retrieved = threading.Event()
+
+        def retrieve():
+            next(pids)
+            retrieved.set()
+
+        thread = threading.Thread(target=retrieve)
+        thread.start()
+
+        self.assertFalse(retrieved.wait(0.1))
+
+        queue.complete(batch.Result(first, batch.SUCCESS, None, 1.0))
+        thread.join(5)
+
+        self.assertTrue(retrieved.is_set())
+
+    def test_run_resumes_from_queue(self):
+        queue = jobqueue.JobQueue(self.path)
+        queue.add(['a', 'b', 'c'])
+        queue.complete(batch.Result(queue.claim('w')[0], batch.SUCCESS, None, 1.0))
+
+        results = {
+            'b': batch.Result('b', batch.SUCCESS, None, 0),
+            'c': batch.Result('c', batch.FAILURE, 'IOError: x', 0)
+        }
+
+        with mock.patch('elixir.batch.pack', side_effect=lambda pid, *args, **kwargs: results[pid]) as pack:
+            summary = batch.run(queue.claimed(ahead=10), 'src', 'dst', job_queue=queue)
+
+        self.assertEqual(sorted([x[0][0] for x in pack.call_args_list]), ['b', 'c', 'c', 'c'])
+        self.assertEqual(summary.failed, 3)
+        self.assertEqual(queue.state('b')[0], 'done')
+        self.assertEqual(queue.state('c'), ('failed', 3, 'IOError: x'))
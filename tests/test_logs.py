@@ -0,0 +1,104 @@
+import unittest
+import json
+import logging
+from unittest import mock
+
+from elixir import logs, batch
+
+
+class RecordingHandler(logging.Handler):
+
+    def __init__(self):
+        super(RecordingHandler, self).__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class LogsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = RecordingHandler()
+        self.logger = logging.getLogger()
+        self.level = self.logger.level
+        self.logger.addHandler(self.handler)
+        self.logger.setLevel(logging.INFO)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+        self.addCleanup(self.logger.setLevel, self.level)
+
+    def article(self, missing=None):
+        article = mock.Mock()
+        article.assets_summary.return_value = {
+            'content_version': 'sps',
+            'documents': 1,
+            'images': 3,
+            'images_missing': missing or [],
+            'midias': 0,
+            'pdfs': 2
+        }
+
+        return article
+
+    def test_json_formatter(self):
+        record = logging.LogRecord('root', logging.INFO, __file__, 1, 'Packed (%s)', ('pid',), None)
+        record.document = {'pid': 'pid'}
+
+        data = json.loads(logs.JSONFormatter().format(record))
+
+        self.assertEqual(data['message'], 'Packed (pid)')
+        self.assertEqual(data['level'], 'INFO')
+        self.assertEqual(data['document'], {'pid': 'pid'})
+
+    def test_log_document(self):
+        timings = {
+            'bytes_read': 10,
+            'bytes_written': 5,
+            'stages': {'zip': {'elapsed': 0.5, 'count': 1, 'bytes_read': 10, 'bytes_written': 5}}
+        }
+
+        logs.log_document(batch.Result('pid', batch.SUCCESS, None, 1.0, timings), self.article())
+
+        self.assertEqual(len(self.handler.records), 1)
+
+        record = self.handler.records[0]
+
+        self.assertEqual(record.levelno, logging.INFO)
+        self.assertEqual(
+            record.getMessage(),
+            'Document (pid) success in 1.000s: 1 documents, 3 images (0 missing), 0 midias, 2 pdfs'
+        )
+        self.assertEqual(record.document['pdfs'], 2)
+        self.assertEqual(record.document['stages'], {'zip': 0.5})
+
+    def test_log_document_with_missing_images(self):
+
+        logs.log_document(
+            batch.Result('pid', batch.SUCCESS, None, 1.0), self.article(['/img/a.jpg'])
+        )
+
+        self.assertEqual(self.handler.records[0].levelno, logging.WARNING)
+        self.assertEqual(self.handler.records[0].document['images_missing'], ['/img/a.jpg'])
+
+    def test_log_document_failure(self):
+
+        logs.log_document(batch.Result('pid', batch.FAILURE, 'OSError: timeout', 1.0))
+
+        self.assertEqual(self.handler.records[0].levelno, logging.ERROR)
+        self.assertEqual(self.handler.records[0].document['error'], 'OSError: timeout')
+
+    def test_log_document_suppressed(self):
+        self.logger.setLevel(logging.WARNING)
+        article = self.article()
+
+        logs.log_document(batch.Result('pid', batch.SUCCESS, None, 1.0), article)
+
+        self.assertEqual(self.handler.records, [])
+
+    def test_debug_enabled(self):
+
+        self.assertFalse(logs.debug_enabled())
+
+        self.logger.setLevel(logging.DEBUG)
+
+        self.assertTrue(logs.debug_enabled())
@@ -0,0 +1,107 @@
+import unittest
+import os
+import shutil
+import hashlib
+import tempfile
+from unittest import mock
+
+from elixir import manifest
+
+
+class ManifestTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.source = self.directory + '/07f1.gif'
+
+        with open(self.source, 'wb') as f:
+            f.write(b'GIF89a')
+
+    def build(self):
+        return manifest.Manifest(
+            u'S0034-89102006000700007',
+            {self.source: manifest.source_entry(self.source)},
+            'rev1',
+            '0.0.1'
+        )
+
+    def test_file_digest(self):
+
+        self.assertEqual(
+            manifest.file_digest(self.source), hashlib.sha1(b'GIF89a').hexdigest()
+        )
+
+    def test_source_entry(self):
+        entry = manifest.source_entry(self.source, 'abc')
+
+        self.assertEqual(entry['size'], 6)
+        self.assertEqual(entry['sha1'], 'abc')
+
+    def test_metadata_revision(self):
+        raw_data = mock.Mock(data={'article': {'v1': [{'_': 'a'}]}})
+
+        self.assertEqual(
+            manifest.metadata_revision('<article/>', raw_data),
+            manifest.metadata_revision('<article/>', raw_data)
+        )
+        self.assertNotEqual(
+            manifest.metadata_revision('<article/>', raw_data),
+            manifest.metadata_revision('<article />', raw_data)
+        )
+
+    def test_save_load(self):
+        path = self.directory + '/package.zip' + manifest.MANIFEST_SUFFIX
+
+        self.build().save(path)
+        loaded = manifest.Manifest.load(path)
+
+        self.assertEqual(loaded.as_dict(), self.build().as_dict())
+
+    def test_load_missing(self):
+
+        self.assertIsNone(manifest.Manifest.load(self.directory + '/missing.json'))
+
+    def test_load_invalid(self):
+
+        with open(self.directory + '/invalid.json', 'w') as f:
+            f.write('{"pid": ')
+
+        self.assertIsNone(manifest.Manifest.load(self.directory + '/invalid.json'))
+
+    def test_unchanged(self):
+
+        self.assertEqual(self.build().changes([self.source], 'rev1', '0.0.1'), [])
+
+    def test_touched_file_is_unchanged(self):
+        built = self.build()
+        os.utime(self.source, (1, 1))
+
+        self.assertEqual(built.changes([self.source], 'rev1', '0.0.1'), [])
+
+    def test_changed_file(self):
+        built = self.build()
+
+        with open(self.source, 'wb') as f:
+            f.write(b'GIF87a')
+        os.utime(self.source, (1, 1))
+
+        self.assertEqual(
+            built.changes([self.source], 'rev1', '0.0.1'),
+            ['source file changed %s' % self.source]
+        )
+
+    def test_changed_metadata_and_version(self):
+
+        self.assertEqual(
+            self.build().changes([self.source], 'rev2', '0.0.2'),
+            ['elixir version changed', 'metadata changed']
+        )
+
+    def test_new_and_removed_files(self):
+        built = self.build()
+
+        self.assertEqual(
+            built.changes(['/other.pdf'], 'rev1', '0.0.1'),
+            ['new source file /other.pdf', 'source file removed %s' % self.source]
+        )
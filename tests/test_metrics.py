@@ -0,0 +1,128 @@
+import unittest
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import requests
+
+from elixir import metrics, batch, timing
+
+
+class RegistryTests(unittest.TestCase):
+
+    def test_counter(self):
+        registry = metrics.Registry()
+        counter = registry.counter('elixir_test_total', 'Test.', ['status'])
+
+        counter.inc(status='success')
+        counter.inc(2, status='success')
+        counter.inc(status='fail"ure')
+
+        self.assertEqual(counter.value(status='success'), 3)
+        self.assertEqual(
+            registry.render(),
+            '# HELP elixir_test_total Test.\n'
+            '# TYPE elixir_test_total counter\n'
+            'elixir_test_total{status="fail\\"ure"} 1\n'
+            'elixir_test_total{status="success"} 3\n'
+        )
+
+    def test_histogram(self):
+        histogram = metrics.Histogram('elixir_test_seconds', 'Test.', buckets=(0.1, 1))
+
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        self.assertEqual(histogram.render().split('\n')[2:], [
+            'elixir_test_seconds_bucket{le="0.1"} 1',
+            'elixir_test_seconds_bucket{le="1"} 2',
+            'elixir_test_seconds_bucket{le="+Inf"} 3',
+            'elixir_test_seconds_sum 5.55',
+            'elixir_test_seconds_count 3'
+        ])
+
+
+class BatchMetricsTests(unittest.TestCase):
+
+    def test_observe(self):
+        collector = metrics.BatchMetrics()
+        timings = {
+            'bytes_read': 100,
+            'bytes_written': 40,
+            'stages': {'fetch_xml': {'elapsed': 0.2}, 'fetch_json': {'elapsed': 0.1}}
+        }
+
+        collector.submitted(2)
+        collector.observe(batch.Result('a', batch.SUCCESS, None, 1.0, timings))
+        collector.observe(batch.Result('b', batch.FAILURE, 'OSError: timeout', 0.5))
+
+        self.assertEqual(collector.queue_depth.value(), 0)
+        self.assertEqual(collector.documents.value(status=batch.SUCCESS), 1)
+        self.assertEqual(collector.failures.value(error='OSError'), 1)
+        self.assertEqual(collector.bytes_written.value(), 40)
+        self.assertEqual(collector.fetch.count, 1)
+        self.assertTrue('elixir_documents_per_second' in collector.render())
+
+    def test_run_accounts_results(self):
+        collector = metrics.BatchMetrics()
+        results = [
+            batch.Result('a', batch.SUCCESS, None, 1.0),
+            batch.Result('b', batch.FAILURE, 'ValueError: x', 0.5)
+        ]
+
+        with mock.patch('elixir.metrics.get_metrics', return_value=collector), \
+                mock.patch('elixir.batch.pack', side_effect=results):
+            batch.run(['a', 'b'])
+
+        self.assertEqual(collector.packing.count, 2)
+        self.assertEqual(collector.failures.value(error='ValueError'), 1)
+        self.assertEqual(collector.queue_depth.value(), 0)
+
+
+class ExportTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(metrics.shutdown)
+
+    def test_disabled(self):
+
+        self.assertIsNone(metrics.configure())
+        self.assertIsNone(metrics.get_metrics())
+
+    def test_textfile(self):
+        path = os.path.join(self.directory, 'elixir.prom')
+
+        collector = metrics.configure(path, interval=60)
+        collector.documents.inc(status=batch.SUCCESS)
+
+        with timing.document('a') as timings:
+            pass
+
+        self.assertIsNotNone(timings)
+
+        metrics.shutdown()
+
+        with open(path, 'r') as f:
+            self.assertTrue('elixir_documents_total{status="success"} 1' in f.read())
+
+        self.assertEqual(os.listdir(self.directory), ['elixir.prom'])
+
+        with timing.document('a') as timings:
+            pass
+
+        self.assertIsNone(timings)
+
+    def test_http_endpoint(self):
+
+        collector = metrics.configure(port=0)
+        collector.documents.inc(status=batch.SUCCESS)
+
+        url = 'http://%s:%d/metrics' % collector.exporter.server.server_address[:2]
+        response = requests.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue('elixir_documents_total{status="success"} 1' in response.text)
@@ -0,0 +1,96 @@
+import unittest
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from elixir import readahead
+
+
+class ReadAheadTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.paths = []
+
+        for x in range(10):
+            path = self.directory + '/%02d.jpg' % x
+            with open(path, 'wb') as f:
+                f.write(b'x' * (x * 100))
+            self.paths.append(path)
+
+    def test_open_source(self):
+
+        with readahead.open_source(self.paths[5], limit=1000) as source:
+            self.assertTrue(isinstance(source.fp, io.BytesIO))
+            self.assertEqual(source.stat.st_size, 500)
+            self.assertEqual(source.fp.read(), b'x' * 500)
+
+        with readahead.open_source(self.paths[5], limit=100) as source:
+            self.assertFalse(isinstance(source.fp, io.BytesIO))
+            self.assertEqual(source.fp.read(), b'x' * 500)
+
+        self.assertTrue(source.fp.closed)
+
+    def test_sources_keep_order(self):
+        paths = self.paths[:3] + [None] + self.paths[3:]
+
+        sources = list(readahead.sources(paths, readers=4, limit=400))
+
+        self.assertEqual([x.path if x else None for x in sources], paths)
+        self.assertEqual(
+            [x.fp.read() for x in sources if x],
+            [b'x' * (x * 100) for x in range(10)]
+        )
+
+        for source in sources:
+            if source:
+                source.close()
+
+    def test_sources_without_threads(self):
+
+        with mock.patch('elixir.readahead.ThreadPoolExecutor') as executor:
+            sources = list(readahead.sources(self.paths, readers=1))
+
+        self.assertFalse(executor.called)
+        self.assertEqual([x.path for x in sources], self.paths)
+
+        for source in sources:
+            source.close()
+
+    def test_sources_raise_in_order(self):
+        paths = self.paths[:2] + [self.directory + '/missing.jpg'] + self.paths[2:]
+        sources = readahead.sources(paths, readers=4)
+
+        next(sources).close()
+        next(sources).close()
+
+        with self.assertRaises(FileNotFoundError):
+            next(sources)
+
+    def test_sources_closed_when_not_consumed(self):
+        opened = []
+        open_source = readahead.open_source
+
+        def tracked(path, limit=0):
+            source = open_source(path, 0)
+            opened.append(source)
+            return source
+
+        with mock.patch('elixir.readahead.open_source', side_effect=tracked):
+            sources = readahead.sources(self.paths, readers=2)
+            next(sources).close()
+            sources.close()
+
+        self.assertTrue(len(opened) > 1)
+        self.assertTrue(all([x.fp.closed for x in opened]))
+
+    def test_buffered(self):
+        self.addCleanup(readahead.configure)
+
+        readahead.configure(readers=4, limit=100)
+        self.assertEqual(readahead.buffered(), 800)
+
+        readahead.configure(readers=1)
+        self.assertEqual(readahead.buffered(), 0)
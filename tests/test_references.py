@@ -0,0 +1,84 @@
+import unittest
+import shutil
+import tempfile
+
+from elixir import references
+
+
+class ReferenceIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.source_dir = self.directory + '/src'
+        self.references = references.ReferenceIndex(
+            self.directory + '/references.db', self.source_dir
+        )
+
+    def test_key(self):
+
+        self.assertEqual(
+            self.references.key(self.source_dir + '/img/rsp/v47n4/Fig1.JPG'),
+            'img/rsp/v47n4/fig1.jpg'
+        )
+
+    def test_update(self):
+
+        self.references.update('a', [
+            self.source_dir + '/img/rsp/v47n4/fig1.jpg',
+            self.source_dir + '/pdf/rsp/v47n4/a01.pdf'
+        ])
+
+        self.assertEqual(
+            self.references.paths('a'),
+            ['img/rsp/v47n4/fig1.jpg', 'pdf/rsp/v47n4/a01.pdf']
+        )
+        self.assertTrue('a' in self.references)
+        self.assertEqual(len(self.references), 1)
+
+    def test_update_replaces_references(self):
+
+        self.references.update('a', [self.source_dir + '/img/rsp/v47n4/fig1.jpg'])
+        self.references.update('a', [self.source_dir + '/img/rsp/v47n4/fig2.jpg'])
+
+        self.assertEqual(self.references.paths('a'), ['img/rsp/v47n4/fig2.jpg'])
+
+    def test_pids(self):
+        image = self.source_dir + '/img/rsp/v47n4/fig1.jpg'
+
+        self.references.update('b', [image, self.source_dir + '/pdf/rsp/v47n4/b.pdf'])
+        self.references.update('a', [image])
+        self.references.update('c', [self.source_dir + '/pdf/rsp/v47n4/c.pdf'])
+
+        self.assertEqual(self.references.pids(image), ['a', 'b'])
+        self.assertEqual(
+            self.references.pids(self.source_dir + '/pdf/rsp/v47n4/c.pdf', image),
+            ['a', 'b', 'c']
+        )
+        self.assertEqual(self.references.pids(self.source_dir + '/img/x.jpg'), [])
+
+    def test_remove(self):
+
+        self.references.update('a', [self.source_dir + '/img/rsp/v47n4/fig1.jpg'])
+        self.references.remove('a')
+
+        self.assertFalse('a' in self.references)
+
+    def test_persisted(self):
+
+        self.references.update('a', [self.source_dir + '/img/rsp/v47n4/fig1.jpg'])
+
+        reopened = references.ReferenceIndex(self.references.path, self.source_dir)
+
+        self.assertEqual(reopened.paths('a'), ['img/rsp/v47n4/fig1.jpg'])
+
+    def test_configure(self):
+        self.addCleanup(references.configure)
+
+        references.configure()
+        self.assertIsNone(references.get_references())
+
+        references.configure(self.directory + '/configured.db', self.source_dir)
+        self.assertEqual(
+            references.get_references().path, self.directory + '/configured.db'
+        )
@@ -0,0 +1,72 @@
+import unittest
+from unittest import mock
+
+import requests
+
+from elixir import session
+
+
+class SessionTests(unittest.TestCase):
+
+    def test_get(self):
+        s = session.Session()
+
+        with mock.patch('requests.Session.get') as get:
+            get.return_value.status_code = 200
+            response = s.get('http://articlemeta/api')
+
+        self.assertEqual(response.status_code, 200)
+        get.assert_called_once_with(
+            'http://articlemeta/api', timeout=session.DEFAULT_TIMEOUT
+        )
+
+    def test_get_retries_connection_errors(self):
+        s = session.Session(retries=2)
+        ok = mock.Mock(status_code=200)
+
+        with mock.patch('requests.Session.get') as get, \
+                mock.patch('time.sleep') as sleep:
+            get.side_effect = [requests.ConnectionError(), requests.Timeout(), ok]
+            response = s.get('http://articlemeta/api')
+
+        self.assertIs(response, ok)
+        self.assertEqual(get.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_get_retries_server_errors(self):
+        s = session.Session(retries=1)
+
+        with mock.patch('requests.Session.get') as get, mock.patch('time.sleep'):
+            get.return_value.status_code = 503
+            with self.assertRaises(requests.HTTPError):
+                s.get('http://articlemeta/api')
+
+        self.assertEqual(get.call_count, 2)
+
+    def test_get_does_not_retry_client_errors(self):
+        s = session.Session(retries=3)
+
+        with mock.patch('requests.Session.get') as get:
+            get.return_value.status_code = 404
+            response = s.get('http://articlemeta/api')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(get.call_count, 1)
+
+    def test_backoff_time(self):
+        s = session.Session(backoff=1, max_backoff=5)
+
+        for attempt in range(10):
+            wait = s.backoff_time(attempt)
+            self.assertTrue(0 <= wait <= min(5, 2 ** attempt))
+
+    def test_configure(self):
+        self.addCleanup(session.configure)
+        self.addCleanup(session._settings.clear)
+
+        session.configure(retries=7, timeout=1)
+        shared = session.get_session()
+
+        self.assertIs(shared, session.get_session())
+        self.assertEqual(shared.retries, 7)
+        self.assertEqual(shared.timeout, 1)
@@ -0,0 +1,172 @@
+import unittest
+import io
+import os
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+from elixir import cache, sources, feedstock
+
+document_xml = document_json = None
+
+
+def setupModule():
+    global document_xml, document_json
+
+    with open(os.path.dirname(__file__) + '/fixtures/document.xml', 'r') as fp:
+        document_xml = fp.read().strip()
+
+    with open(os.path.dirname(__file__) + '/fixtures/document.json', 'r') as fp:
+        document_json = fp.read().strip()
+
+
+class ArticleMetaSourceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(cache.configure)
+
+    def test_fetch_without_cache(self):
+
+        with mock.patch('requests.Session.get') as get:
+            get.return_value.status_code = 200
+            get.return_value.text = u' <article/> '
+            body = sources.ArticleMetaSource().fetch('http://am', 'xmlrsps:pid')
+
+        self.assertEqual(body, u'<article/>')
+
+    def test_fetch_uses_fresh_entries(self):
+        cache.configure(self.directory)
+        cache.get_cache().set('xmlrsps:pid', u'<article/>')
+
+        with mock.patch('requests.Session.get') as get:
+            body = sources.ArticleMetaSource().fetch('http://am', 'xmlrsps:pid')
+
+        self.assertEqual(body, u'<article/>')
+        self.assertFalse(get.called)
+
+    def test_fetch_stores_responses(self):
+        cache.configure(self.directory)
+
+        with mock.patch('requests.Session.get') as get:
+            get.return_value.status_code = 200
+            get.return_value.text = u'<article/>'
+            get.return_value.headers = {'ETag': '"v1"'}
+            sources.ArticleMetaSource().fetch('http://am', 'xmlrsps:pid')
+
+        entry = cache.get_cache().get('xmlrsps:pid')
+
+        self.assertEqual(entry.body, u'<article/>')
+        self.assertEqual(entry.etag, '"v1"')
+
+    def test_fetch_revalidates_stale_entries(self):
+        cache.configure(self.directory, ttl=60)
+        cache.get_cache().set(
+            'xmlrsps:pid',
+            u'<article/>',
+            last_modified='Sat, 17 Oct 2026 10:00:00 GMT',
+            stored_at=1
+        )
+
+        with mock.patch('requests.Session.get') as get:
+            get.return_value.status_code = 304
+            body = sources.ArticleMetaSource().fetch('http://am', 'xmlrsps:pid')
+
+        self.assertEqual(body, u'<article/>')
+        self.assertEqual(
+            get.call_args[1]['headers'],
+            {'If-Modified-Since': 'Sat, 17 Oct 2026 10:00:00 GMT'}
+        )
+        self.assertTrue(
+            cache.get_cache().is_fresh(cache.get_cache().get('xmlrsps:pid'))
+        )
+
+    def test_xml_url(self):
+        source = sources.ArticleMetaSource('http://am:7000/')
+
+        with mock.patch.object(source, 'fetch', return_value='<article/>') as fetch:
+            source.xml(u'S0034-89102013000400674')
+
+        fetch.assert_called_once_with(
+            'http://am:7000/api/v1/article?code=S0034-89102013000400674&format=xmlrsps',
+            'xmlrsps:S0034-89102013000400674'
+        )
+
+    def test_json_url(self):
+        source = sources.ArticleMetaSource('http://am:7000')
+
+        with mock.patch.object(source, 'fetch', return_value='{}') as fetch:
+            source.json(u'S0034-89102013000400674')
+
+        fetch.assert_called_once_with(
+            'http://am:7000/api/v1/article?code=S0034-89102013000400674',
+            'json:S0034-89102013000400674'
+        )
+
+
+class LocalStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.store = sources.LocalStore(self.directory + '/store.db')
+
+    def dump(self):
+        data = json.loads(document_json)
+        data['xml'] = document_xml
+
+        return io.StringIO(
+            u'%s\n\nnot json\n{"no": "code"}\n%s\n' % (
+                json.dumps(data),
+                json.dumps({'code': u'S0034-89102006000700007', 'article': {}})
+            )
+        )
+
+    def test_import_dump(self):
+
+        imported = self.store.import_dump(self.dump(), batch_size=1)
+
+        self.assertEqual(imported, 2)
+        self.assertEqual(len(self.store), 2)
+        self.assertTrue(u'S0034-89102013000400675' in self.store)
+        self.assertEqual(self.store.xml(u'S0034-89102013000400675'), document_xml)
+        self.assertEqual(
+            json.loads(self.store.json(u'S0034-89102013000400675'))['code'],
+            u'S0034-89102013000400675'
+        )
+        self.assertFalse('xml' in json.loads(self.store.json(u'S0034-89102013000400675')))
+
+    def test_missing_document(self):
+
+        self.store.import_dump(self.dump())
+
+        with self.assertRaises(LookupError):
+            self.store.json(u'S0034-89102013000400674')
+
+        with self.assertRaises(LookupError):
+            self.store.xml(u'S0034-89102006000700007')
+
+    def test_reopen(self):
+        self.store.add(u'S0034-89102013000400675', {'code': 'x'}, u' <article/> ')
+
+        store = sources.LocalStore(self.store.path)
+
+        self.assertEqual(store.xml(u'S0034-89102013000400675'), u'<article/>')
+
+    def test_feedstock_offline(self):
+        self.store.import_dump(self.dump())
+        self.addCleanup(sources.configure)
+        sources.configure(self.store)
+
+        with mock.patch('requests.Session.get') as get:
+            xml = feedstock.loadXML(u'S0034-89102013000400675')
+            raw_data = feedstock.load_rawdata(u'S0034-89102013000400675')
+
+        self.assertFalse(get.called)
+        self.assertEqual(xml[0:20], u'<article article-typ')
+        self.assertEqual(
+            raw_data.original_title(),
+            u'Avaliacao da confiabilidade e validade do Indice de Qualidade da Dieta Revisado'
+        )
@@ -0,0 +1,127 @@
+import unittest
+import os
+import json
+import time
+import shutil
+import tempfile
+
+from elixir import timing
+
+
+class TimingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.records = []
+        timing.register(self.records.append)
+        self.addCleanup(timing.unregister, self.records.append)
+
+    def test_disabled(self):
+        timing.unregister(self.records.append)
+
+        with timing.document('pid') as timings:
+            with timing.stage('zip') as stage:
+                stage.read(10)
+
+        self.assertIsNone(timings)
+        self.assertFalse(stage.enabled)
+        self.assertEqual(self.records, [])
+
+    def test_stage_out_of_document(self):
+
+        with timing.stage('zip') as stage:
+            stage.read(10)
+
+        self.assertFalse(stage.enabled)
+        self.assertEqual(self.records, [])
+
+    def test_document(self):
+
+        with timing.document('pid'):
+            with timing.stage('read') as stage:
+                stage.read(10)
+            with timing.stage('read') as stage:
+                stage.read(5)
+            with timing.stage('zip') as stage:
+                stage.read(15)
+                stage.written(7)
+
+        self.assertEqual(len(self.records), 1)
+
+        record = self.records[0]
+
+        self.assertEqual(record['pid'], 'pid')
+        self.assertIsNone(record['error'])
+        self.assertEqual(record['bytes_read'], 30)
+        self.assertEqual(record['bytes_written'], 7)
+        self.assertEqual(record['stages']['read']['count'], 2)
+        self.assertEqual(record['stages']['read']['bytes_read'], 15)
+        self.assertEqual(record['stages']['zip']['bytes_written'], 7)
+
+    def test_nested_stages_are_not_counted_twice(self):
+
+        with timing.document('pid'):
+            with timing.stage('parse'):
+                with timing.stage('read'):
+                    time.sleep(0.05)
+
+        stages = self.records[0]['stages']
+
+        self.assertTrue(stages['read']['elapsed'] >= 0.05)
+        self.assertTrue(stages['parse']['elapsed'] < 0.05)
+        self.assertTrue(
+            stages['read']['elapsed'] + stages['parse']['elapsed'] <= self.records[0]['elapsed']
+        )
+
+    def test_document_with_error(self):
+
+        with self.assertRaises(ValueError):
+            with timing.document('pid'):
+                with timing.stage('parse'):
+                    raise ValueError('invalid')
+
+        self.assertEqual(self.records[0]['error'], 'ValueError')
+        self.assertEqual(self.records[0]['stages']['parse']['count'], 1)
+
+    def test_failing_callback(self):
+
+        def fail(record):
+            raise RuntimeError('callback')
+
+        timing.register(fail)
+        self.addCleanup(timing.unregister, fail)
+
+        with timing.document('pid'):
+            pass
+
+        self.assertEqual(len(self.records), 1)
+
+
+class TimingLogTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(timing.configure)
+
+    def test_configure(self):
+        path = os.path.join(self.directory, 'timing.jsonl')
+
+        timing.configure(path)
+
+        with timing.document('a'):
+            with timing.stage('zip'):
+                pass
+
+        with timing.document('b'):
+            pass
+
+        timing.configure()
+
+        with timing.document('c'):
+            pass
+
+        with open(path, 'r') as f:
+            records = [json.loads(x) for x in f]
+
+        self.assertEqual([x['pid'] for x in records], ['a', 'b'])
+        self.assertTrue('zip' in records[0]['stages'])
@@ -1,6 +1,10 @@
 import unittest
 import os
+import shutil
 import zipfile
+import hashlib
+import tempfile
+import unittest.mock
 
 from elixir import utils
 
@@ -70,6 +74,164 @@ class UtilsTests(unittest.TestCase):
             )
 
 
+    def test_wrap_files_to_target(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        target = directory + '/package.zip'
+
+        wrap_files = utils.WrapFiles(
+            source_dir+'/pdf/rsp/v40n6/07.pdf',
+            source_dir+'/img/rsp/v40n6/07f1.gif',
+            utils.MemoryFileLike('blaus.txt', 'picles content'),
+            target=target
+        )
+        wrap_files.close()
+
+        with zipfile.ZipFile(target) as package:
+            self.assertEqual(
+                sorted(package.namelist()), ['07.pdf', '07f1.gif', 'blaus.txt']
+            )
+            with open(source_dir+'/pdf/rsp/v40n6/07.pdf', 'rb') as f:
+                self.assertEqual(package.read('07.pdf'), f.read())
+            self.assertEqual(package.read('blaus.txt'), b'picles content')
+
+    def test_wrap_files_read_target(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        target = directory + '/package.zip'
+
+        wrap_files = utils.WrapFiles(
+            utils.MemoryFileLike('blaus.txt', 'picles content'),
+            target=target
+        )
+        content = wrap_files.read()
+
+        with open(target, 'rb') as f:
+            self.assertEqual(content, f.read())
+
+        with zipfile.ZipFile(target) as package:
+            self.assertEqual(package.read('blaus.txt'), b'picles content')
+
+    def test_wrap_files_copies_in_chunks(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        content = os.urandom(1024 * 10 + 3)
+
+        with open(directory + '/big.pdf', 'wb') as f:
+            f.write(content)
+
+        wrap_files = utils.WrapFiles(target=directory + '/package.zip')
+        wrap_files.CHUNK_SIZE = 1024
+
+        with unittest.mock.patch('shutil.copyfileobj', wraps=shutil.copyfileobj) as copy:
+            wrap_files.append(directory + '/big.pdf')
+        wrap_files.close()
+
+        copy.assert_called_once_with(unittest.mock.ANY, unittest.mock.ANY, 1024)
+
+        with zipfile.ZipFile(directory + '/package.zip') as package:
+            self.assertEqual(package.read('big.pdf'), content)
+
+        self.assertEqual(
+            wrap_files.digests[directory + '/big.pdf'],
+            hashlib.sha1(content).hexdigest()
+        )
+
+    def test_wrap_files_file_member(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        content = b'\xef\xbb\xbf\n  <article>\xc3\xa7</article>\r\n'
+
+        with open(directory + '/source.XML', 'wb') as f:
+            f.write(content)
+
+        wrap_files = utils.WrapFiles(
+            utils.FileMember(directory + '/source.XML', 'document.xml'),
+            target=directory + '/package.zip'
+        )
+        wrap_files.close()
+
+        with zipfile.ZipFile(directory + '/package.zip') as package:
+            self.assertEqual(package.namelist(), ['document.xml'])
+            self.assertEqual(package.read('document.xml'), content)
+
+        self.assertEqual(
+            wrap_files.digests[directory + '/source.XML'],
+            hashlib.sha1(content).hexdigest()
+        )
+
+    def test_file_member_name(self):
+        member = utils.FileMember('/src/xml/rsp/v40n6/0034.xml')
+
+        self.assertEqual(member.name, '0034.xml')
+
+class CompressionPolicyTests(unittest.TestCase):
+
+    def test_default_policy(self):
+        policy = utils.CompressionPolicy()
+
+        self.assertEqual(policy.compression('0034.xml'), (zipfile.ZIP_DEFLATED, 6))
+        self.assertEqual(policy.compression('en_07.HTM'), (zipfile.ZIP_DEFLATED, 6))
+        self.assertEqual(policy.compression('07f1.gif'), (zipfile.ZIP_STORED, None))
+        self.assertEqual(policy.compression('07.pdf'), (zipfile.ZIP_STORED, None))
+        self.assertEqual(policy.compression('noextension'), (zipfile.ZIP_STORED, None))
+
+    def test_parse(self):
+        policy = utils.CompressionPolicy.parse('xml,htm=deflate:9, pdf=lzma, *=bzip2:1')
+
+        self.assertEqual(policy.compression('a.xml'), (zipfile.ZIP_DEFLATED, 9))
+        self.assertEqual(policy.compression('a.htm'), (zipfile.ZIP_DEFLATED, 9))
+        self.assertEqual(policy.compression('a.pdf'), (zipfile.ZIP_LZMA, None))
+        self.assertEqual(policy.compression('a.gif'), (zipfile.ZIP_BZIP2, 1))
+
+    def test_invalid_method(self):
+
+        with self.assertRaises(ValueError):
+            utils.CompressionPolicy.parse('xml=rar')
+
+    def test_wrap_files_compression_level(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        sizes = []
+
+        for level in ['1', '9']:
+            target = directory + '/package%s.zip' % level
+
+            wrap_files = utils.WrapFiles(
+                source_dir+'/html/rsp/v40n6/en_07.htm',
+                target=target,
+                compression=utils.CompressionPolicy.parse('*=deflate:' + level)
+            )
+            wrap_files.close()
+
+            with zipfile.ZipFile(target) as package:
+                sizes.append(package.getinfo('en_07.htm').compress_size)
+
+        self.assertTrue(sizes[1] < sizes[0])
+
+    def test_wrap_files_compression(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        target = directory + '/package.zip'
+
+        wrap_files = utils.WrapFiles(
+            source_dir+'/html/rsp/v40n6/en_07.htm',
+            source_dir+'/img/rsp/v40n6/07f1.gif',
+            utils.MemoryFileLike('document.xml', '<article>%s</article>' % ('x' * 1000)),
+            target=target
+        )
+        wrap_files.close()
+
+        with zipfile.ZipFile(target) as package:
+            self.assertEqual(package.getinfo('en_07.htm').compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(package.getinfo('document.xml').compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(package.getinfo('07f1.gif').compress_type, zipfile.ZIP_STORED)
+            self.assertTrue(
+                package.getinfo('document.xml').compress_size < package.getinfo('document.xml').file_size
+            )
+            self.assertEqual(package.read('document.xml'), ('<article>%s</article>' % ('x' * 1000)).encode('utf-8'))
+
+
 class MemoryFileLikeTests(unittest.TestCase):
 
     def test_instanciating(self):
@@ -120,4 +282,56 @@ class MemoryFileLikeTests(unittest.TestCase):
 
         flo.write('blaus')
 
-        self.assertEqual(flo.name, 'picles.txt')
\ No newline at end of file
+        self.assertEqual(flo.name, 'picles.txt')
+
+class MemoizedPropertyTests(unittest.TestCase):
+
+    class Counter(object):
+
+        def __init__(self):
+            self.calls = 0
+
+        @utils.memoized_property
+        def value(self):
+            self.calls += 1
+            return self.calls
+
+        @utils.memoized_property
+        def other(self):
+            self.calls += 1
+            return self.calls
+
+    def test_evaluated_once(self):
+        counter = self.Counter()
+
+        self.assertEqual(counter.value, 1)
+        self.assertEqual(counter.value, 1)
+        self.assertEqual(counter.calls, 1)
+
+    def test_per_instance(self):
+        counter1 = self.Counter()
+        counter2 = self.Counter()
+
+        counter1.value
+
+        self.assertEqual(counter2.value, 1)
+
+    def test_invalidate(self):
+        counter = self.Counter()
+        counter.value
+        counter.other
+
+        utils.memoized_property.invalidate(counter, 'value')
+
+        self.assertEqual(counter.value, 3)
+        self.assertEqual(counter.other, 2)
+
+    def test_invalidate_all(self):
+        counter = self.Counter()
+        counter.value
+        counter.other
+
+        utils.memoized_property.invalidate(counter)
+
+        self.assertEqual(counter.other, 3)
+        self.assertEqual(counter.value, 4)
@@ -0,0 +1,100 @@
+import unittest
+import os
+import shutil
+import tarfile
+import hashlib
+import tempfile
+
+from elixir import utils, writers
+
+source_dir = os.path.dirname(__file__) + '/files'
+
+
+class WritersTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def files(self):
+
+        return [
+            source_dir + '/pdf/rsp/v40n6/07.pdf',
+            utils.FileMember(source_dir + '/html/rsp/v40n6/en_07.htm', 'document.htm'),
+            utils.MemoryFileLike('document.xml', '<article/>')
+        ]
+
+    def test_extension(self):
+
+        self.assertEqual(writers.extension('zip'), '.zip')
+        self.assertEqual(writers.extension('tar.gz'), '.tar.gz')
+        self.assertEqual(writers.extension('dir'), '')
+
+    def test_invalid_format(self):
+
+        with self.assertRaises(ValueError):
+            writers.open_writer(self.directory + '/package.rar', 'rar')
+
+    def test_tar_writer(self):
+
+        for package_format in ['tar', 'tar.gz', 'tar.xz']:
+            target = self.directory + '/package' + writers.extension(package_format)
+
+            writer = writers.open_writer(target, package_format)
+            writer.append(*self.files())
+            writer.close()
+
+            with tarfile.open(target) as package:
+                self.assertEqual(
+                    package.getnames(), ['07.pdf', 'document.htm', 'document.xml']
+                )
+                self.assertEqual(package.extractfile('document.xml').read(), b'<article/>')
+
+                with open(source_dir + '/html/rsp/v40n6/en_07.htm', 'rb') as f:
+                    self.assertEqual(package.extractfile('document.htm').read(), f.read())
+
+    def test_tar_writer_digests(self):
+        path = source_dir + '/pdf/rsp/v40n6/07.pdf'
+
+        writer = writers.open_writer(self.directory + '/package.tar', 'tar')
+        writer.append(path)
+        writer.close()
+
+        with open(path, 'rb') as f:
+            self.assertEqual(writer.digests[path], hashlib.sha1(f.read()).hexdigest())
+
+    def test_directory_writer(self):
+        target = self.directory + '/package'
+
+        writer = writers.open_writer(target, 'dir')
+        writer.append(*self.files())
+        writer.close()
+
+        self.assertEqual(
+            sorted(os.listdir(target)), ['07.pdf', 'document.htm', 'document.xml']
+        )
+        self.assertEqual(
+            os.stat(target + '/07.pdf').st_mtime,
+            os.stat(source_dir + '/pdf/rsp/v40n6/07.pdf').st_mtime
+        )
+
+    def test_commit_replaces_directory(self):
+        target = self.directory + '/package'
+        os.makedirs(target)
+        open(target + '/old.pdf', 'w').close()
+
+        writer = writers.open_writer(target + '.part', 'dir')
+        writer.append(source_dir + '/pdf/rsp/v40n6/07.pdf')
+        writer.close()
+        writers.commit(target + '.part', target)
+
+        self.assertEqual(os.listdir(target), ['07.pdf'])
+        self.assertEqual(os.listdir(self.directory), ['package'])
+
+    def test_discard(self):
+        writer = writers.open_writer(self.directory + '/package.part', 'dir')
+        writer.append(source_dir + '/pdf/rsp/v40n6/07.pdf')
+
+        writers.discard(self.directory + '/package.part')
+
+        self.assertEqual(os.listdir(self.directory), [])